@@ -0,0 +1,325 @@
+import json
+import math
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from statistics import NormalDist
+from typing import Callable, List, Tuple
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from batch_index import BatchIndex, load_index
+from verdict import verdict_label
+
+# 상수 지정
+
+DEFAULT_TARGET_WIDTH = 0.1  # 신뢰구간 폭 (상한 - 하한) 목표
+DEFAULT_MIN_SAMPLES = 100  # 이보다 적게 보고는 멈추지 않음 (초반 구간 추정이 불안정)
+DEFAULT_CONFIDENCE = 0.95
+DEFAULT_BOOTSTRAP = 2000
+STOP_METRICS = {'accuracy': ('accuracy',), 'mcc': ('mcc',), 'both': ('accuracy', 'mcc')}
+
+
+def stratified_order(labels: List[str], seed: int = 42) -> List[int]:
+    """
+    라벨 비율이 어느 시점에서 끊어도 유지되도록 섞은 순번을 반환합니다.
+    라벨별로 무작위 순서를 정한 뒤, i번째 원소를 (i + U) / 라벨 개수 위치에 놓고 위치 순으로 합칩니다.
+    :param labels: 순번별 라벨 (예: BatchIndex.gold_labels)
+    :param seed: 무작위 시드 값 (기본값: 42)
+    :return: 줄 순번 리스트
+    """
+    rng = np.random.default_rng(seed)
+    labels = np.asarray(labels)
+    order, positions = [], []
+    for label in np.unique(labels):
+        members = rng.permutation(np.flatnonzero(labels == label))
+        order.append(members)
+        positions.append((np.arange(len(members)) + rng.random(len(members))) / len(members))
+    order, positions = np.concatenate(order), np.concatenate(positions)
+    return order[np.argsort(positions, kind='stable')].tolist()
+
+
+def wilson_interval(successes: int, n: int, confidence: float = DEFAULT_CONFIDENCE) -> Tuple[float, float]:
+    """
+    이항 비율(정확도)의 Wilson score 신뢰구간을 계산합니다.
+    :param successes: 맞힌 개수
+    :param n: 전체 개수
+    :param confidence: 신뢰수준 (기본값: 0.95)
+    :return: (하한, 상한), n이 0이면 (0, 1)
+    """
+    if n == 0:
+        return 0.0, 1.0
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    p = successes / n
+    denominator = 1 + z * z / n
+    center = (p + z * z / (2 * n)) / denominator
+    half = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denominator
+    return max(center - half, 0.0), min(center + half, 1.0)
+
+
+def mcc_from_counts(tp, fp, fn, tn):
+    """
+    혼동 행렬 개수로 MCC를 계산합니다. (배열 입력 가능, 분모가 0이면 sklearn과 같이 0)
+    """
+    tp, fp, fn, tn = (np.asarray(x, dtype=np.float64) for x in (tp, fp, fn, tn))
+    denominator = np.sqrt((tp + fp) * (tp + fn) * (tn + fp) * (tn + fn))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mcc = np.where(denominator > 0, (tp * tn - fp * fn) / denominator, 0.0)
+    return mcc
+
+
+def bootstrap_mcc_interval(counts: np.ndarray, n_boot: int = DEFAULT_BOOTSTRAP, confidence: float = DEFAULT_CONFIDENCE,
+                           rng: np.random.Generator = None) -> Tuple[float, float]:
+    """
+    MCC의 부트스트랩 백분위수 신뢰구간을 계산합니다.
+    MCC는 혼동 행렬 개수만으로 정해지므로 표본 재추출 대신 (tp, fp, fn, tn) 다항분포 추출로 한 번에 계산합니다.
+    :param counts: [tp, fp, fn, tn]
+    :param n_boot: 부트스트랩 반복 수 (기본값: 2000)
+    :param confidence: 신뢰수준 (기본값: 0.95)
+    :param rng: 난수 생성기
+    :return: (하한, 상한), 표본이 없거나 MCC가 정의되지 않으면 (-1, 1)
+    """
+    n = int(counts.sum())
+    tp, fp, fn, tn = counts.tolist()
+    # 한쪽 라벨만 예측(또는 정답)하는 동안은 모든 재추출의 MCC가 0이 되어 구간이 0으로 좁아지므로 수렴으로 보지 않음
+    if n == 0 or 0 in (tp + fp, tp + fn, tn + fp, tn + fn):
+        return -1.0, 1.0
+    rng = rng if rng is not None else np.random.default_rng()
+    draws = rng.multinomial(n, counts / n, size=n_boot)
+    mcc = mcc_from_counts(draws[:, 0], draws[:, 1], draws[:, 2], draws[:, 3])
+    alpha = (1 - confidence) / 2
+    low, high = np.quantile(mcc, [alpha, 1 - alpha])
+    return float(low), float(high)
+
+
+class AdaptiveEvaluator:
+    """
+    결과가 들어올 때마다 정확도(Wilson)와 MCC(부트스트랩) 신뢰구간을 갱신하고,
+    지정한 지표들의 구간 폭이 모두 목표 이하가 되면 수렴으로 판단합니다. (에러 응답은 지표에서 제외)
+    MCC 부트스트랩은 (seed, 혼동 행렬)로 시드를 정하고 결과를 캐시하므로 같은 개수에서는 항상 같은 구간이 나옵니다.
+    중단을 결정한 시점의 상태는 stop_state에 기록됩니다.
+    """
+
+    def __init__(self, target_width: float = DEFAULT_TARGET_WIDTH, min_samples: int = DEFAULT_MIN_SAMPLES,
+                 stop_on: str = 'both', confidence: float = DEFAULT_CONFIDENCE, n_boot: int = DEFAULT_BOOTSTRAP,
+                 seed: int = 42):
+        self.target_width = target_width
+        self.min_samples = min_samples
+        self.stop_metrics = STOP_METRICS[stop_on]
+        self.confidence = confidence
+        self.n_boot = n_boot
+        self.seed = seed
+        self.counts = np.zeros(4, dtype=np.int64)  # tp, fp, fn, tn ('same'이 양성)
+        self.errors = 0
+        self.history = []
+        self.stop_state = None  # 중단을 결정한 시점의 상태 (+ 'reason')
+        self._mcc_intervals = {}  # (tp, fp, fn, tn) -> MCC 신뢰구간
+
+    @property
+    def n(self) -> int:
+        return int(self.counts.sum())
+
+    def add(self, gold_label: str, pred_label: str, is_error: bool = False) -> dict:
+        """
+        결과 하나를 반영하고 현재 지표와 신뢰구간을 반환합니다.
+        :param gold_label: 정답 라벨 ('same' 또는 'diff')
+        :param pred_label: 예측 라벨 ('same', 'diff' 또는 '')
+        :param is_error: 에러 응답 여부
+        :return: 현재 상태 (history에도 추가됨)
+        """
+        if is_error or pred_label not in ('same', 'diff'):
+            self.errors += 1
+        else:
+            gold_same, pred_same = gold_label == 'same', pred_label == 'same'
+            self.counts[(0 if pred_same else 2) if gold_same else (1 if pred_same else 3)] += 1
+
+        tp, fp, fn, tn = key = tuple(self.counts.tolist())
+        acc_low, acc_high = wilson_interval(tp + tn, self.n, self.confidence)
+        if key not in self._mcc_intervals:
+            rng = np.random.default_rng([self.seed, *key])
+            self._mcc_intervals[key] = bootstrap_mcc_interval(self.counts, self.n_boot, self.confidence, rng)
+        mcc_low, mcc_high = self._mcc_intervals[key]
+        state = {
+            'n': self.n,
+            'errors': self.errors,
+            'accuracy': (tp + tn) / self.n if self.n else float('nan'),
+            'accuracy_low': acc_low,
+            'accuracy_high': acc_high,
+            'mcc': float(mcc_from_counts(tp, fp, fn, tn)),
+            'mcc_low': mcc_low,
+            'mcc_high': mcc_high,
+        }
+        self.history.append(state)
+        return state
+
+    def converged(self) -> bool:
+        """
+        최소 표본 수를 넘었고 stop_on 지표들의 신뢰구간 폭이 모두 목표 이하인지 확인합니다.
+        """
+        if not self.history or self.n < self.min_samples:
+            return False
+        state = self.history[-1]
+        return all(state[f'{metric}_high'] - state[f'{metric}_low'] <= self.target_width for metric in self.stop_metrics)
+
+    def record_stop(self, reason: str):
+        """
+        중단을 결정한 시점의 상태를 기록합니다. 이후 실행 중이던 요청의 결과가 더해져도 바뀌지 않습니다.
+        :param reason: 'converged'(신뢰구간 수렴) 또는 'exhausted'(모든 요청 실행)
+        """
+        state = self.history[-1] if self.history else {}
+        self.stop_state = {'reason': reason, 'executed': len(self.history), **state}
+
+
+def _predict_entry(predict: Callable[[dict], str], index: BatchIndex, i: int) -> Tuple[str, str, str, bool]:
+    custom_id = index.custom_ids[i]
+    try:
+        pred_label = predict(json.loads(index.read_line(i)))
+    except Exception as e:
+        print(f'요청 실패 ({custom_id}): {e}')
+        pred_label = ''
+    return custom_id, index.gold_labels[i], pred_label, pred_label == ''
+
+
+def run_adaptive(jsonl_path: Path, predict: Callable[[dict], str], evaluator: AdaptiveEvaluator,
+                 concurrency: int = 1, seed: int = 42, report_every: int = 25) -> pd.DataFrame:
+    """
+    요청을 라벨 비율이 유지되는 무작위 순서로 실행하면서 신뢰구간이 충분히 좁아지면 남은 요청을 건너뜁니다.
+    수렴 시점에 이미 실행 중인 요청은 끝까지 기다려 결과에 포함합니다.
+    :param jsonl_path: batch.jsonl 경로
+    :param predict: 요청(dict) -> 예측 라벨('same', 'diff', 실패 시 '') 함수
+    :param evaluator: AdaptiveEvaluator
+    :param concurrency: 동시에 실행할 요청 수 (기본값: 1)
+    :param seed: 실행 순서 시드 값 (기본값: 42)
+    :param report_every: 진행 상황 출력 간격 (기본값: 25)
+    :return: 실행한 요청의 'custom_id', 'gold_label', 'pred_label', 'is_error' DataFrame (완료 순서)
+    """
+    index = load_index(jsonl_path)
+    order = iter(stratified_order(index.gold_labels, seed=seed))
+    rows = []
+    stopped = False
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        pending = set()
+
+        def fill():
+            while len(pending) < concurrency:
+                i = next(order, None)
+                if i is None:
+                    return
+                pending.add(pool.submit(_predict_entry, predict, index, i))
+
+        fill()
+        while pending:
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                row = future.result()
+                rows.append(row)
+                state = evaluator.add(row[1], row[2], row[3])
+                if len(rows) % report_every == 0:
+                    print(f"[{len(rows)}/{len(index)}] accuracy {state['accuracy']:.4f} "
+                          f"[{state['accuracy_low']:.4f}, {state['accuracy_high']:.4f}] | "
+                          f"MCC {state['mcc']:.4f} [{state['mcc_low']:.4f}, {state['mcc_high']:.4f}]")
+            if not stopped and evaluator.converged():
+                stopped = True
+                evaluator.record_stop('converged')
+                print(f'신뢰구간 폭이 {evaluator.target_width} 이하로 수렴하여 {len(rows)}/{len(index)}개에서 중단합니다.')
+            if not stopped:
+                fill()
+
+    if not stopped:
+        evaluator.record_stop('exhausted')
+    return pd.DataFrame(rows, columns=['custom_id', 'gold_label', 'pred_label', 'is_error'])
+
+
+def local_predictor(llm) -> Callable[[dict], str]:
+    """
+    run_local의 llama.cpp 모델로 요청을 실행하는 예측 함수를 만듭니다. (모델은 동시 호출 불가, concurrency=1로 사용)
+    :param llm: run_local.load_model로 불러온 모델
+    """
+    from run_local import run_entry
+
+    def predict(entry: dict) -> str:
+        result = run_entry(llm, entry, 0)
+        return result['verdict']
+
+    return predict
+
+
+def realtime_predictor(client) -> Callable[[dict], str]:
+    """
+    Chat Completions API로 요청 body를 그대로 보내는 예측 함수를 만듭니다.
+    OPENAI_BASE_URL을 local_server.py로 지정하면 오프라인으로 실행할 수 있습니다.
+    :param client: openai.OpenAI 클라이언트 (call_batch_api.get_client())
+    """
+    def predict(entry: dict) -> str:
+        response = client.chat.completions.create(**entry['body'])
+        return verdict_label(response.choices[0].message.content)
+
+    return predict
+
+
+def summarize(evaluator: AdaptiveEvaluator, total: int) -> dict:
+    # 마지막 지표와 신뢰구간, 실행한 요청 비율, 중단 결정 시점의 상태 (수렴 여부는 다시 계산하지 않음)
+    state = evaluator.history[-1] if evaluator.history else {}
+    executed = len(evaluator.history)
+    stop = evaluator.stop_state or {}
+    return {
+        **state,
+        'executed': executed,
+        'total': total,
+        'saved_fraction': 1 - executed / total if total else 0.0,
+        'target_width': evaluator.target_width,
+        'converged': stop.get('reason') == 'converged',
+        'stop': stop,
+    }
+
+
+if __name__ == '__main__':
+    # 인자 파싱
+    parser = argparse.ArgumentParser(description='Evaluate a batch file adaptively and stop once confidence intervals are narrow enough.')
+    parser.add_argument('--input-file', type=str, default="../dataset/batch/batch.jsonl", help='Path to the input JSONL file.')
+    parser.add_argument('--save-path', type=str, default="../dataset/adaptive", help='Path to save predictions and the metric history.')
+    parser.add_argument('--executor', type=str, default='realtime', choices=['local', 'realtime'], help='요청 실행기')
+    parser.add_argument('--target-width', type=float, default=DEFAULT_TARGET_WIDTH, help='목표 신뢰구간 폭')
+    parser.add_argument('--min-samples', type=int, default=DEFAULT_MIN_SAMPLES, help='중단 전 최소 결과 수')
+    parser.add_argument('--stop-on', type=str, default='both', choices=list(STOP_METRICS), help='수렴 판단에 사용할 지표')
+    parser.add_argument('--confidence', type=float, default=DEFAULT_CONFIDENCE, help='신뢰수준')
+    parser.add_argument('--concurrency', type=int, default=8, help='realtime 실행기의 동시 요청 수')
+    parser.add_argument('--seed', type=int, default=42, help='무작위 시드 값')
+    args = parser.parse_args()
+
+    jsonl_path = Path(args.input_file)
+    save_path = Path(args.save_path)
+    save_path.mkdir(parents=True, exist_ok=True)
+
+    if args.executor == 'local':
+        from run_local import load_model
+        llm, _ = load_model()
+        predict, concurrency = local_predictor(llm), 1
+    else:
+        from call_batch_api import get_client
+        predict, concurrency = realtime_predictor(get_client()), args.concurrency
+
+    evaluator = AdaptiveEvaluator(target_width=args.target_width, min_samples=args.min_samples, stop_on=args.stop_on,
+                                  confidence=args.confidence, seed=args.seed)
+    start = time.perf_counter()
+    preds = run_adaptive(jsonl_path, predict, evaluator, concurrency=concurrency, seed=args.seed)
+    elapsed = time.perf_counter() - start
+
+    summary = summarize(evaluator, len(load_index(jsonl_path)))
+    summary['seconds'] = elapsed
+    preds.to_csv(save_path / 'predictions.csv', encoding='utf-8-sig', index=False)
+    pd.DataFrame(evaluator.history).to_csv(save_path / 'history.csv', encoding='utf-8-sig', index=False)
+    with open(save_path / 'summary.json', 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+
+    print('-'*50)
+    print(f"실행 {summary['executed']}/{summary['total']}개 ({summary['saved_fraction']:.0%} 절약, {elapsed:.1f}초)")
+    print(f"accuracy {summary['accuracy']:.4f} [{summary['accuracy_low']:.4f}, {summary['accuracy_high']:.4f}]")
+    print(f"MCC      {summary['mcc']:.4f} [{summary['mcc_low']:.4f}, {summary['mcc_high']:.4f}]")
+    stop = summary['stop']
+    if stop.get('reason') == 'converged':
+        print(f"중단 시점 {stop['executed']}개: accuracy [{stop['accuracy_low']:.4f}, {stop['accuracy_high']:.4f}], "
+              f"MCC [{stop['mcc_low']:.4f}, {stop['mcc_high']:.4f}]")
@@ -0,0 +1,233 @@
+import json
+from pathlib import Path
+from typing import Dict, Tuple
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from article_cache import build_article_cache, article_ids
+
+# 상수 지정
+
+DEFAULT_BLOCK_SIZE = 2048  # 블록 하나의 유사도 행렬 = 2048 x 2048 float32 (16MB)
+DEFAULT_BINS = 2000  # [-1, 1] 구간의 코사인 유사도 히스토그램 bin 수
+MAX_HISTOGRAM_CELLS = 50_000_000  # 언론사 수^2 x bin 수 상한 (int64 누적 배열 400MB)
+
+
+class PairScoreHistogram:
+    """
+    언론사 쌍별 유사도 분포를 히스토그램으로 누적합니다. (비순서쌍, source1 <= source2)
+    전체 N x N 행렬 대신 (언론사 수 x 언론사 수 x bin 수) 크기만 유지하며, 이 크기는 MAX_HISTOGRAM_CELLS를 넘을 수 없습니다.
+    (기본 2000 bin이면 언론사 약 150개까지) 블록마다 추가로 잡는 메모리는 해당 블록에 나타난 언론사 쌍 수 x bin 수입니다.
+    """
+
+    def __init__(self, sources: list, bins: int = DEFAULT_BINS):
+        k = len(sources)
+        if k * k * bins > MAX_HISTOGRAM_CELLS:
+            raise ValueError(f'히스토그램이 너무 큽니다: 언론사 {k}개 x {k}개 x bin {bins}개 > {MAX_HISTOGRAM_CELLS}. --bins를 줄여주세요.')
+        self.sources = sources
+        self.bins = bins
+        self.counts = np.zeros((k, k, bins), dtype=np.int64)
+        self.sums = np.zeros((k, k), dtype=np.float64)
+        self.sq_sums = np.zeros((k, k), dtype=np.float64)
+
+    def add(self, scores: np.ndarray, codes1: np.ndarray, codes2: np.ndarray):
+        """
+        유사도와 두 기사의 언론사 코드를 누적합니다.
+        :param scores: 1차원 유사도 배열
+        :param codes1: 왼쪽 기사의 언론사 코드
+        :param codes2: 오른쪽 기사의 언론사 코드
+        """
+        k, bins = len(self.sources), self.bins
+        lo = np.minimum(codes1, codes2)
+        hi = np.maximum(codes1, codes2)
+        cell = lo * k + hi
+        bin_idx = ((scores + 1) * (bins / 2)).astype(np.int64).clip(0, bins - 1)
+
+        # 블록에 나타난 언론사 쌍만 압축 인덱스로 바꿔 bincount (k x k x bins 임시 배열을 만들지 않음)
+        occupied = np.flatnonzero(np.bincount(cell, minlength=k * k))
+        compact = np.empty(k * k, dtype=np.int64)
+        compact[occupied] = np.arange(len(occupied))
+        block_counts = np.bincount(compact[cell] * bins + bin_idx, minlength=len(occupied) * bins)
+        self.counts.reshape(k * k, bins)[occupied] += block_counts.reshape(len(occupied), bins)
+        self.sums += np.bincount(cell, weights=scores, minlength=k * k).reshape(k, k)
+        self.sq_sums += np.bincount(cell, weights=scores * scores, minlength=k * k).reshape(k, k)
+
+    def bin_centers(self) -> np.ndarray:
+        return (np.arange(self.bins) + 0.5) * (2 / self.bins) - 1
+
+    def quantile(self, hist: np.ndarray, q: float) -> float:
+        total = hist.sum()
+        if total == 0:
+            return float('nan')
+        idx = np.searchsorted(np.cumsum(hist), q * total)
+        return float(self.bin_centers()[min(idx, self.bins - 1)])
+
+    def same_hist(self, source_idx: int = None) -> np.ndarray:
+        if source_idx is None:
+            return np.einsum('iib->b', self.counts)
+        return self.counts[source_idx, source_idx]
+
+    def diff_hist(self, source_idx: int = None) -> np.ndarray:
+        upper = np.triu(np.ones((len(self.sources),) * 2, dtype=bool), k=1)
+        if source_idx is None:
+            return self.counts[upper].sum(axis=0)
+        mask = np.zeros_like(upper)
+        mask[source_idx, :] = True
+        mask[:, source_idx] = True
+        return self.counts[upper & mask].sum(axis=0)
+
+    def summary(self) -> pd.DataFrame:
+        """
+        언론사 쌍별 분포 요약 (개수, 평균, 표준편차, 분위수)을 반환합니다.
+        """
+        rows = []
+        for a, source1 in enumerate(self.sources):
+            for b in range(a, len(self.sources)):
+                n = int(self.counts[a, b].sum())
+                if n == 0:
+                    continue
+                mean = self.sums[a, b] / n
+                var = max(self.sq_sums[a, b] / n - mean * mean, 0.0)
+                rows.append({
+                    'source1': source1,
+                    'source2': self.sources[b],
+                    'kind': 'same' if a == b else 'diff',
+                    'count': n,
+                    'mean': mean,
+                    'std': var ** 0.5,
+                    'p05': self.quantile(self.counts[a, b], 0.05),
+                    'p50': self.quantile(self.counts[a, b], 0.5),
+                    'p95': self.quantile(self.counts[a, b], 0.95),
+                })
+        return pd.DataFrame(rows)
+
+
+def histogram_auc(positive: np.ndarray, negative: np.ndarray) -> float:
+    """
+    두 히스토그램으로 AUC(= P(양성 점수 > 음성 점수), 동점은 0.5)를 계산합니다.
+    :param positive: 양성(same) 점수 히스토그램
+    :param negative: 음성(diff) 점수 히스토그램
+    :return: AUC (한쪽이 비어 있으면 nan)
+    """
+    n_pos, n_neg = positive.sum(), negative.sum()
+    if n_pos == 0 or n_neg == 0:
+        return float('nan')
+    neg_below = np.cumsum(negative) - negative  # 각 bin보다 낮은 음성 개수
+    wins = (positive * neg_below).sum() + 0.5 * (positive * negative).sum()
+    return float(wins / (n_pos * n_neg))
+
+
+def all_pairs_scores(matrix: np.ndarray, source_codes: np.ndarray, sources: list, block_size: int = DEFAULT_BLOCK_SIZE, bins: int = DEFAULT_BINS) -> PairScoreHistogram:
+    """
+    L2 정규화된 기사 행렬의 모든 기사 쌍(i < j) 코사인 유사도를 블록 단위로 계산하여 언론사 쌍별 히스토그램에 누적합니다.
+    메모리 사용량은 block_size^2에 비례하며 N x N 행렬을 만들지 않습니다.
+    :param matrix: (기사 수, 차원) 크기의 L2 정규화된 행렬 (메모리 맵 가능)
+    :param source_codes: 기사별 언론사 코드 (sources의 인덱스)
+    :param sources: 언론사 이름 리스트
+    :param block_size: 블록 크기 (기본값: 2048)
+    :param bins: 히스토그램 bin 수 (기본값: 2000)
+    :return: 누적된 히스토그램
+    """
+    n = len(matrix)
+    hist = PairScoreHistogram(sources, bins=bins)
+
+    for i_start in range(0, n, block_size):
+        i_end = min(i_start + block_size, n)
+        block_i = np.asarray(matrix[i_start:i_end], dtype=np.float32)
+        codes_i = source_codes[i_start:i_end]
+
+        for j_start in range(i_start, n, block_size):
+            j_end = min(j_start + block_size, n)
+            block_j = np.asarray(matrix[j_start:j_end], dtype=np.float32)
+            codes_j = source_codes[j_start:j_end]
+
+            scores = block_i @ block_j.T  # BLAS
+            codes1 = np.broadcast_to(codes_i[:, None], scores.shape)
+            codes2 = np.broadcast_to(codes_j[None, :], scores.shape)
+            if i_start == j_start:
+                upper = np.triu(np.ones(scores.shape, dtype=bool), k=1)  # 대각 블록은 i < j만
+                hist.add(scores[upper].astype(np.float64), codes1[upper], codes2[upper])
+            else:
+                hist.add(scores.ravel().astype(np.float64), codes1.ravel(), codes2.ravel())
+
+    return hist
+
+
+def evaluate_all_pairs(hist: PairScoreHistogram) -> Tuple[float, Dict[str, float]]:
+    """
+    같은 언론사 쌍을 양성으로 보고 전체 AUC와 언론사별 AUC를 계산합니다.
+    :param hist: all_pairs_scores의 결과
+    :return: (전체 AUC, {언론사: AUC})
+    """
+    overall = histogram_auc(hist.same_hist(), hist.diff_hist())
+    per_source = {
+        source: histogram_auc(hist.same_hist(idx), hist.diff_hist(idx))
+        for idx, source in enumerate(hist.sources)
+    }
+    return overall, per_source
+
+
+def load_matrix(df: pd.DataFrame, cache_dir: Path, kind: str = 'embedding') -> np.ndarray:
+    """
+    기사 캐시에서 전체 쌍 비교에 사용할 L2 정규화 행렬을 가져옵니다. (df의 행 순서)
+    :param df: 기사 DataFrame
+    :param cache_dir: 캐시 루트 디렉토리
+    :param kind: 'embedding' (캐시 임베딩) 또는 'style' (표준화한 스타일 특징)
+    :return: (기사 수, 차원) 크기의 행렬
+    """
+    cache = build_article_cache(df, cache_dir)
+    rows = cache.rows(article_ids(df))
+    if kind == 'embedding':
+        if np.array_equal(rows, np.arange(len(cache))):
+            return cache.embedding  # 메모리 맵 그대로 사용
+        return cache.embedding[rows]
+    if kind == 'style':
+        style = np.asarray(cache.style[rows], dtype=np.float32)
+        style = (style - style.mean(axis=0)) / (style.std(axis=0) + 1e-6)
+        norms = np.linalg.norm(style, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        return style / norms
+    raise ValueError(f'알 수 없는 행렬 종류입니다: {kind}')
+
+
+if __name__ == '__main__':
+    # 인자 파싱
+    parser = argparse.ArgumentParser(description='Score all article pairs with blocked similarity computation.')
+    parser.add_argument('--csv-path', type=str, default="../dataset/preprocessed/filtered_news.csv", help='Path to the CSV file containing news data.')
+    parser.add_argument('--cache-dir', type=str, default="../dataset/cache", help='Path to the article cache root directory.')
+    parser.add_argument('--save-path', type=str, default="../dataset/all_pairs", help='Path to save the score distributions.')
+    parser.add_argument('--matrix', type=str, default='embedding', choices=['embedding', 'style'], help='비교에 사용할 기사 행렬')
+    parser.add_argument('--block-size', type=int, default=DEFAULT_BLOCK_SIZE, help='블록 크기 (메모리 ~ block_size^2 * 4 bytes)')
+    parser.add_argument('--bins', type=int, default=DEFAULT_BINS, help='히스토그램 bin 수')
+    args = parser.parse_args()
+
+    save_path = Path(args.save_path)
+    save_path.mkdir(parents=True, exist_ok=True)
+
+    df = pd.read_csv(Path(args.csv_path), encoding='utf-8')
+    sources = sorted(df['source'].unique())
+    source_codes = pd.Categorical(df['source'], categories=sources).codes.astype(np.int64)
+
+    matrix = load_matrix(df, Path(args.cache_dir), kind=args.matrix)
+
+    start = time.perf_counter()
+    hist = all_pairs_scores(matrix, source_codes, sources, block_size=args.block_size, bins=args.bins)
+    elapsed = time.perf_counter() - start
+    n_pairs = int(hist.counts.sum())
+    print(f'기사 {len(df)}개, 전체 페어 {n_pairs}개 계산 완료 ({elapsed:.2f}초, {n_pairs / max(elapsed, 1e-9):,.0f} pairs/s)')
+
+    overall, per_source = evaluate_all_pairs(hist)
+    print(f'전체 AUC: {overall:.4f}')
+    for source, auc in per_source.items():
+        print(f'  {source}: {auc:.4f}')
+
+    summary = hist.summary()
+    summary_file = save_path / 'pair_distributions.csv'
+    summary.to_csv(summary_file, encoding='utf-8-sig', index=False)
+    np.save(save_path / 'pair_histograms.npy', hist.counts)
+    with open(save_path / 'auc.json', 'w', encoding='utf-8') as f:
+        json.dump({'matrix': args.matrix, 'pairs': n_pairs, 'auc': overall, 'per_source_auc': per_source}, f, ensure_ascii=False, indent=2)
+    print(f'언론사 쌍별 분포가 {summary_file}에 저장되었습니다.')
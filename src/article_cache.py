@@ -0,0 +1,269 @@
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from stylometry import STYLE_FEATURE_NAMES, extract_style_features, fit_char_tfidf
+
+# 상수 지정
+
+CACHE_VERSION = 2
+DEFAULT_EMBEDDING = 'tfidf-svd'
+DEFAULT_EMBEDDING_DIM = 256
+# 전체 기사 집합으로 학습하는 임베딩 (기사별 캐시 불가)
+CORPUS_EMBEDDINGS = ('tfidf-svd',)
+
+
+def article_ids(df: pd.DataFrame) -> np.ndarray:
+    """
+    기사 id 배열을 반환합니다. 'id' 컬럼이 있으면 사용하고, 없으면 인덱스를 사용합니다.
+    :param df: 기사 DataFrame
+    :return: int64 id 배열
+    """
+    ids = df['id'] if 'id' in df.columns else df.index
+    return np.asarray(ids, dtype=np.int64)
+
+
+def content_hashes(df: pd.DataFrame) -> np.ndarray:
+    """
+    기사별 제목·본문 해시를 계산합니다. (기사 id, 내용 해시)가 캐시 행의 키가 됩니다.
+    :param df: 기사 DataFrame
+    :return: uint64 해시 배열
+    """
+    hashes = np.empty(len(df), dtype=np.uint64)
+    for i, (title, text) in enumerate(zip(df['title'].fillna('').astype(str), df['text'].fillna('').astype(str))):
+        digest = hashlib.blake2b(digest_size=8)
+        digest.update(title.encode('utf-8'))
+        digest.update(b'\x00')
+        digest.update(text.encode('utf-8'))
+        hashes[i] = int.from_bytes(digest.digest(), 'little')
+    return hashes
+
+
+def config_key(*config) -> str:
+    """
+    캐시 버전과 설정(특징 이름, 임베딩 종류 등)으로 저장소 디렉토리 이름을 계산합니다.
+    :return: 16자리 16진수 키
+    """
+    return hashlib.blake2b(json.dumps([CACHE_VERSION, *config]).encode('utf-8'), digest_size=8).hexdigest()
+
+
+def corpus_key(ids: np.ndarray, hashes: np.ndarray, embedding: str, dim: int) -> str:
+    """
+    전체 기사 집합에 의존하는 임베딩(tfidf-svd)의 캐시 키를 계산합니다. 기사가 하나라도 추가·수정되면 다른 키가 됩니다.
+    :param ids: 기사 id 배열
+    :param hashes: 기사별 내용 해시 배열
+    :param embedding: 임베딩 종류
+    :param dim: 임베딩 차원
+    :return: 16자리 16진수 키
+    """
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(config_key(embedding, dim).encode('utf-8'))
+    digest.update(ids.tobytes())
+    digest.update(hashes.tobytes())
+    return digest.hexdigest()
+
+
+def _write_arrays(target_dir: Path, arrays: dict):
+    # 임시 디렉토리에 쓴 뒤 이름을 바꿔 중간 상태의 캐시가 보이지 않도록 함
+    tmp_dir = target_dir.with_name(f'{target_dir.name}.tmp{os.getpid()}')
+    tmp_dir.mkdir(parents=True, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(tmp_dir / f'{name}.npy', array)
+    try:
+        os.replace(tmp_dir, target_dir)
+    except OSError:
+        shutil.rmtree(tmp_dir, ignore_errors=True)  # 다른 프로세스가 먼저 만든 경우
+
+
+class RowStore:
+    """
+    (기사 id, 내용 해시)를 키로 하는 기사별 행 저장소.
+    세그먼트 디렉토리(keys: ids.npy·hashes.npy, 값: <이름>.npy)에 나눠 저장하고, 요청한 기사 중 없는 행만 계산해 새 세그먼트로 추가합니다.
+    기사를 추가·수정해도 해당 기사의 행만 다시 계산합니다.
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    def _segments(self) -> list:
+        if not self.root.exists():
+            return []
+        return sorted(p for p in self.root.iterdir() if p.is_dir() and p.name.startswith('seg-') and '.tmp' not in p.name)
+
+    def _index(self, segments: list) -> dict:
+        # (id, 해시) -> (세그먼트 번호, 행 번호)
+        index = {}
+        for seg_no, seg_dir in enumerate(segments):
+            ids, hashes = np.load(seg_dir / 'ids.npy'), np.load(seg_dir / 'hashes.npy')
+            index.update(((i, h), (seg_no, row)) for row, (i, h) in enumerate(zip(ids.tolist(), hashes.tolist())))
+        return index
+
+    def fetch(self, df: pd.DataFrame, ids: np.ndarray, hashes: np.ndarray, name: str, compute) -> np.ndarray:
+        """
+        df 순서대로 기사별 행을 모아 반환합니다. 저장소에 없는 기사만 compute(부분 DataFrame)로 계산해 저장합니다.
+        :param df: 기사 DataFrame
+        :param ids: 기사 id 배열
+        :param hashes: 기사별 내용 해시 배열
+        :param name: 배열 이름 (예: 'style')
+        :param compute: 부분 DataFrame -> (행 수, 차원) float32 행렬 함수
+        :return: (기사 수, 차원) float32 행렬
+        """
+        segments = self._segments()
+        index = self._index(segments)
+        locations = [index.get(key) for key in zip(ids.tolist(), hashes.tolist())]
+        missing = np.array([i for i, loc in enumerate(locations) if loc is None], dtype=np.int64)
+
+        computed = None
+        if len(missing):
+            computed = np.asarray(compute(df.iloc[missing]), dtype=np.float32)
+            seg_dir = self.root / f'seg-{time.time_ns()}-{os.getpid()}'
+            _write_arrays(seg_dir, {'ids': ids[missing], 'hashes': hashes[missing], name: computed})
+
+        width = computed.shape[1] if computed is not None else np.load(segments[0] / f'{name}.npy', mmap_mode='r').shape[1]
+        out = np.empty((len(ids), width), dtype=np.float32)
+        if computed is not None:
+            out[missing] = computed
+        by_segment = {}
+        for i, loc in enumerate(locations):
+            if loc is not None:
+                by_segment.setdefault(loc[0], ([], []))
+                by_segment[loc[0]][0].append(i)
+                by_segment[loc[0]][1].append(loc[1])
+        for seg_no, (targets, rows) in by_segment.items():
+            out[targets] = np.load(segments[seg_no] / f'{name}.npy', mmap_mode='r')[rows]
+        return out
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+
+def compute_embeddings(df: pd.DataFrame, embedding: str = DEFAULT_EMBEDDING, dim: int = DEFAULT_EMBEDDING_DIM, seed: int = 42) -> np.ndarray:
+    """
+    기사별 L2 정규화된 밀집 임베딩을 계산합니다.
+    - 'tfidf-svd': 문자 n-gram TF-IDF를 TruncatedSVD로 축소 (추가 의존성 없음)
+    - 'sentence:<모델명>': sentence-transformers CPU 모델 (설치된 경우)
+    :param df: 기사 DataFrame
+    :param embedding: 임베딩 종류 (기본값: 'tfidf-svd')
+    :param dim: tfidf-svd 차원 (기본값: 256)
+    :param seed: 무작위 시드 값 (기본값: 42)
+    :return: (기사 수, 차원) 크기의 float32 행렬
+    """
+    if embedding == 'tfidf-svd':
+        from sklearn.decomposition import TruncatedSVD
+
+        tfidf = fit_char_tfidf(df)
+        n_components = max(1, min(dim, tfidf.shape[1] - 1, tfidf.shape[0] - 1))
+        reduced = TruncatedSVD(n_components=n_components, random_state=seed).fit_transform(tfidf)
+        return _normalize_rows(reduced).astype(np.float32)
+
+    if embedding.startswith('sentence:'):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError("'sentence:' 임베딩을 사용하려면 sentence-transformers를 설치해주세요.") from e
+
+        model = SentenceTransformer(embedding.split(':', 1)[1], device='cpu')
+        documents = ('[' + df['title'].fillna('').astype(str) + '] ' + df['text'].fillna('').astype(str)).tolist()
+        return model.encode(documents, batch_size=32, normalize_embeddings=True, convert_to_numpy=True).astype(np.float32)
+
+    raise ValueError(f'알 수 없는 임베딩 종류입니다: {embedding}')
+
+
+class ArticleCache:
+    """
+    기사 id별 스타일 특징과 임베딩을 담는 캐시.
+    페어 점수 계산은 id로 행을 찾아 벡터 연산만 수행합니다.
+    """
+
+    def __init__(self, ids: np.ndarray, style: np.ndarray, embedding: np.ndarray):
+        self.ids = ids
+        self.style = style
+        self.embedding = embedding
+        self._order = np.argsort(ids, kind='stable')
+        self._sorted_ids = ids[self._order]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def rows(self, ids) -> np.ndarray:
+        """
+        기사 id 배열을 캐시 행 번호 배열로 변환합니다.
+        :param ids: 기사 id 배열
+        :return: 행 번호 배열 (없는 id가 있으면 KeyError)
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        pos = np.searchsorted(self._sorted_ids, ids).clip(max=len(self._sorted_ids) - 1)
+        found = self._sorted_ids[pos] == ids
+        if not found.all():
+            raise KeyError(f'캐시에 없는 기사 id: {ids[~found][:5].tolist()}')
+        return self._order[pos]
+
+    def similarity(self, ids1, ids2) -> np.ndarray:
+        """
+        두 기사 id 배열의 페어별 코사인 유사도를 계산합니다.
+        :param ids1: 왼쪽 기사 id 배열
+        :param ids2: 오른쪽 기사 id 배열
+        :return: 유사도 배열
+        """
+        return np.einsum('ij,ij->i', self.embedding[self.rows(ids1)], self.embedding[self.rows(ids2)])
+
+
+def build_article_cache(df: pd.DataFrame, cache_root: Path, embedding: str = DEFAULT_EMBEDDING, dim: int = DEFAULT_EMBEDDING_DIM) -> ArticleCache:
+    """
+    기사별 특징·임베딩 캐시를 불러오고, 없는 부분만 계산하여 저장합니다.
+    - 스타일 특징과 'sentence:' 임베딩은 기사마다 독립적이므로 (기사 id, 내용 해시)별 행 저장소(cache_root/rows)를 사용해
+      추가·수정된 기사만 계산합니다.
+    - 'tfidf-svd' 임베딩은 TF-IDF 어휘·IDF와 SVD 기저가 전체 기사 집합에 의존하므로 기사 집합 전체를 키로 하는
+      캐시(cache_root/corpus)이며, 기사가 하나라도 바뀌면 다시 계산합니다.
+    :param df: 기사 DataFrame, 'title', 'text' 컬럼을 포함해야 합니다.
+    :param cache_root: 캐시 루트 디렉토리
+    :param embedding: 임베딩 종류 (기본값: 'tfidf-svd')
+    :param dim: tfidf-svd 차원 (기본값: 256)
+    :return: 캐시
+    """
+    ids = article_ids(df)
+    if len(np.unique(ids)) != len(ids):
+        raise ValueError('기사 id가 중복되어 캐시를 만들 수 없습니다.')
+    hashes = content_hashes(df)
+    cache_root = Path(cache_root)
+
+    style = RowStore(cache_root / 'rows' / f'style-{config_key(STYLE_FEATURE_NAMES)}').fetch(
+        df, ids, hashes, 'style', extract_style_features)
+
+    if embedding in CORPUS_EMBEDDINGS:
+        corpus_dir = cache_root / 'corpus' / corpus_key(ids, hashes, embedding, dim)
+        if not (corpus_dir / 'embedding.npy').exists():
+            _write_arrays(corpus_dir, {'embedding': compute_embeddings(df, embedding=embedding, dim=dim)})
+        vectors = np.load(corpus_dir / 'embedding.npy', mmap_mode='r')
+    else:
+        vectors = RowStore(cache_root / 'rows' / f'embedding-{config_key(embedding)}').fetch(
+            df, ids, hashes, 'embedding', lambda part: compute_embeddings(part, embedding=embedding, dim=dim))
+
+    return ArticleCache(ids, style, vectors)
+
+
+if __name__ == '__main__':
+    # 인자 파싱
+    parser = argparse.ArgumentParser(description='Build the per-article feature and embedding cache.')
+    parser.add_argument('--csv-path', type=str, default="../dataset/preprocessed/filtered_news.csv", help='Path to the CSV file containing news data.')
+    parser.add_argument('--cache-dir', type=str, default="../dataset/cache", help='Path to the cache root directory.')
+    parser.add_argument('--embedding', type=str, default=DEFAULT_EMBEDDING, help="'tfidf-svd' 또는 'sentence:<모델명>'")
+    parser.add_argument('--dim', type=int, default=DEFAULT_EMBEDDING_DIM, help='tfidf-svd 임베딩 차원')
+    args = parser.parse_args()
+
+    df = pd.read_csv(Path(args.csv_path), encoding='utf-8')
+
+    start = time.perf_counter()
+    cache = build_article_cache(df, Path(args.cache_dir), embedding=args.embedding, dim=args.dim)
+    print(f'기사 {len(cache)}개 캐시 준비 완료 ({time.perf_counter() - start:.2f}초)')
+    print(f'스타일 특징: {cache.style.shape}, 임베딩: {cache.embedding.shape}')
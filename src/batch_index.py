@@ -0,0 +1,224 @@
+import json
+import os
+import random
+import re
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional
+
+# batch.jsonl 옆에 저장되는 오프셋 인덱스 (예: batch.jsonl -> batch.jsonl.idx)
+INDEX_SUFFIX = '.idx'
+INDEX_VERSION = 1
+
+# custom_id는 create_jsonl에서 맨 앞 key로 기록되므로 줄 앞부분만 보면 된다
+CUSTOM_ID_PATTERN = re.compile(rb'"custom_id"\s*:\s*"((?:[^"\\]|\\.)*)"')
+CUSTOM_ID_SCAN_BYTES = 256
+
+
+def index_path_for(jsonl_path: Path) -> Path:
+    """
+    jsonl 파일에 대응하는 인덱스 파일 경로를 반환합니다.
+    :param jsonl_path: batch.jsonl 경로
+    :return: 인덱스 파일 경로
+    """
+    jsonl_path = Path(jsonl_path)
+    return jsonl_path.with_name(jsonl_path.name + INDEX_SUFFIX)
+
+
+def gold_label_of(custom_id: str) -> str:
+    """
+    custom_id에서 정답 라벨을 추출합니다. ('same_source_pair_...' -> 'same')
+    :param custom_id: 요청의 custom_id
+    :return: 'same', 'diff' 또는 알 수 없으면 ''
+    """
+    label = custom_id.split('_')[0]
+    return label if label in ('same', 'diff') else ''
+
+
+def _extract_custom_id(line: bytes) -> str:
+    match = CUSTOM_ID_PATTERN.search(line, 0, CUSTOM_ID_SCAN_BYTES)
+    if match:
+        return json.loads(b'"' + match.group(1) + b'"')
+    # key 순서가 다른 파일이면 전체 파싱
+    try:
+        return json.loads(line).get('custom_id', '')
+    except json.JSONDecodeError:
+        return ''
+
+
+class BatchIndex:
+    """
+    batch.jsonl의 각 요청에 대한 바이트 오프셋, 길이, custom_id, 정답 라벨을 담는 인덱스.
+    한 번 만들어 두면 개수 세기, 샘플링, custom_id 조회가 전체 파일을 읽지 않고 필요한 줄만 읽어서 처리됩니다.
+    """
+
+    def __init__(self, jsonl_path: Path, offsets: List[int], lengths: List[int], custom_ids: List[str], gold_labels: List[str]):
+        self.jsonl_path = Path(jsonl_path)
+        self.offsets = offsets
+        self.lengths = lengths
+        self.custom_ids = custom_ids
+        self.gold_labels = gold_labels
+        self._positions = None
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    @classmethod
+    def build(cls, jsonl_path: Path) -> 'BatchIndex':
+        """
+        jsonl 파일을 한 번 순회하여 인덱스를 생성합니다. (빈 줄은 제외)
+        :param jsonl_path: batch.jsonl 경로
+        :return: 생성된 인덱스
+        """
+        offsets, lengths, custom_ids, gold_labels = [], [], [], []
+        offset = 0
+        with open(jsonl_path, 'rb') as f:
+            for line in f:
+                stripped = line.strip()
+                if stripped:
+                    custom_id = _extract_custom_id(stripped)
+                    offsets.append(offset + (len(line) - len(line.lstrip())))
+                    lengths.append(len(stripped))
+                    custom_ids.append(custom_id)
+                    gold_labels.append(gold_label_of(custom_id))
+                offset += len(line)
+        return cls(jsonl_path, offsets, lengths, custom_ids, gold_labels)
+
+    def save(self):
+        """
+        인덱스를 jsonl 파일 옆에 저장합니다. 원본 파일의 크기와 수정 시각을 함께 기록하여 변경 여부를 판단합니다.
+        """
+        stat = self.jsonl_path.stat()
+        meta = {
+            'version': INDEX_VERSION,
+            'source_size': stat.st_size,
+            'source_mtime_ns': stat.st_mtime_ns,
+            'offsets': self.offsets,
+            'lengths': self.lengths,
+            'custom_ids': self.custom_ids,
+            'gold_labels': self.gold_labels,
+        }
+        tmp_path = index_path_for(self.jsonl_path).with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_path, index_path_for(self.jsonl_path))
+
+    @classmethod
+    def load(cls, jsonl_path: Path) -> Optional['BatchIndex']:
+        """
+        저장된 인덱스를 불러옵니다. 인덱스가 없거나 원본 파일이 바뀌었으면 None을 반환합니다.
+        :param jsonl_path: batch.jsonl 경로
+        :return: 인덱스 또는 None
+        """
+        jsonl_path = Path(jsonl_path)
+        idx_path = index_path_for(jsonl_path)
+        if not idx_path.exists():
+            return None
+        try:
+            with open(idx_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+        stat = jsonl_path.stat()
+        if (meta.get('version') != INDEX_VERSION
+                or meta.get('source_size') != stat.st_size
+                or meta.get('source_mtime_ns') != stat.st_mtime_ns):
+            return None
+        return cls(jsonl_path, meta['offsets'], meta['lengths'], meta['custom_ids'], meta['gold_labels'])
+
+    def read_lines(self, indices: Iterable[int]) -> Iterator[str]:
+        """
+        주어진 순번의 줄들을 요청한 순서대로 읽어 반환합니다.
+        :param indices: 읽을 줄의 순번 (0부터, 빈 줄 제외)
+        :return: 줄 문자열 이터레이터 (개행 제외)
+        """
+        with open(self.jsonl_path, 'rb') as f:
+            for i in indices:
+                f.seek(self.offsets[i])
+                yield f.read(self.lengths[i]).decode('utf-8')
+
+    def read_line(self, i: int) -> str:
+        return next(self.read_lines([i]))
+
+    def position(self, custom_id: str) -> int:
+        """
+        custom_id에 해당하는 줄의 순번을 반환합니다.
+        :param custom_id: 찾을 custom_id
+        :return: 줄 순번 (없으면 KeyError)
+        """
+        if self._positions is None:
+            self._positions = {cid: i for i, cid in enumerate(self.custom_ids)}
+        return self._positions[custom_id]
+
+    def lookup(self, custom_id: str) -> dict:
+        """
+        custom_id에 해당하는 요청을 읽어 파싱합니다.
+        :param custom_id: 찾을 custom_id
+        :return: 요청 JSON 객체
+        """
+        return json.loads(self.read_line(self.position(custom_id)))
+
+    def head_tail(self, sample_num: int) -> List[int]:
+        """
+        앞쪽 sample_num/2개(same)와 뒤쪽 나머지(diff)의 순번을 반환합니다.
+        :param sample_num: 샘플 개수
+        :return: 줄 순번 리스트
+        """
+        total = len(self)
+        head = list(range(min(int(sample_num / 2), total)))
+        tail_num = min(int((sample_num + 1) / 2), total)
+        tail = list(range(total - tail_num, total)) if tail_num > 0 else []
+        return head + tail
+
+    def stratified(self, sample_num: int, seed: int = 42) -> List[int]:
+        """
+        정답 라벨 비율을 유지하며 무작위로 sample_num개의 순번을 뽑습니다.
+        :param sample_num: 샘플 개수
+        :param seed: 무작위 시드 값 (기본값: 42)
+        :return: 파일 순서로 정렬된 줄 순번 리스트
+        """
+        rng = random.Random(seed)
+        groups = {}
+        for i, label in enumerate(self.gold_labels):
+            groups.setdefault(label, []).append(i)
+
+        total = len(self)
+        sample_num = min(sample_num, total)
+        # 최대 잉여 방식으로 라벨별 개수 배분
+        quotas = {label: sample_num * len(members) // total for label, members in groups.items()}
+        remainders = sorted(groups, key=lambda label: (sample_num * len(groups[label])) % total, reverse=True)
+        for label in remainders[:sample_num - sum(quotas.values())]:
+            quotas[label] += 1
+
+        picked = []
+        for label, members in groups.items():
+            picked.extend(rng.sample(members, quotas[label]))
+        return sorted(picked)
+
+    def write_subset(self, indices: Iterable[int], save_path: Path) -> Path:
+        """
+        주어진 순번의 줄들만 모아 새로운 jsonl 파일로 저장합니다.
+        :param indices: 저장할 줄 순번
+        :param save_path: 저장할 파일 경로
+        :return: 저장된 파일 경로
+        """
+        with open(save_path, 'w', encoding='utf-8') as f:
+            for line in self.read_lines(indices):
+                f.write(line + '\n')
+        return Path(save_path)
+
+
+def load_index(jsonl_path: Path) -> BatchIndex:
+    """
+    인덱스를 불러오고, 없거나 오래된 경우 새로 만들어 저장합니다.
+    :param jsonl_path: batch.jsonl 경로
+    :return: 인덱스
+    """
+    index = BatchIndex.load(jsonl_path)
+    if index is None:
+        index = BatchIndex.build(jsonl_path)
+        try:
+            index.save()
+        except OSError:
+            pass  # 읽기 전용 위치면 메모리 인덱스만 사용
+    return index
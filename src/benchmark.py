@@ -0,0 +1,268 @@
+import contextlib
+import datetime
+import io
+import json
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from preprocessing import parse_news, deduplicate_news, preprocess_news, randomize_and_sample_news
+from make_jsonl_for_batch import create_pairs, create_jsonl, NEWS_NUMBER_PER_SOURCE
+from stylometry import score_pairs
+
+# 상수 지정
+
+WORDS = (
+    '정부 대통령 국회 의원 여당 야당 경제 시장 금리 물가 수출 기업 투자 주가 부동산 서울 부산 지역 주민 학교 '
+    '교육 학생 병원 환자 의료 선수 경기 감독 우승 영화 배우 공연 가수 팬 기술 인공지능 반도체 스마트폰 플랫폼 '
+    '환경 기후 날씨 태풍 소방 경찰 사건 재판 검찰 정책 예산 회의 발표 계획 지원 확대 추진 협력 조사 결과'
+).split()
+QUOTE_VERBS = ['말했다', '밝혔다', '전했다', '강조했다', '설명했다']
+ADVERBS = ['특히', '또한', '한편', '이에 따라', '이와 관련']
+TITLE_HEADS = ['[단독]', '[포토]', '[속보]', '[인터뷰]', '[종합]']
+SURNAMES = '김이박최정강조윤장임'
+GIVEN_NAMES = ['민수', '서연', '지훈', '하은', '준호', '수빈', '도윤', '예린']
+TOPICS = ['정치', '경제', '사회', '생활/문화', 'IT/과학', '스포츠']
+
+
+def _source_style(source_idx: int, rng: random.Random) -> dict:
+    """
+    합성 언론사별 편집 스타일을 정합니다. (TEST_PROMPT_V2의 형식적·문체적 특징)
+    """
+    return {
+        'name': f'합성일보{source_idx:02d}',
+        'quote_verb': QUOTE_VERBS[source_idx % len(QUOTE_VERBS)],
+        'adverb': ADVERBS[source_idx % len(ADVERBS)],
+        'title_head': source_idx % 3 == 0,
+        'dateline': source_idx % 4 == 1,
+        'email': source_idx % 2 == 0,
+        'korean_number': source_idx % 5 < 2,
+        'sentence_words': rng.randint(6, 14),
+    }
+
+
+def _synthetic_article(style: dict, rng: random.Random, min_chars: int, max_chars: int) -> dict:
+    target = rng.randint(min_chars, max_chars)
+    reporter = rng.choice(SURNAMES) + rng.choice(GIVEN_NAMES)
+
+    sentences = []
+    if style['dateline']:
+        sentences.append(f"(서울={style['name']}) {reporter} 기자 =")
+    length = 0
+    while length < target:
+        words = rng.choices(WORDS, k=max(3, style['sentence_words'] + rng.randint(-3, 3)))
+        roll = rng.random()
+        if roll < 0.25:
+            sentence = f"\"{' '.join(words)}\"라고 {style['quote_verb']}."
+        elif roll < 0.4:
+            number = rng.randint(2, 90)
+            amount = f'{number}천 명' if style['korean_number'] else f'{number * 1000}명'
+            sentence = f"{' '.join(words)} {amount}이 참여했다."
+        elif roll < 0.5:
+            sentence = f"{style['adverb']} {' '.join(words)}했다."
+        else:
+            sentence = f"{' '.join(words)}이다."
+        sentences.append(sentence)
+        length += len(sentence) + 1
+    if style['email']:
+        sentences.append(f'{reporter} 기자 reporter{rng.randint(1, 999)}@synthetic{style["name"][-2:]}.co.kr')
+
+    title = ' '.join(rng.choices(WORDS, k=rng.randint(4, 8)))
+    if style['title_head']:
+        title = f'{rng.choice(TITLE_HEADS)} {title}'
+
+    return {
+        'doc_source': style['name'],
+        'doc_title': title,
+        'paragraphs': [{'context': ' '.join(sentences)}],
+        'doc_class': {'class': rng.choice(TOPICS)},
+    }
+
+
+def generate_corpus(save_path: Path, sources: int = 12, articles_per_source: int = 400, files: int = 8,
+                    min_chars: int = 300, max_chars: int = 1300, seed: int = 42) -> int:
+    """
+    parse_news가 읽는 형식(data/doc_source/doc_title/paragraphs/doc_class)의 합성 한국어 뉴스 JSON 파일을 생성합니다.
+    :param save_path: JSON 파일을 저장할 디렉토리
+    :param sources: 언론사 수 (기본값: 12, create_pairs를 위해 10 이상)
+    :param articles_per_source: 언론사별 기사 수 (기본값: 400)
+    :param files: 나눠 저장할 JSON 파일 수 (기본값: 8)
+    :param min_chars: 최소 본문 길이 (기본값: 300)
+    :param max_chars: 최대 본문 길이 (기본값: 1300)
+    :param seed: 무작위 시드 값 (기본값: 42)
+    :return: 생성된 기사 수
+    """
+    rng = random.Random(seed)
+    styles = [_source_style(i, rng) for i in range(sources)]
+
+    articles = [
+        _synthetic_article(style, rng, min_chars, max_chars)
+        for style in styles
+        for _ in range(articles_per_source)
+    ]
+    rng.shuffle(articles)
+
+    save_path.mkdir(parents=True, exist_ok=True)
+    per_file = -(-len(articles) // files)
+    for file_idx in range(files):
+        chunk = articles[file_idx * per_file:(file_idx + 1) * per_file]
+        with open(save_path / f'synthetic_{file_idx:03d}.json', 'w', encoding='utf-8') as f:
+            json.dump({'data': chunk}, f, ensure_ascii=False)
+    return len(articles)
+
+
+def peak_rss_mb() -> float:
+    """프로세스의 최대 RSS (MB)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 if sys.platform != 'darwin' else peak / (1024 * 1024)  # Linux는 KB, macOS는 bytes
+
+
+def time_stage(results: list, name: str, records: int, func, repeat: int = 1, verbose: bool = False):
+    """
+    단계 함수를 repeat번 실행하여 가장 빠른 시간과 처리량, 최대 RSS를 기록합니다.
+    :param results: 결과를 추가할 리스트
+    :param name: 단계 이름
+    :param records: 단계의 입력 레코드 수 (처리량 계산용, None이면 반환값의 길이)
+    :param func: 인자 없는 단계 함수
+    :param repeat: 반복 횟수 (기본값: 1)
+    :param verbose: 단계 함수의 출력을 그대로 보여줄지 여부
+    :return: 마지막 실행의 반환값
+    """
+    timings = []
+    output = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        if verbose:
+            output = func()
+        else:
+            with contextlib.redirect_stdout(io.StringIO()):
+                output = func()
+        timings.append(time.perf_counter() - start)
+
+    seconds = min(timings)
+    if records is None:
+        records = len(output)
+    results.append({
+        'stage': name,
+        'records': records,
+        'seconds': seconds,
+        'records_per_sec': records / seconds if seconds > 0 else float('inf'),
+        'peak_rss_mb': peak_rss_mb(),
+    })
+    print(f"{name:<10} {records:>10,} records  {seconds:>8.3f}s  {results[-1]['records_per_sec']:>12,.0f} rec/s  RSS {results[-1]['peak_rss_mb']:,.0f}MB")
+    return output
+
+
+def run_benchmark(corpus_path: Path, work_path: Path, repeat: int = 1, verbose: bool = False) -> list:
+    """
+    parse → dedup → filter → sample → pair → serialize → score 단계별 처리 시간을 측정합니다.
+    :param corpus_path: 합성 JSON 파일 디렉토리
+    :param work_path: 중간 산출물(batch.jsonl 등)을 저장할 디렉토리
+    :param repeat: 단계별 반복 횟수 (기본값: 1)
+    :param verbose: 단계 함수의 출력을 그대로 보여줄지 여부
+    :return: 단계별 결과 리스트
+    """
+    results = []
+    df = time_stage(results, 'parse', None, lambda: parse_news(corpus_path), repeat, verbose)
+    df_dedup = time_stage(results, 'dedup', len(df), lambda: deduplicate_news(df), repeat, verbose)
+    df_filtered = time_stage(results, 'filter', len(df_dedup), lambda: preprocess_news(df_dedup.copy()), repeat, verbose)
+    df_sampled = time_stage(results, 'sample', len(df_filtered), lambda: randomize_and_sample_news(df_filtered, sample_size=NEWS_NUMBER_PER_SOURCE), repeat, verbose)
+    same_pairs, diff_pairs = time_stage(results, 'pair', len(df_sampled), lambda: create_pairs(df_sampled), repeat, verbose)
+    n_pairs = len(same_pairs) + len(diff_pairs)
+    time_stage(results, 'serialize', n_pairs, lambda: create_jsonl(same_pairs, diff_pairs, work_path), repeat, verbose)
+    time_stage(results, 'score', n_pairs, lambda: score_pairs(df_sampled, same_pairs, diff_pairs), repeat, verbose)
+
+    return results
+
+
+def compare_results(results: list, baseline_path: Path, tolerance: float = 0.2) -> bool:
+    """
+    이전 벤치마크 결과와 단계별 처리 시간을 비교하여 출력합니다.
+    :param results: 현재 단계별 결과
+    :param baseline_path: 비교할 이전 결과 JSON 경로
+    :param tolerance: 이 비율 이상 느려지면 회귀로 판단 (기본값: 0.2)
+    :return: 회귀가 없으면 True
+    """
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = {stage['stage']: stage for stage in json.load(f)['stages']}
+
+    ok = True
+    print(f'\n[비교] 기준: {baseline_path}')
+    for stage in results:
+        base = baseline.get(stage['stage'])
+        if base is None or base['seconds'] == 0:
+            continue
+        ratio = stage['seconds'] / base['seconds']
+        flag = ''
+        if ratio > 1 + tolerance:
+            flag = '  <-- 회귀'
+            ok = False
+        print(f"{stage['stage']:<10} {base['seconds']:>8.3f}s -> {stage['seconds']:>8.3f}s  (x{ratio:.2f}){flag}")
+    return ok
+
+
+if __name__ == '__main__':
+    # 인자 파싱
+    parser = argparse.ArgumentParser(description='Benchmark each pipeline stage on a synthetic Korean news corpus.')
+    parser.add_argument('--corpus-path', type=str, default=None, help='합성 코퍼스 디렉토리 (없으면 임시 디렉토리에 생성)')
+    parser.add_argument('--sources', type=int, default=12, help='합성 언론사 수 (10 이상)')
+    parser.add_argument('--articles-per-source', type=int, default=400, help='언론사별 합성 기사 수')
+    parser.add_argument('--files', type=int, default=8, help='합성 JSON 파일 수')
+    parser.add_argument('--seed', type=int, default=42, help='무작위 시드 값')
+    parser.add_argument('--repeat', type=int, default=1, help='단계별 반복 횟수 (가장 빠른 시간 기록)')
+    parser.add_argument('--save-path', type=str, default="../dataset/benchmark", help='Path to save the benchmark result JSON.')
+    parser.add_argument('--compare', type=str, default=None, help='비교할 이전 벤치마크 결과 JSON')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='회귀로 판단할 느려짐 비율')
+    parser.add_argument('--verbose', action='store_true', help='단계 함수의 출력 표시')
+    args = parser.parse_args()
+
+    if args.sources < 10:
+        raise ValueError('create_pairs는 10개 언론사를 가정하므로 --sources는 10 이상이어야 합니다.')
+
+    save_path = Path(args.save_path)
+    save_path.mkdir(parents=True, exist_ok=True)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        corpus_path = Path(args.corpus_path) if args.corpus_path else Path(tmp_dir) / 'corpus'
+        if not corpus_path.exists() or not any(corpus_path.glob('*.json')):
+            start = time.perf_counter()
+            n_articles = generate_corpus(corpus_path, sources=args.sources, articles_per_source=args.articles_per_source,
+                                         files=args.files, seed=args.seed)
+            print(f'합성 기사 {n_articles:,}개 생성 ({time.perf_counter() - start:.2f}초): {corpus_path}')
+        print('-'*50)
+
+        results = run_benchmark(corpus_path, Path(tmp_dir) / 'batch', repeat=args.repeat, verbose=args.verbose)
+
+    report = {
+        'created_at': datetime.datetime.now().isoformat(timespec='seconds'),
+        'config': {
+            'sources': args.sources,
+            'articles_per_source': args.articles_per_source,
+            'files': args.files,
+            'seed': args.seed,
+            'repeat': args.repeat,
+        },
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+        },
+        'stages': results,
+    }
+    result_file = save_path / f"bench_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(result_file, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print('-'*50)
+    print(f'벤치마크 결과가 {result_file}에 저장되었습니다.')
+
+    if args.compare and not compare_results(results, Path(args.compare), tolerance=args.tolerance):
+        sys.exit(1)
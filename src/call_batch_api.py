@@ -1,35 +1,39 @@
-from openai import OpenAI, APIError
 from pathlib import Path
 import pandas as pd
 import json
 import time
-from sklearn.metrics import confusion_matrix, classification_report, matthews_corrcoef
+
+from batch_index import load_index
+from verdict import parse_output
+
+# openai, sklearn은 import에 수백 ms~1초 이상 걸리므로 실제로 사용할 때 import
 
 # API key 설정 필요
 # export OPENAI_API_KEY=""
 # export OPENAI_ORGANIZATION=""
+# 오프라인 테스트: python local_server.py 실행 후
+# export OPENAI_BASE_URL="http://127.0.0.1:8000/v1" OPENAI_API_KEY="local"
 
-# openai 객체 생성
-try:
-    client = OpenAI()
-except APIError as e:
-    print(f'OpenAI 클라이언트 초기화 실패: {e}')
-    exit()
+_client = None
 
 # 변수·상수
-jsonl_path = Path('../dataset/preprocessed/batch.jsonl')
-output_jsonl_path = Path('../dataset/preprocessed/batch_output.jsonl')
-output_csv_path = Path('../dataset/preprocessed/batch_output.csv')
+# make_jsonl_for_batch.py의 저장 경로(../dataset/batch)와 동일하게 맞춤
+jsonl_path = Path('../dataset/batch/batch.jsonl')
+output_jsonl_path = Path('../dataset/batch/batch_output.jsonl')
+output_csv_path = Path('../dataset/batch/batch_output.csv')
 batch_id = ''
-d = {
-    'custom_id': [],  # ex: "same_source_pair_0000"
-    'gold_label': [],  # ["same", "diff"]
-    'pred_raw': [],  # ["True", "False"] (모델 출력1)
-    'pred_label': [],  # ["same", "diff", ""] (pred_raw에서 이상한 거 출력 시 -> "")
-    'is_success': [],  # [True, False]
-    'analysis_text': [],  # text (모델 출력2)
-    'is_error': []
-}
+
+def get_client():
+    # openai 객체 생성 (처음 호출할 때 한 번만)
+    global _client
+    if _client is None:
+        from openai import OpenAI, OpenAIError
+        try:
+            _client = OpenAI()
+        except OpenAIError as e:
+            # exit()은 파이프라인 스레드 풀 안에서 SystemExit가 되므로 예외로 알림
+            raise RuntimeError(f'OpenAI 클라이언트 초기화 실패: {e}') from e
+    return _client
 
 def input_batch_id(client, limit=10):
     # batch list 불러오기
@@ -59,7 +63,9 @@ def input_batch_id(client, limit=10):
     return batch_id
 
 def show_statistics(df, labels=['same','diff']):
-    print(f'*에러가 아닌 케이스만 통계로 수집 (error case: {len(df[df['is_error']])})\n')
+    from sklearn.metrics import confusion_matrix, classification_report, matthews_corrcoef
+
+    print(f'*에러가 아닌 케이스만 통계로 수집 (error case: {int(df["is_error"].sum())})\n')
     df = df[~df['is_error']]
 
     print('[Confusion Matrix]')
@@ -81,17 +87,15 @@ def show_statistics(df, labels=['same','diff']):
 def create_batch_job(jsonl_path, sample_num=0):
     # 샘플 처리
     if sample_num > 0:
-        with jsonl_path.open('r', encoding='utf-8') as f:
-            content = f.read().strip().split('\n')
-        head = content[:int(sample_num/2)] # same
-        tail = content[-int((sample_num+1)/2):] # diff
+        index = load_index(jsonl_path)
+        sample_idx = index.head_tail(sample_num) # 앞쪽 절반 same, 뒤쪽 절반 diff
 
         sample_jsonl_path = jsonl_path.parent / 'sample_batch.jsonl'
-        with sample_jsonl_path.open('w', encoding='utf-8') as f:
-            for line in head+tail:
-                f.write(line+'\n')
+        index.write_subset(sample_idx, sample_jsonl_path)
         jsonl_path = sample_jsonl_path
 
+    client = get_client()
+
     # 파일 업로드
     try:
         batch_input_file = client.files.create(
@@ -99,9 +103,8 @@ def create_batch_job(jsonl_path, sample_num=0):
             purpose='batch'
         )
         print(f'--- 파일 업로드 완료 (file id: {batch_input_file.id})')
-    except:
-        print('파일 업로드 중 오류 발생')
-        exit()
+    except Exception as e:
+        raise RuntimeError(f'파일 업로드 중 오류 발생 ({jsonl_path}): {e}') from e
 
     # 배치 API 호출
     batch_job = client.batches.create(
@@ -112,7 +115,19 @@ def create_batch_job(jsonl_path, sample_num=0):
     print(f'--- 배치 업로드 완료 (batch id: {batch_job.id})')
     return batch_job.id
 
-def monitor_batch_job(batch_id):
+def monitor_batch_job(batch_id, output_jsonl_path=output_jsonl_path, output_csv_path=output_csv_path):
+    d = {
+        'custom_id': [],  # ex: "same_source_pair_0000"
+        'gold_label': [],  # ["same", "diff"]
+        'pred_raw': [],  # ["True", "False"] (모델 출력1)
+        'pred_label': [],  # ["same", "diff", ""] (pred_raw에서 이상한 거 출력 시 -> "")
+        'is_success': [],  # [True, False]
+        'analysis_text': [],  # text (모델 출력2)
+        'is_error': []
+    }
+
+    client = get_client()
+
     # 15초마다 현황 확인
     while True:
         try: batch_job = client.batches.retrieve(batch_id)
@@ -129,7 +144,7 @@ def monitor_batch_job(batch_id):
             print('-' * 50)
             print('배치 API 수행 중 오류 발생 (failed or cancelled)')
             print('-' * 50)
-            exit()
+            return
         time.sleep(15)
 
     if batch_job.status == 'completed':
@@ -158,32 +173,25 @@ def monitor_batch_job(batch_id):
                 gold_label = custom_id.split('_')[0]  # 'same' or 'diff'
                 response_body = line.get('response', {}).get('body', {})
                 if response_body and 'choices' in response_body:
-                    response_json_str = response_body.get('choices', [])[0].get('message', {}).get('content', '')
-                    try:
-                        response_json = json.loads(response_json_str)
-                    except json.decoder.JSONDecodeError as e:
-                        print(f'모델이 답변한 JSON 파싱 중 오류 발생: {e}')
-                        print('v'*30)
-                        print(response_body.get('choices', [])[0].get('message', {}).get('content', ''))
-                        print('^'*30)
-                        response_json = {}
-                        is_error = True
-                    analysis = response_json.get('분석', '')
-                    answer = response_json.get('답변', '')
+                    content = response_body.get('choices', [])[0].get('message', {}).get('content', '') or ''
+                    # JSON이면 구조상의 '답변' key, 깨진 출력이면 문자열 값 바깥의 첫 '답변' key를 사용 (코드 블록, "True", 예/아니오, 잘린 출력 허용)
+                    answer, analysis = parse_output(content)
 
                     # 딕셔너리에 저장 (DataFrame 용)
                     d['custom_id'].append(custom_id)
                     d['gold_label'].append(gold_label)
-                    d['pred_raw'].append(answer)
+                    d['pred_raw'].append('' if answer is None else answer)
                     d['analysis_text'].append(analysis)
 
-                    if answer == True:
-                        d['pred_label'].append('same')
-                    elif answer == False:
-                        d['pred_label'].append('diff')
-                    else:
+                    if answer is None:
+                        print('모델 답변에서 답변 값을 찾지 못함')
+                        print('v'*30)
+                        print(content)
+                        print('^'*30)
                         d['pred_label'].append('')
                         is_error = True
+                    else:
+                        d['pred_label'].append('same' if answer else 'diff')
 
                     if d['gold_label'][-1] == d['pred_label'][-1]:
                         d['is_success'].append(True)
@@ -226,6 +234,8 @@ def monitor_batch_job(batch_id):
             error_file_content = client.files.content(error_file_id).read()
             print(error_file_content.decode('utf-8'))
 
+        return pd.DataFrame(d)
+
 def main():
     batch_id = ''
 
@@ -256,7 +266,7 @@ def main():
     # BATCH 실시간 현황 체크
     elif option == '2':
         if not batch_id:
-            batch_id = input_batch_id(client)
+            batch_id = input_batch_id(get_client())
             if not batch_id: return
         monitor_batch_job(batch_id)
 
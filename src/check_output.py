@@ -3,6 +3,8 @@ from typing import Tuple, Dict, Any
 import argparse
 import pathlib
 
+from verdict import verdict_label
+
 
 def check_output(file_path: str):
     ids_set = set()
@@ -37,23 +39,26 @@ def check_output(file_path: str):
 
             count["total"] += 1
 
-            if "parse_error" in entry["response"].keys():
+            # Older outputs have no "verdict" field, so parse the raw model text the same way run_local does
+            if "verdict" in entry:
+                pred_label = entry["verdict"]
+            else:
+                pred_label = verdict_label(entry.get("raw_output", ""))
+
+            if not pred_label:
                 count["errors"] += 1
                 print(f"Error found for ID {custom_id} at line {line_num}")
 
             else:
                 count["success"] += 1
 
-                pred_label = entry["response"].get("답변", None)
-
-
-                if pred_label:
+                if pred_label == "same":
                     if "same" in custom_id:
                         count["pred_same"]["true_same"] += 1
                     else:
                         count["pred_same"]["true_diff"] += 1
 
-                elif not pred_label:
+                else:
                     if "same" in custom_id:
                         count["pred_diff"]["true_same"] += 1
                     else:
@@ -101,7 +106,7 @@ def check_output(file_path: str):
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Check JSONL output for duplicates and missing fields.")
-    parser.add_argument("--file-path", type=str, help="Path to the JSON output file.", default="./dataset/batch/output.jsonl")
+    parser.add_argument("--file-path", type=str, help="Path to the JSON output file.", default="../dataset/batch/output.jsonl")
     args = parser.parse_args()
 
     file_path = pathlib.Path(args.file_path)
@@ -0,0 +1,95 @@
+import argparse
+import runpy
+import subprocess
+import sys
+from pathlib import Path
+
+# 명령 이름: (모듈, 설명)
+# 여기서는 모듈을 import하지 않으므로 `python cli.py --help`는 표준 라이브러리만 불러옵니다.
+COMMANDS = {
+    'preprocess': ('preprocessing', '원본 뉴스 파싱·중복 제거·필터링·샘플링'),
+    'make-jsonl': ('make_jsonl_for_batch', '페어 생성·검증 및 배치 요청 JSONL 생성'),
+    'estimate': ('estimate_cost', '배치 파일의 토큰·비용·샤드 추정'),
+    'batch': ('call_batch_api', 'OpenAI Batch API 호출·모니터링'),
+    'check': ('check_output', '로컬 추론 결과 확인'),
+    'local': ('run_local', 'llama.cpp 로컬 추론'),
+    'pool': ('local_pool', '여러 워커 프로세스로 로컬 추론'),
+    'serve': ('local_server', 'OpenAI 호환 로컬 테스트 서버'),
+    'stylometry': ('stylometry', '스타일 특징 분류기로 페어 점수 계산'),
+    'cache': ('article_cache', '기사별 특징·임베딩 캐시 생성'),
+    'all-pairs': ('all_pairs', '전체 기사 쌍 유사도 분포와 AUC'),
+    'adaptive': ('adaptive', '신뢰구간이 좁아지면 조기 종료하는 평가'),
+    'verdict': ('verdict', '답변 파서와 기존 json.loads 방식 비교'),
+    'benchmark': ('benchmark', '합성 코퍼스로 단계별 성능 측정'),
+    'pipeline': ('pipeline', '캐시되는 전체 파이프라인 실행'),
+}
+
+DEFAULT_IMPORT_BUDGET_MS = 500.0
+
+
+def measure_import_ms(module: str) -> float:
+    """
+    새 인터프리터에서 `python -X importtime`으로 모듈의 누적 import 시간을 측정합니다.
+    :param module: 모듈 이름
+    :return: 누적 import 시간 (ms), import에 실패하면 nan
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=Path(__file__).parent, capture_output=True, text=True)
+    if result.returncode != 0:
+        return float('nan')
+    for line in reversed(result.stderr.splitlines()):
+        # import time: self [us] | cumulative | imported package
+        parts = line.split('|')
+        if len(parts) == 3 and parts[2].strip() == module:
+            return int(parts[1]) / 1000
+    return float('nan')
+
+
+def check_import_times(budget_ms: float = DEFAULT_IMPORT_BUDGET_MS) -> bool:
+    """
+    모든 명령 모듈의 import 시간을 출력하고 예산 안인지 확인합니다.
+    :param budget_ms: 모듈당 import 시간 예산 (ms)
+    :return: 모든 모듈이 import되고 예산 안이면 True
+    """
+    ok = True
+    for command, (module, _) in COMMANDS.items():
+        elapsed = measure_import_ms(module)
+        if elapsed != elapsed:  # nan: 의존성 누락 등으로 import 실패
+            status = 'import 실패'
+            ok = False
+        elif elapsed > budget_ms:
+            status = '예산 초과'
+            ok = False
+        else:
+            status = 'ok'
+        print(f'{command:<12} {module:<22} {elapsed:>9.1f} ms  {status}')
+    return ok
+
+
+def main(argv: list = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+
+    if argv and argv[0] == 'import-times':
+        parser = argparse.ArgumentParser(prog='cli.py import-times', description='Check import time of every command module.')
+        parser.add_argument('--budget-ms', type=float, default=DEFAULT_IMPORT_BUDGET_MS, help='모듈당 import 시간 예산 (ms)')
+        args = parser.parse_args(argv[1:])
+        return 0 if check_import_times(args.budget_ms) else 1
+
+    if not argv or argv[0] in ('-h', '--help') or argv[0] not in COMMANDS:
+        if argv and argv[0] not in ('-h', '--help'):
+            print(f'알 수 없는 명령입니다: {argv[0]}\n')
+        print('usage: python cli.py <command> [args ...]\n\ncommands:')
+        for command, (module, description) in COMMANDS.items():
+            print(f'  {command:<12} {description} ({module}.py)')
+        print(f'  {"import-times":<12} 명령 모듈별 import 시간 확인 (python -X importtime)')
+        return 0 if not argv or argv[0] in ('-h', '--help') else 2
+
+    # 선택한 스크립트만 import하여 `python <module>.py args ...`와 똑같이 실행
+    module = COMMANDS[argv[0]][0]
+    sys.argv = [f'{module}.py'] + argv[1:]
+    runpy.run_module(module, run_name='__main__', alter_sys=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,276 @@
+import json
+import math
+import os
+from collections import Counter
+from functools import lru_cache
+from multiprocessing import Pool
+from pathlib import Path
+from typing import Dict, List, Tuple
+import argparse
+import time
+
+from batch_index import load_index
+
+# 상수 지정
+
+# USD / 1M tokens (표준 가격, 2025-06 기준). Batch API는 BATCH_DISCOUNT만큼 할인
+PRICING = {
+    'gpt-4.1': {'input': 2.00, 'output': 8.00},
+    'gpt-4.1-mini': {'input': 0.40, 'output': 1.60},
+    'gpt-4.1-nano': {'input': 0.10, 'output': 0.40},
+    'gpt-4o': {'input': 2.50, 'output': 10.00},
+    'gpt-4o-mini': {'input': 0.15, 'output': 0.60},
+}
+BATCH_DISCOUNT = 0.5
+
+# Batch API 제한
+MAX_REQUESTS_PER_BATCH = 50_000
+MAX_BATCH_FILE_BYTES = 200 * 1024 * 1024
+
+# chat 형식 오버헤드 (OpenAI cookbook 기준)
+TOKENS_PER_MESSAGE = 3
+TOKENS_PER_NAME = 1
+TOKENS_REPLY_PRIMING = 3
+
+DEFAULT_ENCODING = 'o200k_base'
+
+_encoder = None
+
+
+def price_for(model: str) -> Dict[str, float]:
+    """
+    모델 이름에 맞는 가격을 찾습니다. 날짜가 붙은 스냅샷 이름(gpt-4.1-2025-04-14)은 가장 긴 접두사로 매칭합니다.
+    :param model: 모델 이름
+    :return: {'input': 가격, 'output': 가격} 또는 빈 dict
+    """
+    matches = [name for name in PRICING if model == name or model.startswith(name + '-')]
+    return PRICING[max(matches, key=len)] if matches else {}
+
+
+def load_encoder(encoding_name: str):
+    """
+    tiktoken 인코더를 불러옵니다. tiktoken이 없거나 BPE 파일을 받을 수 없으면(오프라인) None을 반환합니다.
+    tiktoken은 선택 의존성이라 requirements.txt에 넣지 않았습니다. 정확한 토큰 수가 필요하면 따로 설치해주세요. (pip install tiktoken)
+    BPE 파일은 tiktoken이 디스크에 캐시하므로 워커 프로세스들은 다시 받지 않습니다.
+    :param encoding_name: 인코딩 이름
+    :return: 인코더 또는 None
+    """
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(encoding_name)
+    except ImportError:
+        return None
+    except Exception as e:
+        print(f'tiktoken 인코딩({encoding_name})을 불러오지 못했습니다: {e.__class__.__name__}')
+        return None
+
+
+def _init_worker(encoding_name: str):
+    global _encoder
+    _encoder = load_encoder(encoding_name) if encoding_name else None
+    # fork로 복사된 캐시는 다른 인코더로 센 값일 수 있음
+    count_repeated_tokens.cache_clear()
+
+
+def count_text_tokens(text: str) -> int:
+    """
+    텍스트의 토큰 수를 계산합니다.
+    tiktoken이 없으면 근사치(한글 등 비ASCII 문자 0.8토큰, ASCII 4자당 1토큰)를 사용합니다.
+    :param text: 토큰화할 텍스트
+    :return: 토큰 수
+    """
+    if _encoder is not None:
+        return len(_encoder.encode(text, disallowed_special=()))
+    non_ascii = sum(1 for ch in text if ord(ch) > 127)
+    return math.ceil(non_ascii * 0.8 + (len(text) - non_ascii) / 4)
+
+
+@lru_cache(maxsize=64)
+def count_repeated_tokens(text: str) -> int:
+    """
+    시스템 프롬프트, name처럼 요청마다 반복되는 짧은 텍스트의 토큰 수를 캐시하여 계산합니다.
+    기사 본문이 들어간 프롬프트는 거의 반복되지 않으므로 count_text_tokens를 사용합니다.
+    :param text: 토큰화할 텍스트
+    :return: 토큰 수
+    """
+    return count_text_tokens(text)
+
+
+def count_request_tokens(body: dict) -> int:
+    """
+    chat completion 요청 body의 입력 토큰 수를 계산합니다.
+    :param body: batch.jsonl의 'body'
+    :return: 입력 토큰 수
+    """
+    tokens = TOKENS_REPLY_PRIMING
+    for message in body.get('messages', []):
+        tokens += TOKENS_PER_MESSAGE
+        content = message.get('content', '')
+        if isinstance(content, list):  # 멀티파트 content
+            content = ''.join(part.get('text', '') for part in content if isinstance(part, dict))
+        # 시스템 프롬프트는 모든 요청에 같으므로 캐시, 기사가 들어간 user 메시지는 매번 계산
+        count = count_repeated_tokens if message.get('role') == 'system' else count_text_tokens
+        tokens += count(content)
+        if 'name' in message:
+            tokens += TOKENS_PER_NAME + count_repeated_tokens(message['name'])
+    return tokens
+
+
+def _estimate_range(task: Tuple[str, int, int]) -> dict:
+    """
+    jsonl 파일의 [start, end) 바이트 구간에 있는 요청들의 토큰 수를 집계합니다. (워커 프로세스에서 실행)
+    """
+    jsonl_path, start, end = task
+    stats = {'requests': 0, 'bytes': end - start, 'input_tokens': 0, 'max_output_tokens': 0,
+             'max_request_tokens': 0, 'models': Counter(), 'model_input_tokens': Counter(), 'model_output_tokens': Counter()}
+    with open(jsonl_path, 'rb') as f:
+        f.seek(start)
+        chunk = f.read(end - start)
+
+    for line in chunk.splitlines():
+        if not line.strip():
+            continue
+        body = json.loads(line).get('body', {})
+        model = body.get('model', '')
+        input_tokens = count_request_tokens(body)
+        output_tokens = body.get('max_completion_tokens') or body.get('max_tokens') or 0
+
+        stats['requests'] += 1
+        stats['input_tokens'] += input_tokens
+        stats['max_output_tokens'] += output_tokens
+        stats['max_request_tokens'] = max(stats['max_request_tokens'], input_tokens + output_tokens)
+        stats['models'][model] += 1
+        stats['model_input_tokens'][model] += input_tokens
+        stats['model_output_tokens'][model] += output_tokens
+    return stats
+
+
+def split_ranges(jsonl_path: Path, chunk_requests: int) -> List[Tuple[str, int, int]]:
+    """
+    오프셋 인덱스로 jsonl 파일을 요청 chunk_requests개 단위의 바이트 구간으로 나눕니다.
+    :param jsonl_path: batch.jsonl 경로
+    :param chunk_requests: 구간당 요청 수
+    :return: (경로, 시작 바이트, 끝 바이트) 리스트
+    """
+    index = load_index(jsonl_path)
+    ranges = []
+    for first in range(0, len(index), chunk_requests):
+        last = min(first + chunk_requests, len(index)) - 1
+        ranges.append((str(jsonl_path), index.offsets[first], index.offsets[last] + index.lengths[last]))
+    return ranges
+
+
+def estimate_batch(jsonl_path: Path, workers: int = None, chunk_requests: int = 2000, encoding: str = DEFAULT_ENCODING) -> dict:
+    """
+    batch.jsonl의 모든 요청을 로컬에서 토큰화하여 입력 토큰 합계와 최대 출력 토큰 합계를 계산합니다.
+    :param jsonl_path: batch.jsonl 경로
+    :param workers: 워커 프로세스 수 (기본값: CPU 수)
+    :param chunk_requests: 워커에 한 번에 넘길 요청 수 (기본값: 2000)
+    :param encoding: tiktoken 인코딩 이름 (기본값: 'o200k_base', gpt-4o/4.1 계열)
+    :return: 집계 결과 dict
+    """
+    ranges = split_ranges(jsonl_path, chunk_requests)
+    if load_encoder(encoding) is None:
+        encoding = None  # 근사치 사용
+    totals = {'requests': 0, 'bytes': 0, 'input_tokens': 0, 'max_output_tokens': 0,
+              'max_request_tokens': 0, 'models': Counter(), 'model_input_tokens': Counter(), 'model_output_tokens': Counter()}
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(ranges) <= 1:
+        _init_worker(encoding)
+        partials = [_estimate_range(task) for task in ranges]
+    else:
+        with Pool(processes=min(workers, len(ranges)), initializer=_init_worker, initargs=(encoding,)) as pool:
+            partials = list(pool.imap_unordered(_estimate_range, ranges))
+
+    for stats in partials:
+        for key in ('requests', 'bytes', 'input_tokens', 'max_output_tokens'):
+            totals[key] += stats[key]
+        totals['max_request_tokens'] = max(totals['max_request_tokens'], stats['max_request_tokens'])
+        for key in ('models', 'model_input_tokens', 'model_output_tokens'):
+            totals[key].update(stats[key])
+
+    totals['tokenizer'] = encoding or 'approximate'
+    return totals
+
+
+def project_cost(totals: dict, batch: bool = True, input_price: float = None, output_price: float = None) -> dict:
+    """
+    모델별 토큰 수로 예상 비용을 계산합니다. 출력 비용은 max_tokens를 모두 쓴다고 가정한 상한입니다.
+    :param totals: estimate_batch의 결과
+    :param batch: Batch API 할인 적용 여부 (기본값: True)
+    :param input_price: 입력 가격 직접 지정 (USD / 1M tokens)
+    :param output_price: 출력 가격 직접 지정 (USD / 1M tokens)
+    :return: {'input_usd', 'output_usd_max', 'total_usd_max', 'unknown_models'}
+    """
+    discount = BATCH_DISCOUNT if batch else 1.0
+    cost = {'input_usd': 0.0, 'output_usd_max': 0.0, 'unknown_models': []}
+    for model in totals['models']:
+        price = dict(price_for(model))
+        if input_price is not None:
+            price['input'] = input_price
+        if output_price is not None:
+            price['output'] = output_price
+        if 'input' not in price or 'output' not in price:
+            cost['unknown_models'].append(model)
+            continue
+        cost['input_usd'] += totals['model_input_tokens'][model] / 1e6 * price['input'] * discount
+        cost['output_usd_max'] += totals['model_output_tokens'][model] / 1e6 * price['output'] * discount
+    cost['total_usd_max'] = cost['input_usd'] + cost['output_usd_max']
+    return cost
+
+
+def plan_shards(totals: dict, enqueued_token_limit: int = None) -> dict:
+    """
+    Batch API 제한(요청 수, 파일 크기, 대기 토큰 수)을 넘지 않도록 필요한 샤드 수를 계산합니다.
+    :param totals: estimate_batch의 결과
+    :param enqueued_token_limit: 조직 등급별 모델당 대기 입력 토큰 한도 (없으면 무시)
+    :return: {'shards', 'by_requests', 'by_bytes', 'by_tokens', 'requests_per_shard'}
+    """
+    by_requests = math.ceil(totals['requests'] / MAX_REQUESTS_PER_BATCH)
+    by_bytes = math.ceil(totals['bytes'] / MAX_BATCH_FILE_BYTES)
+    by_tokens = math.ceil(totals['input_tokens'] / enqueued_token_limit) if enqueued_token_limit else 1
+    shards = max(by_requests, by_bytes, by_tokens, 1)
+    return {
+        'shards': shards,
+        'by_requests': by_requests,
+        'by_bytes': by_bytes,
+        'by_tokens': by_tokens,
+        'requests_per_shard': math.ceil(totals['requests'] / shards),
+    }
+
+
+if __name__ == '__main__':
+    # 인자 파싱
+    parser = argparse.ArgumentParser(description='Estimate tokens, cost and shards for a batch JSONL before submission.')
+    parser.add_argument('--jsonl-path', type=str, default="../dataset/batch/batch.jsonl", help='Path to the batch JSONL file.')
+    parser.add_argument('--workers', type=int, default=None, help='워커 프로세스 수 (기본값: CPU 수)')
+    parser.add_argument('--encoding', type=str, default=DEFAULT_ENCODING, help='tiktoken 인코딩 이름')
+    parser.add_argument('--realtime', action='store_true', help='Batch API 할인 없이 계산')
+    parser.add_argument('--input-price', type=float, default=None, help='입력 가격 직접 지정 (USD / 1M tokens)')
+    parser.add_argument('--output-price', type=float, default=None, help='출력 가격 직접 지정 (USD / 1M tokens)')
+    parser.add_argument('--enqueued-token-limit', type=int, default=None, help='모델당 대기 입력 토큰 한도 (조직 등급별)')
+    args = parser.parse_args()
+
+    jsonl_path = Path(args.jsonl_path)
+
+    start = time.perf_counter()
+    totals = estimate_batch(jsonl_path, workers=args.workers, encoding=args.encoding)
+    elapsed = time.perf_counter() - start
+    cost = project_cost(totals, batch=not args.realtime, input_price=args.input_price, output_price=args.output_price)
+    shards = plan_shards(totals, enqueued_token_limit=args.enqueued_token_limit)
+
+    print(f"요청 {totals['requests']:,}개 토큰화 완료 ({elapsed:.2f}초, 토크나이저: {totals['tokenizer']})")
+    if totals['tokenizer'] == 'approximate':
+        print('*tiktoken을 사용할 수 없어 근사치로 계산했습니다. (pip install tiktoken, 최초 1회 인코딩 파일 다운로드 필요)')
+    print('-'*50)
+    for model, count in totals['models'].most_common():
+        print(f"{model}: 요청 {count:,}개, 입력 {totals['model_input_tokens'][model]:,} tokens, 최대 출력 {totals['model_output_tokens'][model]:,} tokens")
+    print(f"입력 토큰 합계:      {totals['input_tokens']:,}")
+    print(f"최대 출력 토큰 합계: {totals['max_output_tokens']:,}")
+    print(f"요청당 평균 입력:    {totals['input_tokens'] / max(totals['requests'], 1):,.1f} tokens")
+    print('-'*50)
+    print(f"예상 비용 ({'Realtime' if args.realtime else 'Batch'}): 입력 ${cost['input_usd']:,.2f} + 출력(상한) ${cost['output_usd_max']:,.2f} = ${cost['total_usd_max']:,.2f}")
+    if cost['unknown_models']:
+        print(f"*가격 정보가 없는 모델 (--input-price/--output-price로 지정): {cost['unknown_models']}")
+    print(f"필요 샤드 수: {shards['shards']} (요청 수 기준 {shards['by_requests']}, 파일 크기 기준 {shards['by_bytes']}, 토큰 기준 {shards['by_tokens']}) -> 샤드당 약 {shards['requests_per_shard']:,}개 요청")
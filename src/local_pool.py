@@ -0,0 +1,329 @@
+import argparse
+import json
+import multiprocessing as mp
+import os
+import pathlib
+import queue
+import time
+from collections import deque
+from typing import Any, Dict, List
+
+from rich.console import Console
+from rich.panel import Panel
+from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, TaskProgressColumn, TimeRemainingColumn
+
+from batch_index import load_index
+from metrics import MetricsSink, format_summary
+
+console = Console()
+
+DEFAULT_MODEL = "unsloth/gemma-3-27b-it-GGUF:gemma-3-27b-it-Q4_K_M.gguf"
+
+
+def parse_cpulist(text: str) -> List[int]:
+    """Parse a kernel cpulist string such as ``0-3,8-11`` into CPU ids."""
+    cpus = []
+    for part in text.strip().split(","):
+        if not part:
+            continue
+        if "-" in part:
+            lo, hi = part.split("-")
+            cpus.extend(range(int(lo), int(hi) + 1))
+        else:
+            cpus.append(int(part))
+    return cpus
+
+
+def numa_nodes() -> List[List[int]]:
+    """Return the usable CPUs of each NUMA node, or a single node with all usable CPUs."""
+    allowed = os.sched_getaffinity(0)
+    nodes = []
+    for node_dir in sorted(pathlib.Path("/sys/devices/system/node").glob("node[0-9]*"),
+                           key=lambda p: int(p.name[4:])):
+        try:
+            cpus = [c for c in parse_cpulist((node_dir / "cpulist").read_text()) if c in allowed]
+        except OSError:
+            continue
+        if cpus:
+            nodes.append(cpus)
+    return nodes or [sorted(allowed)]
+
+
+def parse_model_spec(spec: str) -> Dict[str, str]:
+    """Split a ``repo:file`` model spec into Hugging Face repo and GGUF file name."""
+    repo, sep, file_name = spec.partition(":")
+    if not sep or not repo or not file_name:
+        raise ValueError(f"Model spec must look like 'repo:file.gguf', got {spec!r}")
+    return {"model_name": repo, "model_file": file_name, "slug": pathlib.Path(file_name).stem}
+
+
+def plan_workers(n_models: int, workers_per_model: int, nodes: List[List[int]]) -> List[Dict[str, Any]]:
+    """Assign every worker a model and a disjoint set of CPUs on one NUMA node.
+
+    Workers are spread round-robin over nodes, then each node's CPUs are split evenly
+    among the workers placed on it. Keeping a worker's threads on one node keeps its
+    KV cache and scratch buffers node-local.
+    """
+    specs = [{"worker_id": w, "model_idx": w % n_models} for w in range(n_models * workers_per_model)]
+    for w, spec in enumerate(specs):
+        spec["node"] = w % len(nodes)
+
+    for node_idx, cpus in enumerate(nodes):
+        on_node = [spec for spec in specs if spec["node"] == node_idx]
+        if not on_node:
+            continue
+        share = max(len(cpus) // len(on_node), 1)
+        for i, spec in enumerate(on_node):
+            start = (i * share) % len(cpus)
+            spec["cpus"] = cpus[start:start + share]
+    return specs
+
+
+def _worker(spec: Dict[str, Any], model: Dict[str, str], n_gpu_layers: int, jsonl_path: str,
+            task_queue, result_queue):
+    """Worker process: pin to CPUs, load the model (mmap'd) and run the chunks it is sent until a sentinel arrives."""
+    # Imported here so the parent process never loads llama.cpp
+    from run_local import load_model, run_entry
+
+    worker_id, model_idx = spec["worker_id"], spec["model_idx"]
+    try:
+        if hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, spec["cpus"])
+        llm, _ = load_model(model["model_name"], model["model_file"],
+                            n_threads=len(spec["cpus"]), n_gpu_layers=n_gpu_layers)
+    except Exception as e:
+        result_queue.put(("failed", worker_id, model_idx, str(e)))
+        return
+    result_queue.put(("ready", worker_id, model_idx, None))
+
+    index = load_index(pathlib.Path(jsonl_path))
+    while True:
+        chunk = task_queue.get()
+        if chunk is None:
+            break
+        for seq in chunk:
+            try:
+                result = run_entry(llm, json.loads(index.read_line(seq)), seq + 1)
+                result["timing"]["worker_id"] = worker_id
+            except Exception as e:
+                result = {"custom_id": f"line_{seq + 1}", "error": str(e)}
+            result_queue.put(("result", seq, model_idx, result))
+    result_queue.put(("exit", worker_id, model_idx, None))
+
+
+class OrderedWriter:
+    """Reorder buffer that appends results to a JSONL file in input order as they become contiguous."""
+
+    def __init__(self, path: pathlib.Path, metrics_sink: MetricsSink):
+        self.path = path
+        self.metrics_sink = metrics_sink
+        self.pending: Dict[int, Dict[str, Any]] = {}
+        self.results: List[Dict[str, Any]] = []
+        self.next_seq = 0
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if path.exists():
+            path.unlink()
+
+    def add(self, seq: int, result: Dict[str, Any]):
+        self.pending[seq] = result
+        flushed = []
+        while self.next_seq in self.pending:
+            flushed.append(self.pending.pop(self.next_seq))
+            self.next_seq += 1
+        if not flushed:
+            return
+        with open(self.path, "at", encoding="utf-8") as f:
+            for result in flushed:
+                f.write(json.dumps(result, ensure_ascii=False) + "\n")
+                if "timing" in result:
+                    self.metrics_sink.write(result["timing"])
+        self.results.extend(flushed)
+
+    def fill_missing(self, total: int, make_error):
+        """Add ``make_error(seq)`` for every seq below ``total`` that never arrived, closing any gaps."""
+        for seq in range(self.next_seq, total):
+            if seq not in self.pending:
+                self.add(seq, make_error(seq))
+
+
+def run_pool(jsonl_path: pathlib.Path, models: List[str], save_dir: pathlib.Path, workers_per_model: int = 1,
+             chunk_size: int = 1, n_gpu_layers: int = 0) -> Dict[str, List[Dict[str, Any]]]:
+    """Run every request in ``jsonl_path`` through each model using a pool of pinned worker processes.
+
+    The parent hands each worker one chunk of ``chunk_size`` requests at a time and sends the
+    next as soon as the previous one has come back, so fast workers take over the remainder of
+    slow ones and the parent always knows which requests a worker holds. If a worker dies
+    (OOM-kill, segfault inside llama.cpp) its unfinished requests are written as errors.
+    Results stream back out of order and are written per model in input order to
+    ``save_dir/<model>/intermediate_results.jsonl``. Workers of the same model map the
+    same GGUF file, so with CPU inference the weights live once in the page cache.
+    """
+    index = load_index(jsonl_path)
+    total = len(index)
+    model_specs = [parse_model_spec(m) for m in models]
+    worker_specs = plan_workers(len(model_specs), workers_per_model, numa_nodes())
+
+    ctx = mp.get_context("spawn")
+    task_queues = [ctx.Queue() for _ in worker_specs]
+    result_queue = ctx.Queue()
+    chunks = [deque(list(range(start, min(start + chunk_size, total))) for start in range(0, total, chunk_size))
+              for _ in model_specs]
+
+    writers = []
+    for spec in model_specs:
+        model_dir = save_dir / spec["slug"]
+        writers.append(OrderedWriter(model_dir / "intermediate_results.jsonl", MetricsSink(model_dir / "metrics.jsonl")))
+
+    for spec in worker_specs:
+        console.print(f"[dim]worker {spec['worker_id']}: {model_specs[spec['model_idx']]['slug']} "
+                      f"node {spec['node']} cpus {spec['cpus'][0]}-{spec['cpus'][-1]}[/dim]")
+    processes = [
+        ctx.Process(target=_worker, daemon=True,
+                    args=(spec, model_specs[spec["model_idx"]], n_gpu_layers, str(jsonl_path),
+                          task_queues[spec["worker_id"]], result_queue))
+        for spec in worker_specs
+    ]
+    for p in processes:
+        p.start()
+
+    alive = [workers_per_model] * len(model_specs)
+    done = [0] * len(model_specs)
+    gone = set()  # worker ids that exited, failed or died
+    in_flight = {spec["worker_id"]: set() for spec in worker_specs}  # seqs sent to a worker but not yet returned
+    owner = {}  # (model_idx, seq) -> worker id currently running it
+
+    def dispatch(worker_id: int, model_idx: int):
+        # Send the next chunk, or the sentinel once the model has none left
+        if not chunks[model_idx]:
+            task_queues[worker_id].put(None)
+            return
+        chunk = chunks[model_idx].popleft()
+        in_flight[worker_id].update(chunk)
+        for seq in chunk:
+            owner[(model_idx, seq)] = worker_id
+        task_queues[worker_id].put(chunk)
+
+    def error_result(seq: int, message: str) -> Dict[str, Any]:
+        return {"custom_id": index.custom_ids[seq], "error": message}
+
+    def handle(kind: str, key: int, model_idx: int, payload: Any):
+        if kind == "result":
+            worker_id = owner.pop((model_idx, key), None)
+            # A result racing a worker's death may arrive after its seq was written as an error
+            if worker_id is not None:
+                in_flight[worker_id].discard(key)
+                writers[model_idx].add(key, payload)
+                done[model_idx] += 1
+                progress.update(tasks[model_idx], advance=1)
+                if not in_flight[worker_id]:
+                    dispatch(worker_id, model_idx)
+        elif kind == "ready":
+            console.print(f"[green]✅ worker {key} loaded {model_specs[model_idx]['slug']}[/green]")
+            dispatch(key, model_idx)
+        elif kind in ("exit", "failed") and key not in gone:
+            gone.add(key)
+            alive[model_idx] -= 1
+            if kind == "failed":
+                console.print(f"[bold red]❌ worker {key} failed to load model: {payload}[/bold red]")
+
+    def reap_dead_workers():
+        # A crashed worker (OOM-kill, segfault inside llama.cpp) never sends "exit";
+        # its unfinished seqs are written as errors so the ordered output can move past them
+        dead = [(spec, p) for spec, p in zip(worker_specs, processes)
+                if spec["worker_id"] not in gone and not p.is_alive()]
+        if not dead:
+            return
+        # Read everything the dead workers flushed before exiting; results still buffered in a
+        # SIGKILLed worker are lost and stay in its in-flight set
+        while True:
+            try:
+                handle(*result_queue.get(timeout=0.2))
+            except queue.Empty:
+                break
+        for spec, p in dead:
+            worker_id, model_idx = spec["worker_id"], spec["model_idx"]
+            if worker_id in gone:
+                continue
+            gone.add(worker_id)
+            alive[model_idx] -= 1
+            lost = sorted(in_flight.pop(worker_id))
+            console.print(f"[bold red]❌ worker {worker_id} exited with code {p.exitcode}, "
+                          f"{len(lost)} in-flight entries marked as errors[/bold red]")
+            for seq in lost:
+                del owner[(model_idx, seq)]
+                writers[model_idx].add(seq, error_result(seq, f"worker {worker_id} exited with code {p.exitcode}"))
+                done[model_idx] += 1
+                progress.update(tasks[model_idx], advance=1)
+
+    with Progress(SpinnerColumn(), TextColumn("[progress.description]{task.description}"), BarColumn(),
+                  TaskProgressColumn(), TimeRemainingColumn(), console=console) as progress:
+        tasks = [progress.add_task(f"[green]{spec['slug']}", total=total) for spec in model_specs]
+        last_reap = time.monotonic()
+        while any(done[m] < total and alive[m] > 0 for m in range(len(model_specs))):
+            try:
+                handle(*result_queue.get(timeout=1))
+            except queue.Empty:
+                pass
+            if time.monotonic() - last_reap > 1:
+                reap_dead_workers()
+                last_reap = time.monotonic()
+
+        # Chunks never sent because every worker of the model is gone become errors too
+        for model_idx, writer in enumerate(writers):
+            if done[model_idx] < total:
+                writer.fill_missing(total, lambda seq: error_result(seq, "not processed: all workers exited"))
+
+    for p in processes:
+        p.join(timeout=10)
+        if p.is_alive():
+            p.terminate()
+
+    results = {}
+    for spec, writer, n_done in zip(model_specs, writers, done):
+        if n_done < total:
+            console.print(f"[bold red]❌ {spec['slug']}: only {n_done}/{total} entries finished (all workers exited)[/bold red]")
+        console.print(Panel(format_summary(writer.metrics_sink.close()), title=f"Latency / Tokens: {spec['slug']}",
+                            border_style="cyan"))
+        results[spec["slug"]] = writer.results
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Process a JSONL file with a pool of local model worker processes.")
+    parser.add_argument("--input-file", type=str, help="Path to the input JSONL file",
+                        default="../dataset/batch/batch.jsonl")
+    parser.add_argument("--save-dir", type=str, help="Directory for per-model outputs and metrics",
+                        default="../dataset/batch/pool")
+    parser.add_argument("--model", type=str, action="append",
+                        help="Model as 'repo:file.gguf' (repeat to compare models)")
+    parser.add_argument("--workers-per-model", type=int, default=1, help="Worker processes per model")
+    parser.add_argument("--chunk-size", type=int, default=1, help="Requests handed to a worker per queue pull")
+    parser.add_argument("--n-gpu-layers", type=int, default=0,
+                        help="Layers to offload to GPU (0 keeps weights in the shared page cache)")
+
+    args = parser.parse_args()
+
+    input_file = pathlib.Path(args.input_file).resolve()
+    save_dir = pathlib.Path(args.save_dir).resolve()
+    models = args.model or [DEFAULT_MODEL]
+
+    console.print(Panel(
+        f"[bold blue]Local Worker Pool Starting[/bold blue]\n"
+        f"Input: {input_file}\n"
+        f"Output: {save_dir}\n"
+        f"Models: {', '.join(models)}\n"
+        f"Workers per model: {args.workers_per_model}",
+        title="Configuration",
+        border_style="green"
+    ))
+
+    all_results = run_pool(input_file, models, save_dir, workers_per_model=args.workers_per_model,
+                           chunk_size=args.chunk_size, n_gpu_layers=args.n_gpu_layers)
+
+    for slug, results in all_results.items():
+        output_file = save_dir / slug / "output.jsonl"
+        with open(output_file, "w", encoding="utf-8") as f:
+            for result in results:
+                f.write(json.dumps(result, ensure_ascii=False) + "\n")
+        successful = sum(1 for r in results if "error" not in r)
+        console.print(f"[bold green]🎉 {slug}: {successful}/{len(results)} succeeded, saved to {output_file}[/bold green]")
@@ -0,0 +1,430 @@
+"""OpenAI-compatible stand-in server for offline batch and realtime testing.
+
+Emulates the subset of the OpenAI API used by this project:
+
+    POST /v1/files                 upload a batch input file (multipart)
+    GET  /v1/files/{id}            file metadata
+    GET  /v1/files/{id}/content    file content
+    POST /v1/batches               create a batch job (processed in the background)
+    GET  /v1/batches               list batch jobs (newest first)
+    GET  /v1/batches/{id}          batch status
+    POST /v1/batches/{id}/cancel   cancel a batch job
+    POST /v1/chat/completions      realtime chat completion
+
+Point the official client at it with environment variables, e.g.
+
+    python local_server.py --responder fake --latency-ms 200
+    export OPENAI_BASE_URL=http://127.0.0.1:8000/v1 OPENAI_API_KEY=local
+    python call_batch_api.py
+"""
+import argparse
+import json
+import pathlib
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from email.parser import BytesParser
+from email.policy import default as default_policy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from estimate_cost import count_request_tokens, count_text_tokens
+
+
+class FakeResponder:
+    """Returns well-formed verdict JSON after an injected delay.
+
+    Latency is ``latency_ms`` plus uniform jitter plus ``ms_per_token`` for every
+    prompt token, so throughput tests see realistic length dependence. A fraction
+    ``error_rate`` of requests fail with HTTP 500.
+    """
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, ms_per_token: float = 0.0,
+                 error_rate: float = 0.0, same_rate: float = 0.5, seed: int = 42):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.ms_per_token = ms_per_token
+        self.error_rate = error_rate
+        self.same_rate = same_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def complete(self, body: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        prompt_tokens = count_request_tokens(body)
+        with self.lock:
+            jitter = self.rng.uniform(0, self.jitter_ms)
+            fail = self.rng.random() < self.error_rate
+            answer = self.rng.random() < self.same_rate
+        time.sleep((self.latency_ms + jitter + self.ms_per_token * prompt_tokens) / 1000)
+        if fail:
+            return 500, error_body("Injected failure from fake responder", "server_error")
+
+        content = json.dumps({"분석": "로컬 테스트 서버의 가짜 응답입니다.", "답변": answer}, ensure_ascii=False)
+        return 200, chat_completion_body(body.get("model", "fake"), content, "stop",
+                                         prompt_tokens, count_text_tokens(content))
+
+
+class LlamaResponder:
+    """Serves requests with the run_local llama.cpp engine (one request at a time)."""
+
+    def __init__(self, model_name: str, model_file: str, n_threads: int = 32, n_gpu_layers: int = 999):
+        from run_local import load_model
+
+        self.llm, _ = load_model(model_name, model_file, n_threads=n_threads, n_gpu_layers=n_gpu_layers)
+        self.lock = threading.Lock()
+
+    def complete(self, body: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        chat_params = {
+            "messages": body["messages"],
+            "max_tokens": body.get("max_tokens", 2000),
+            "temperature": body.get("temperature", 0.1),
+            "top_k": 1,
+            "stop": ["</s>"],
+        }
+        response_format = body.get("response_format")
+        if response_format and response_format.get("type") == "json_object":
+            chat_params["response_format"] = response_format
+
+        with self.lock:
+            response = self.llm.create_chat_completion(**chat_params)
+        usage = response.get("usage", {})
+        return 200, chat_completion_body(body.get("model", "local"), response["choices"][0]["message"]["content"],
+                                         response["choices"][0].get("finish_reason"),
+                                         usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0))
+
+
+def chat_completion_body(model: str, content: str, finish_reason: Optional[str],
+                         prompt_tokens: int, completion_tokens: int) -> Dict[str, Any]:
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:24]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": finish_reason,
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+def error_body(message: str, error_type: str = "invalid_request_error", code: Optional[str] = None) -> Dict[str, Any]:
+    return {"error": {"message": message, "type": error_type, "param": None, "code": code}}
+
+
+class LocalOpenAIState:
+    """Files and batch jobs of the stand-in server. File contents live under ``data_dir``."""
+
+    def __init__(self, data_dir: pathlib.Path, responder, batch_concurrency: int = 4):
+        self.data_dir = data_dir
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        self.responder = responder
+        self.batch_concurrency = batch_concurrency
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.batches: Dict[str, Dict[str, Any]] = {}
+        self.lock = threading.Lock()
+
+    def file_path(self, file_id: str) -> pathlib.Path:
+        return self.data_dir / f"{file_id}.jsonl"
+
+    def add_file(self, content: bytes, filename: str, purpose: str) -> Dict[str, Any]:
+        file_id = f"file-{uuid.uuid4().hex[:24]}"
+        self.file_path(file_id).write_bytes(content)
+        record = {
+            "id": file_id,
+            "object": "file",
+            "bytes": len(content),
+            "created_at": int(time.time()),
+            "filename": filename,
+            "purpose": purpose,
+            "status": "processed",
+        }
+        with self.lock:
+            self.files[file_id] = record
+        return record
+
+    def create_batch(self, input_file_id: str, endpoint: str, completion_window: str,
+                     metadata: Optional[Dict[str, str]]) -> Dict[str, Any]:
+        now = int(time.time())
+        batch = {
+            "id": f"batch_{uuid.uuid4().hex[:24]}",
+            "object": "batch",
+            "endpoint": endpoint,
+            "errors": None,
+            "input_file_id": input_file_id,
+            "completion_window": completion_window,
+            "status": "validating",
+            "output_file_id": None,
+            "error_file_id": None,
+            "created_at": now,
+            "in_progress_at": None,
+            "expires_at": now + 24 * 3600,
+            "finalizing_at": None,
+            "completed_at": None,
+            "failed_at": None,
+            "expired_at": None,
+            "cancelling_at": None,
+            "cancelled_at": None,
+            "request_counts": {"total": 0, "completed": 0, "failed": 0},
+            "metadata": metadata,
+        }
+        with self.lock:
+            self.batches[batch["id"]] = batch
+        threading.Thread(target=self._run_batch, args=(batch,), daemon=True).start()
+        return batch
+
+    def cancel_batch(self, batch: Dict[str, Any]):
+        with self.lock:
+            if batch["status"] in ("validating", "in_progress"):
+                batch["status"] = "cancelling"
+                batch["cancelling_at"] = int(time.time())
+
+    def _run_batch(self, batch: Dict[str, Any]):
+        lines = [line for line in self.file_path(batch["input_file_id"]).read_text(encoding="utf-8").splitlines()
+                 if line.strip()]
+        requests = []
+        for line_num, line in enumerate(lines, 1):
+            try:
+                requests.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                with self.lock:
+                    batch["status"] = "failed"
+                    batch["failed_at"] = int(time.time())
+                    batch["errors"] = {"object": "list", "data": [
+                        {"code": "invalid_json_line", "message": str(e), "param": None, "line": line_num}]}
+                return
+
+        with self.lock:
+            if batch["status"] == "cancelling":
+                batch["status"] = "cancelled"
+                batch["cancelled_at"] = int(time.time())
+                return
+            batch["status"] = "in_progress"
+            batch["in_progress_at"] = int(time.time())
+            batch["request_counts"]["total"] = len(requests)
+
+        def run_one(request: Dict[str, Any]) -> Tuple[bool, Dict[str, Any]]:
+            custom_id = request.get("custom_id")
+            if batch["status"] == "cancelling":
+                return False, {"id": f"batch_req_{uuid.uuid4().hex[:24]}", "custom_id": custom_id, "response": None,
+                               "error": {"code": "batch_cancelled", "message": "Batch was cancelled."}}
+            if request.get("url") != batch["endpoint"]:
+                status, body = 400, error_body(f"URL {request.get('url')!r} does not match batch endpoint")
+            else:
+                try:
+                    status, body = self.responder.complete(request.get("body", {}))
+                except Exception as e:
+                    status, body = 500, error_body(str(e), "server_error")
+            with self.lock:
+                batch["request_counts"]["completed" if status == 200 else "failed"] += 1
+            return status == 200, {
+                "id": f"batch_req_{uuid.uuid4().hex[:24]}",
+                "custom_id": custom_id,
+                "response": {"status_code": status, "request_id": uuid.uuid4().hex, "body": body},
+                "error": None,
+            }
+
+        # map() keeps input order, matching how the real API returns one line per request
+        with ThreadPoolExecutor(max_workers=self.batch_concurrency) as executor:
+            results = list(executor.map(run_one, requests))
+
+        with self.lock:
+            if batch["status"] != "cancelling":
+                batch["status"] = "finalizing"
+                batch["finalizing_at"] = int(time.time())
+        outputs = [json.dumps(line, ensure_ascii=False) for ok, line in results if ok]
+        errors = [json.dumps(line, ensure_ascii=False) for ok, line in results if not ok]
+        output_file = self.add_file(("\n".join(outputs) + "\n").encode("utf-8"), "batch_output.jsonl",
+                                    "batch_output") if outputs else None
+        error_file = self.add_file(("\n".join(errors) + "\n").encode("utf-8"), "batch_errors.jsonl",
+                                   "batch_output") if errors else None
+
+        with self.lock:
+            batch["output_file_id"] = output_file["id"] if output_file else None
+            batch["error_file_id"] = error_file["id"] if error_file else None
+            if batch["status"] == "cancelling":
+                batch["status"] = "cancelled"
+                batch["cancelled_at"] = int(time.time())
+            else:
+                batch["status"] = "completed"
+                batch["completed_at"] = int(time.time())
+
+
+class LocalOpenAIHandler(BaseHTTPRequestHandler):
+    """Routes the emulated endpoints to ``self.server.state``."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status: int, payload: Dict[str, Any]):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_bytes(self, data: bytes):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def _read_json(self) -> Dict[str, Any]:
+        return json.loads(self._read_body() or b"{}")
+
+    def do_GET(self):
+        state = self.server.state
+        url = urlparse(self.path)
+        parts = url.path.rstrip("/").split("/")[1:]  # ['v1', 'batches', ...]
+
+        if parts[:2] == ["v1", "files"] and len(parts) >= 3:
+            record = state.files.get(parts[2])
+            if record is None:
+                return self._send_json(404, error_body(f"No such File object: {parts[2]}"))
+            if len(parts) == 4 and parts[3] == "content":
+                return self._send_bytes(state.file_path(parts[2]).read_bytes())
+            return self._send_json(200, record)
+
+        if parts == ["v1", "batches"]:
+            query = parse_qs(url.query)
+            limit = int(query.get("limit", ["20"])[0])
+            with state.lock:
+                batches = sorted(state.batches.values(), key=lambda b: b["created_at"], reverse=True)
+            after = query.get("after", [None])[0]
+            if after is not None:
+                ids = [b["id"] for b in batches]
+                batches = batches[ids.index(after) + 1:] if after in ids else []
+            page = [dict(b) for b in batches[:limit]]
+            return self._send_json(200, {
+                "object": "list",
+                "data": page,
+                "first_id": page[0]["id"] if page else None,
+                "last_id": page[-1]["id"] if page else None,
+                "has_more": len(batches) > limit,
+            })
+
+        if parts[:2] == ["v1", "batches"] and len(parts) == 3:
+            batch = state.batches.get(parts[2])
+            if batch is None:
+                return self._send_json(404, error_body(f"No batch found with id '{parts[2]}'."))
+            with state.lock:
+                return self._send_json(200, dict(batch))
+
+        self._send_json(404, error_body(f"Unknown endpoint: GET {url.path}"))
+
+    def do_POST(self):
+        state = self.server.state
+        parts = urlparse(self.path).path.rstrip("/").split("/")[1:]
+
+        if parts == ["v1", "chat", "completions"]:
+            body = self._read_json()
+            if body.get("stream"):
+                return self._send_json(400, error_body("Streaming is not supported by the local server."))
+            try:
+                status, payload = state.responder.complete(body)
+            except Exception as e:
+                status, payload = 500, error_body(str(e), "server_error")
+            return self._send_json(status, payload)
+
+        if parts == ["v1", "files"]:
+            content_type = self.headers.get("Content-Type", "")
+            message = BytesParser(policy=default_policy).parsebytes(
+                f"Content-Type: {content_type}\r\n\r\n".encode("utf-8") + self._read_body())
+            fields, upload, filename = {}, None, "upload.jsonl"
+            for part in message.iter_parts():
+                name = part.get_param("name", header="content-disposition")
+                if name == "file":
+                    upload = part.get_payload(decode=True)
+                    filename = part.get_filename() or filename
+                else:
+                    fields[name] = part.get_content().strip()
+            if upload is None:
+                return self._send_json(400, error_body("Missing 'file' in multipart upload."))
+            return self._send_json(200, state.add_file(upload, filename, fields.get("purpose", "batch")))
+
+        if parts == ["v1", "batches"]:
+            body = self._read_json()
+            if body.get("input_file_id") not in state.files:
+                return self._send_json(400, error_body(f"No such File object: {body.get('input_file_id')}"))
+            if body.get("endpoint") != "/v1/chat/completions":
+                return self._send_json(400, error_body("Only /v1/chat/completions batches are supported."))
+            batch = state.create_batch(body["input_file_id"], body["endpoint"], body.get("completion_window", "24h"),
+                                       body.get("metadata"))
+            with state.lock:
+                return self._send_json(200, dict(batch))
+
+        if parts[:2] == ["v1", "batches"] and len(parts) == 4 and parts[3] == "cancel":
+            self._read_body()
+            batch = state.batches.get(parts[2])
+            if batch is None:
+                return self._send_json(404, error_body(f"No batch found with id '{parts[2]}'."))
+            state.cancel_batch(batch)
+            with state.lock:
+                return self._send_json(200, dict(batch))
+
+        self._read_body()
+        self._send_json(404, error_body(f"Unknown endpoint: POST {'/'.join([''] + parts)}"))
+
+
+def make_server(host: str, port: int, state: LocalOpenAIState, verbose: bool = False) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), LocalOpenAIHandler)
+    server.daemon_threads = True
+    server.state = state
+    server.verbose = verbose
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run an OpenAI-compatible local server for offline testing.")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Bind address")
+    parser.add_argument("--port", type=int, default=8000, help="Bind port")
+    parser.add_argument("--data-dir", type=str, default="../dataset/local_server",
+                        help="Directory for uploaded and generated files")
+    parser.add_argument("--responder", type=str, default="fake", choices=["fake", "llama"],
+                        help="Answer with the fake responder or the run_local llama.cpp model")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Fake responder: base latency per request")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Fake responder: extra uniform random latency")
+    parser.add_argument("--ms-per-token", type=float, default=0.0, help="Fake responder: latency per prompt token")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fake responder: fraction of failed requests")
+    parser.add_argument("--same-rate", type=float, default=0.5, help="Fake responder: fraction of 'same' verdicts")
+    parser.add_argument("--model", type=str, default="unsloth/gemma-3-27b-it-GGUF:gemma-3-27b-it-Q4_K_M.gguf",
+                        help="Llama responder: model as 'repo:file.gguf'")
+    parser.add_argument("--batch-concurrency", type=int, default=4, help="Requests processed in parallel per batch")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for the fake responder")
+    parser.add_argument("--verbose", action="store_true", help="Log every HTTP request")
+
+    args = parser.parse_args()
+
+    if args.responder == "fake":
+        responder = FakeResponder(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, ms_per_token=args.ms_per_token,
+                                  error_rate=args.error_rate, same_rate=args.same_rate, seed=args.seed)
+    else:
+        model_name, _, model_file = args.model.partition(":")
+        responder = LlamaResponder(model_name, model_file)
+
+    state = LocalOpenAIState(pathlib.Path(args.data_dir).resolve(), responder, batch_concurrency=args.batch_concurrency)
+    server = make_server(args.host, args.port, state, verbose=args.verbose)
+    print(f"Local OpenAI-compatible server ({args.responder}) listening on http://{args.host}:{args.port}/v1")
+    print(f"export OPENAI_BASE_URL=http://{args.host}:{args.port}/v1 OPENAI_API_KEY=local")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -1,5 +1,6 @@
 from typing import Tuple
 
+import numpy as np
 import pandas as pd
 from pathlib import Path
 import json
@@ -7,11 +8,12 @@ import datetime
 
 import argparse
 
-from sklearn.metrics import confusion_matrix
+from batch_index import load_index
+from pairs import Pair, build_articles
 
 # 상수 지정
 
-NEWS_NUMBER_PER_SOURCE = 100 # 한 언론사당 100개 기사 (총 10개 언론사)
+NEWS_NUMBER_PER_SOURCE = 100 # 기본 언론사당 기사 수 (샘플링 기본값, create_pairs는 실제 언론사·기사 수로 페어 구성)
 
 MODEL_NAME = 'gpt-4.1-2025-04-14'
 
@@ -94,60 +96,80 @@ TEST_PROMPT_V3 = """
 SYSTEM_INSTRUCTION = SYSTEM_INSTRUCTION_V2
 PROMPT = TEST_PROMPT_V3
 
+# 프롬프트 변형 (이름: (시스템 지시문, 사용자 프롬프트))
+PROMPT_VARIANTS = {
+    'no_guidance': (SYSTEM_INSTRUCTION_V1, NO_GUIDANCE),
+    'style_guidance': (SYSTEM_INSTRUCTION_V1, STYLE_GUIDANCE),
+    'grammar_guidance': (SYSTEM_INSTRUCTION_V1, GRAMMER_GUIDANCE),
+    'lip': (SYSTEM_INSTRUCTION_V1, LIP),
+    'test': (SYSTEM_INSTRUCTION_V1, TEST_PROMPT),
+    'test_v2': (SYSTEM_INSTRUCTION_V1, TEST_PROMPT_V2),
+    'test_v3': (SYSTEM_INSTRUCTION_V2, TEST_PROMPT_V3),
+}
+DEFAULT_PROMPT_VARIANT = 'test_v3'
+
 def create_pairs(df: pd.DataFrame) -> Tuple[list, list]:
     """
     주어진 DataFrame에서 같은 언론사와 다른 언론사끼리의 페어를 생성합니다.
+    언론사 수(k)와 가장 적은 언론사의 기사 수(m)에서 페어 구성을 정하므로 top_k, sample_size가 바뀌어도 균형이 유지됩니다.
+    언론사마다 m개만 사용하고, 다른 언론사 페어는 언론사당 k * (m//2 // k)개를 왼쪽/오른쪽에 씁니다. (기본값 k=10, m=100에서 각 500개)
     :param df:
         DataFrame, 'source', 'title', 'text' 컬럼을 포함해야 합니다.
     :return:
-        Tuple, 같은 언론사끼리의 페어 리스트와 다른 언론사끼리의 페어 리스트를 포함합니다.
+        Tuple, 같은 언론사끼리의 Pair 리스트와 다른 언론사끼리의 Pair 리스트를 포함합니다.
     """
 
-    same_pairs = [] # 같은 언론사로 짝지어진 페어들을 저장할 df 리스트
+    articles = build_articles(df) # 인덱스 값 -> Article (행마다 한 번만 변환)
+
+    group_sizes = df.groupby('source').size()
+    source_num = len(group_sizes) # k
+    news_number = int(group_sizes.min()) if source_num else 0 # m (기본 설정에서 NEWS_NUMBER_PER_SOURCE)
+    block_num = news_number // 2 // max(source_num, 1) # 왼쪽 기사 하나의 언론사가 다른 언론사 하나와 짝지어지는 기본 개수 (기본값: 5)
+    if source_num < 2 or block_num < 1:
+        raise ValueError(f'페어를 만들 수 없습니다: 언론사 {source_num}개, 언론사당 최소 기사 {news_number}개 '
+                         f'(언론사가 2개 이상이고 언론사당 기사가 2 * 언론사 수({2 * source_num}) 이상이어야 함)')
+    half_num = source_num * block_num # 언론사별로 페어의 왼쪽/오른쪽에 쓰는 기사 수 (기본값: 50)
+
+    same_pairs = [] # 같은 언론사로 짝지어진 페어들을 저장할 리스트
 
     for source, member_df in df.groupby('source'):
-        shuffled_df = member_df.sample(frac=1, random_state=42).reset_index(drop=True) # 섞기
-        for idx in range(1, len(shuffled_df), 2):
-            same_pairs.append([shuffled_df.iloc[idx-1], shuffled_df.iloc[idx]]) # 연속한 두 행을 페어로 하여 추가
+        shuffled = [articles[idx] for idx in member_df.sample(frac=1, random_state=42).index][:news_number] # 섞기 (원래 인덱스는 페어 식별용으로 유지)
+        for idx in range(1, len(shuffled), 2):
+            same_pairs.append(Pair('same', shuffled[idx-1], shuffled[idx])) # 연속한 두 기사를 페어로 하여 추가
 
-    diff_pairs = [] # 다른 언론사끼리 짝지어진 페어들을 저장할 df 리스트
+    diff_pairs = [] # 다른 언론사끼리 짝지어진 페어들을 저장할 리스트
 
-    first_list = [] # 페어의 좌측에 올 후보 (각 언론사별로 1개의 원소(DF))
-    second_list = [] # 페어의 우측에 올 후보 (각 언론사별로 1개의 원소(DF))
+    first_list = [] # 페어의 좌측에 올 후보 (각 언론사별로 1개의 기사 리스트)
+    second_list = [] # 페어의 우측에 올 후보 (각 언론사별로 1개의 기사 리스트)
 
     for source, member_df in df.groupby('source'):
-        shuffled_df = member_df.sample(frac=1, random_state=43) # 섞기
+        shuffled = [articles[idx] for idx in member_df.sample(frac=1, random_state=43).index] # 섞기
 
-        half_num = int(NEWS_NUMBER_PER_SOURCE/2) # 50개
-        first_list.append(shuffled_df.iloc[:half_num]) # 절반은 first_list
-        second_list.append(shuffled_df.iloc[half_num:]) # 절반은 second_list
+        first_list.append(shuffled[:half_num]) # 절반은 first_list
+        second_list.append(shuffled[half_num:2*half_num]) # 절반은 second_list
         # -> 각 언론사별로 균등하게 포함되도록 하기 위함
 
-    remain_idx = [-1]*len(second_list)
-    second_idx_start = 0 # 5씩 증가할 예정 (second_list의 각 원소 df들이 서로 겹치지 않게 매칭되도록 하기 위함)
-    for i1, first_df in enumerate(first_list):
-        first_idx = 0 # first_df의 인덱스
-        for i2, second_df in enumerate(second_list):
+    remain_idx = [i*block_num for i in range(source_num)] # 각 second_list에서 자기 언론사 차례에 건너뛴 block_num개 구간 (아래 루프 끝에서 사용)
+    second_idx_start = 0 # block_num씩 증가할 예정 (second_list의 각 원소 df들이 서로 겹치지 않게 매칭되도록 하기 위함)
+    for i1, first_articles in enumerate(first_list):
+        first_idx = 0 # first_articles의 인덱스
+        for i2, second_articles in enumerate(second_list):
             if i1 == i2: continue
 
-            for second_idx in range(second_idx_start, second_idx_start+5): # second_df의 인덱스
-                first_row = first_df.iloc[first_idx]
-                second_row = second_df.iloc[second_idx]
-                diff_pairs.append([first_row, second_row])
+            for second_idx in range(second_idx_start, second_idx_start+block_num): # second_articles의 인덱스
+                diff_pairs.append(Pair('diff', first_articles[first_idx], second_articles[second_idx]))
 
                 first_idx += 1
 
-        for i2 in range(i1+1, i1+6):
-            i2 %= len(second_list)
-            second_df = second_list[i2]
-            first_row = first_df.iloc[first_idx]
-            second_row = second_df.iloc[remain_idx[i2]]
-            diff_pairs.append([first_row, second_row])
+        # 남은 block_num개는 다음 언론사들의 건너뛴 구간과 짝지음 (자기 언론사로 돌아오지 않도록 1 ~ k-1 칸 뒤를 순환)
+        for j in range(block_num):
+            i2 = (i1 + 1 + j % (source_num - 1)) % source_num
+            diff_pairs.append(Pair('diff', first_articles[first_idx], second_list[i2][remain_idx[i2]]))
 
             first_idx += 1
-            remain_idx[i2] -= 1
+            remain_idx[i2] += 1
 
-        second_idx_start += 5
+        second_idx_start += block_num
 
     print('same_pairs: ', len(same_pairs))
     print('diff_pairs: ', len(diff_pairs))
@@ -155,72 +177,128 @@ def create_pairs(df: pd.DataFrame) -> Tuple[list, list]:
     return same_pairs, diff_pairs
 
 
-def validate_pairs(same_pairs: list, diff_pairs: list):
+def pair_arrays(pairs: list) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, list]:
     """
-    생성된 페어 리스트의 유효성을 검증합니다.
-    :param same_pairs: 같은 언론사끼리의 페어 리스트
-    :param diff_pairs: 다른 언론사끼리의 페어 리스트
-    :return:
+    Pair 리스트를 검증·집계용 배열로 변환합니다. 언론사는 정렬된 언론사 리스트의 코드로 바뀝니다.
+    :param pairs: Pair 리스트
+    :return: (왼쪽 기사 id, 오른쪽 기사 id, 왼쪽 언론사 코드, 오른쪽 언론사 코드, 정렬된 언론사 리스트)
+    """
+    lookup = {} # 언론사 -> 등장 순서 코드
+    codes1 = np.array([lookup.setdefault(pair.left.source, len(lookup)) for pair in pairs], dtype=np.int64)
+    codes2 = np.array([lookup.setdefault(pair.right.source, len(lookup)) for pair in pairs], dtype=np.int64)
+    sources = sorted(lookup)
+    remap = np.empty(len(sources), dtype=np.int64) # 등장 순서 코드 -> 정렬 순서 코드
+    remap[[lookup[source] for source in sources]] = np.arange(len(sources))
+
+    left_ids = np.fromiter((pair.left.id for pair in pairs), dtype=np.int64, count=len(pairs))
+    right_ids = np.fromiter((pair.right.id for pair in pairs), dtype=np.int64, count=len(pairs))
+    return left_ids, right_ids, remap[codes1], remap[codes2], sources
+
+
+def pair_count_matrix(codes1: np.ndarray, codes2: np.ndarray, k: int) -> np.ndarray:
+    """
+    언론사 x 언론사 페어 개수 행렬을 계산합니다. (행: 왼쪽 기사 언론사, 열: 오른쪽 기사 언론사)
+    :param codes1: 왼쪽 기사 언론사 코드
+    :param codes2: 오른쪽 기사 언론사 코드
+    :param k: 언론사 수
+    :return: (k, k) 크기의 개수 행렬
     """
+    return np.bincount(codes1 * k + codes2, minlength=k * k).reshape(k, k)
 
-    news_per_source = set()
-    for pair in same_pairs + diff_pairs:
-        source1 = pair[0]['source']
-        source2 = pair[1]['source']
-        news_per_source.add(source1)
-        news_per_source.add(source2)
-
-    confusion_matrix = {}
-    for source1 in news_per_source:
-        confusion_matrix[source1] = {}
-        for source2 in news_per_source:
-            confusion_matrix[source1][source2] = 0
-
-    for pair in diff_pairs:
-        source1 = pair[0]['source']
-        source2 = pair[1]['source']
-        confusion_matrix[source1][source2] += 1
-
-    for pair in same_pairs:
-        source1 = pair[0]['source']
-        source2 = pair[1]['source']
-        confusion_matrix[source1][source2] += 1
-
-    print("\nConfusion Matrix for Different Source Pairs:")
-    print(" " * 8 + " | " + "| ".join([name[:2] for name in sorted(news_per_source)]))
-    print("-" * 60)
-    for source1 in sorted(news_per_source):
-        row = [source1[:4]]
-        for source2 in sorted(news_per_source):
-            row.append(str(confusion_matrix[source1][source2]).rjust(3))
-        print(" | ".join(row))
+
+def validate_pairs(same_pairs: list, diff_pairs: list, save_path: Path = None, strict: bool = True) -> pd.DataFrame:
+    """
+    생성된 페어 리스트의 유효성을 검증합니다.
+    다음 불변 조건을 확인하고, 대각선은 같은 언론사 페어 수, 나머지는 다른 언론사 페어 수인 행렬을 반환합니다.
+    - same 페어는 같은 언론사, diff 페어는 서로 다른 언론사로 구성
+    - 언론사별 same 페어 수가 모두 같음
+    - diff 페어에서 언론사별 왼쪽/오른쪽 등장 횟수가 모두 같고, 언론사 쌍별 개수 차이가 1 이하
+    - same, diff 각각 안에서 같은 기사를 두 번 이상 사용하지 않음
+    :param same_pairs: 같은 언론사끼리의 Pair 리스트
+    :param diff_pairs: 다른 언론사끼리의 Pair 리스트
+    :param save_path: 행렬을 pair_matrix.csv로 저장할 디렉토리 (기본값: 저장하지 않음)
+    :param strict: 불변 조건을 위반하면 ValueError 발생 (기본값: True)
+    :return: 언론사 x 언론사 페어 개수 DataFrame
+    """
+    left_ids, right_ids, codes1, codes2, sources = pair_arrays(same_pairs + diff_pairs)
+    n_same, k = len(same_pairs), len(sources)
+    same_matrix = pair_count_matrix(codes1[:n_same], codes2[:n_same], k)
+    diff_matrix = pair_count_matrix(codes1[n_same:], codes2[n_same:], k)
+
+    errors = []
+    off_diagonal = ~np.eye(k, dtype=bool)
+    if same_matrix[off_diagonal].any():
+        errors.append(f'서로 다른 언론사로 구성된 same 페어: {int(same_matrix[off_diagonal].sum())}개')
+    if np.diag(diff_matrix).any():
+        errors.append(f'같은 언론사로 구성된 diff 페어: {int(np.diag(diff_matrix).sum())}개')
+
+    same_counts = np.diag(same_matrix)
+    if len(set(same_counts.tolist())) > 1:
+        errors.append(f'언론사별 same 페어 수가 다름 (최소 {same_counts.min()}, 최대 {same_counts.max()})')
+
+    left_counts, right_counts = diff_matrix.sum(axis=1), diff_matrix.sum(axis=0)
+    if len(set(left_counts.tolist()) | set(right_counts.tolist())) > 1:
+        errors.append(f'diff 페어의 언론사별 등장 횟수가 다름 (왼쪽 {left_counts.min()}~{left_counts.max()}, '
+                      f'오른쪽 {right_counts.min()}~{right_counts.max()})')
+    diff_cells = diff_matrix[off_diagonal]
+    if len(diff_cells) and diff_cells.max() - diff_cells.min() > 1:
+        errors.append(f'언론사 쌍별 diff 페어 수가 고르지 않음 (최소 {diff_cells.min()}, 최대 {diff_cells.max()})')
+
+    for kind, part in [('same', slice(None, n_same)), ('diff', slice(n_same, None))]:
+        ids = pd.Index(np.concatenate([left_ids[part], right_ids[part]]))
+        if ids.has_duplicates:
+            errors.append(f'{kind} 페어에서 중복 사용된 기사: {int(ids.duplicated().sum())}개')
+
+    matrix = pd.DataFrame(np.where(np.eye(k, dtype=bool), same_matrix, diff_matrix), index=sources, columns=sources)
+    print("\nPair Matrix (diagonal: same pairs, off-diagonal: diff pairs, row: left source, column: right source):")
+    print(matrix.to_string())
     print("\nTotal pairs: ", len(same_pairs) + len(diff_pairs))
+    print(f"diff 페어 비대칭 최대값 |M - M^T|: {int(np.abs(diff_matrix - diff_matrix.T).max()) if k else 0}")
 
+    if save_path is not None:
+        save_path.mkdir(parents=True, exist_ok=True)
+        matrix.to_csv(save_path / 'pair_matrix.csv', encoding='utf-8-sig', index_label='source')
 
-def create_jsonl(same_pairs: list, diff_pairs: list, save_path: Path):
+    if errors:
+        for error in errors:
+            print(f'[페어 검증 실패] {error}')
+        if strict:
+            raise ValueError('페어 검증 실패: ' + '; '.join(errors))
+    else:
+        print('페어 검증 통과')
+
+    return matrix
+
+
+def create_jsonl(same_pairs: list, diff_pairs: list, save_path: Path,
+                 system_instruction: str = SYSTEM_INSTRUCTION, prompt: str = PROMPT, file_name: str = 'batch.jsonl'):
     """
     주어진 같은 언론사와 다른 언론사 페어 리스트를 기반으로 JSONL 형식의 요청을 생성합니다.
     :param same_pairs:
     :param diff_pairs:
+    :param save_path: jsonl 파일을 저장할 디렉토리
+    :param system_instruction: 시스템 지시문 (기본값: SYSTEM_INSTRUCTION)
+    :param prompt: 사용자 프롬프트 템플릿 (기본값: PROMPT)
+    :param file_name: 저장할 파일 이름 (기본값: 'batch.jsonl')
     :return:
     """
     custom_id_num = 0
     json_list = []
     for kind, pair_list in zip(['same', 'diff'], [same_pairs, diff_pairs]):
         for pair in pair_list:
-            title1 = pair[0]['title'].replace('{','{{').replace('}','}}')
-            text1 = pair[0]['text'].replace('{','{{').replace('}','}}')
-            title2 = pair[1]['title'].replace('{','{{').replace('}','}}')
-            text2 = pair[1]['text'].replace('{','{{').replace('}','}}')
+            title1 = pair.left.title.replace('{','{{').replace('}','}}')
+            text1 = pair.left.text.replace('{','{{').replace('}','}}')
+            title2 = pair.right.title.replace('{','{{').replace('}','}}')
+            text2 = pair.right.text.replace('{','{{').replace('}','}}')
 
             messages = []
             messages.append({
                 'role':'system',
-                'content':SYSTEM_INSTRUCTION
+                'content':system_instruction
             })
             messages.append({
                 'role':'user',
-                'content':PROMPT.format(title1=title1, text1=text1, title2=title2, text2=text2)
+                'content':prompt.format(title1=title1, text1=text1, title2=title2, text2=text2)
             })
 
             now_datetime = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
@@ -245,11 +323,13 @@ def create_jsonl(same_pairs: list, diff_pairs: list, save_path: Path):
     # jsonl 저장
     if not save_path.exists():
         save_path.mkdir(parents=True, exist_ok=True)
-    file_name = 'batch.jsonl'
     with open((save_path / file_name), 'w', encoding='utf-8') as f:
         for js in json_list:
             f.write(json.dumps(js, ensure_ascii=False)+'\n')
 
+    # 샘플링·조회용 오프셋 인덱스 생성 (batch.jsonl.idx)
+    load_index(save_path / file_name)
+
     print('\njsonl 파일 저장 완료.')
 
 
@@ -258,6 +338,7 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Create JSONL file for batch processing.')
     parser.add_argument('--csv-path', type=str, default="../dataset/preprocessed/filtered_news.csv", help='Path to the CSV file containing news data.')
     parser.add_argument('--save-path', type=str, default="../dataset/batch", help='Path to save the generated JSONL file.')
+    parser.add_argument('--prompt-variant', type=str, default=DEFAULT_PROMPT_VARIANT, choices=list(PROMPT_VARIANTS), help='사용할 프롬프트 변형')
     args = parser.parse_args()
 
     csv_path = Path(args.csv_path)
@@ -269,7 +350,8 @@ if __name__ == '__main__':
     same_pairs, diff_pairs = create_pairs(df)
 
     # 페어 검증
-    validate_pairs(same_pairs, diff_pairs)
+    validate_pairs(same_pairs, diff_pairs, save_path=save_path)
 
     # JSONL 파일 생성
-    create_jsonl(same_pairs, diff_pairs, save_path)
\ No newline at end of file
+    system_instruction, prompt = PROMPT_VARIANTS[args.prompt_variant]
+    create_jsonl(same_pairs, diff_pairs, save_path, system_instruction=system_instruction, prompt=prompt)
\ No newline at end of file
@@ -0,0 +1,205 @@
+import json
+import os
+import pathlib
+import statistics
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+# Metrics summarized with p50/p95/p99 at the end of a run
+SUMMARY_FIELDS = [
+    "ttft_s",
+    "decode_s",
+    "wall_s",
+    "decode_tokens_per_s",
+    "prompt_tokens",
+    "completion_tokens",
+]
+QUANTILES = (0.5, 0.95, 0.99)
+# Token counts are re-derived after streaming (see timed_chat_completion), not reported by llama.cpp
+ESTIMATED_FIELDS = {
+    "prompt_tokens": "Prompt tokens estimated as context size after generation minus completion tokens",
+    "completion_tokens": "Completion tokens estimated by re-tokenizing the streamed text",
+}
+DEFAULT_PROM_INTERVAL_S = 15.0
+
+
+def timed_chat_completion(llm, chat_params: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Run a streaming chat completion and measure prefill/decode timing.
+
+    Returns a response shaped like the non-streaming ``create_chat_completion`` result
+    (``choices[0].message.content``, ``finish_reason``, ``usage``) and a timing record.
+    Time-to-first-token covers prompt prefill plus the first sampled token; the rest of
+    the wall time is decode.
+
+    llama.cpp does not report usage on streamed responses, so both token counts are
+    estimates: ``completion_tokens`` re-tokenizes the joined streamed text (which can
+    differ from the sampled token sequence at piece boundaries), and ``prompt_tokens``
+    is ``llm.n_tokens`` after generation minus that estimate.
+    """
+    start = time.perf_counter()
+    first_token_at = None
+    pieces = []
+    finish_reason = None
+
+    for chunk in llm.create_chat_completion(**chat_params, stream=True):
+        choice = chunk["choices"][0]
+        content = choice.get("delta", {}).get("content")
+        if content:
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+            pieces.append(content)
+        if choice.get("finish_reason"):
+            finish_reason = choice["finish_reason"]
+
+    end = time.perf_counter()
+    text = "".join(pieces)
+
+    completion_tokens = len(llm.tokenize(text.encode("utf-8"), add_bos=False, special=True)) if text else 0
+    prompt_tokens = max(llm.n_tokens - completion_tokens, 0)
+
+    if first_token_at is None:
+        first_token_at = end
+    ttft = first_token_at - start
+    decode = end - first_token_at
+
+    response = {
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": text},
+            "finish_reason": finish_reason,
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+    timing = {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "ttft_s": ttft,
+        "decode_s": decode,
+        "wall_s": end - start,
+        # The first token is produced during prefill, so it is excluded from decode speed
+        "decode_tokens_per_s": (completion_tokens - 1) / decode if completion_tokens > 1 and decode > 0 else 0.0,
+        "prefill_tokens_per_s": prompt_tokens / ttft if ttft > 0 else 0.0,
+        "finish_reason": finish_reason,
+    }
+    return response, timing
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Linear-interpolated percentile of ``values`` (``q`` in [0, 1])."""
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    pos = (len(ordered) - 1) * q
+    lower = int(pos)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (pos - lower)
+
+
+def summarize(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Compute count, mean and p50/p95/p99 per metric, plus latency growth per prompt token."""
+    summary = {"count": len(records)}
+    for field in SUMMARY_FIELDS:
+        values = [r[field] for r in records if r.get(field) is not None]
+        summary[field] = {
+            "mean": statistics.fmean(values) if values else float("nan"),
+            **{f"p{int(q * 100)}": percentile(values, q) for q in QUANTILES},
+        }
+
+    # Least-squares fit of wall time against prompt length (capacity planning)
+    xs = [r["prompt_tokens"] for r in records]
+    ys = [r["wall_s"] for r in records]
+    if len(set(xs)) > 1:
+        slope, intercept = statistics.linear_regression(xs, ys)
+        summary["wall_s_per_prompt_token"] = slope
+        summary["wall_s_intercept"] = intercept
+    return summary
+
+
+class MetricsSink:
+    """Collects per-request metrics and writes them to a JSONL file or a Prometheus text file.
+
+    The format is chosen by suffix: ``.prom`` files are rewritten atomically with aggregate
+    counters and quantiles (node_exporter textfile collector style) at most every
+    ``prom_interval_s`` seconds and on close, since each rewrite summarizes every record;
+    anything else gets one JSON line per request and a final ``summary`` line.
+    """
+
+    def __init__(self, path: Optional[pathlib.Path], prefix: str = "kr_news_local",
+                 prom_interval_s: float = DEFAULT_PROM_INTERVAL_S):
+        self.path = pathlib.Path(path) if path else None
+        self.prefix = prefix
+        self.prom_interval_s = prom_interval_s
+        self._prom_written_at = float("-inf")
+        self.records: List[Dict[str, Any]] = []
+        self.prometheus = self.path is not None and self.path.suffix == ".prom"
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            if not self.prometheus and self.path.exists():
+                self.path.unlink()
+
+    def write(self, record: Dict[str, Any]):
+        """Add one request record and persist it."""
+        self.records.append(record)
+        if self.path is None:
+            return
+        if self.prometheus:
+            if time.monotonic() - self._prom_written_at >= self.prom_interval_s:
+                self._write_prometheus()
+        else:
+            with open(self.path, "at", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def close(self) -> Dict[str, Any]:
+        """Write the final summary and return it."""
+        summary = summarize(self.records)
+        if self.path is not None:
+            if self.prometheus:
+                self._write_prometheus()
+            else:
+                with open(self.path, "at", encoding="utf-8") as f:
+                    f.write(json.dumps({"summary": summary}, ensure_ascii=False) + "\n")
+        return summary
+
+    def _write_prometheus(self):
+        summary = summarize(self.records)
+        lines = [
+            f"# TYPE {self.prefix}_requests_total counter",
+            f"{self.prefix}_requests_total {summary['count']}",
+        ]
+        for field, help_text in ESTIMATED_FIELDS.items():
+            total = sum(r.get(field, 0) for r in self.records)
+            lines.append(f"# HELP {self.prefix}_{field}_estimated_total {help_text}")
+            lines.append(f"# TYPE {self.prefix}_{field}_estimated_total counter")
+            lines.append(f"{self.prefix}_{field}_estimated_total {total}")
+        for field in SUMMARY_FIELDS:
+            name = f"{self.prefix}_{field}_estimated" if field in ESTIMATED_FIELDS else f"{self.prefix}_{field}"
+            values = [r[field] for r in self.records if r.get(field) is not None]
+            if field in ESTIMATED_FIELDS:
+                lines.append(f"# HELP {name} {ESTIMATED_FIELDS[field]}")
+            lines.append(f"# TYPE {name} summary")
+            for q in QUANTILES:
+                lines.append(f'{name}{{quantile="{q}"}} {percentile(values, q)}')
+            lines.append(f"{name}_sum {sum(values)}")
+            lines.append(f"{name}_count {len(values)}")
+
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "wt", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, self.path)
+        self._prom_written_at = time.monotonic()
+
+
+def format_summary(summary: Dict[str, Any]) -> str:
+    """Render a summary as aligned text lines for console output."""
+    lines = [f"Requests: {summary['count']}"]
+    lines.append(f"{'metric':<22}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for field in SUMMARY_FIELDS:
+        stats = summary[field]
+        lines.append(f"{field:<22}" + "".join(f"{stats[k]:>10.3f}" for k in ("mean", "p50", "p95", "p99")))
+    if "wall_s_per_prompt_token" in summary:
+        lines.append(f"Wall time grows {summary['wall_s_per_prompt_token'] * 1000:.3f} ms per prompt token")
+    return "\n".join(lines)
@@ -0,0 +1,41 @@
+from dataclasses import dataclass
+from typing import Dict, Hashable
+
+import pandas as pd
+
+
+@dataclass(frozen=True, slots=True)
+class Article:
+    """
+    페어 생성·검증·직렬화에 필요한 기사 필드만 담은 경량 레코드입니다.
+    id는 DataFrame의 인덱스 값(원래 행 번호)이며, 문자열은 DataFrame 값을 복사하지 않고 참조합니다.
+    """
+    id: Hashable
+    source: str
+    title: str
+    text: str
+
+
+@dataclass(frozen=True, slots=True)
+class Pair:
+    """
+    두 기사의 페어입니다. 같은 기사는 여러 페어가 하나의 Article 객체를 공유합니다.
+    kind는 'same' 또는 'diff' 입니다.
+    """
+    kind: str
+    left: Article
+    right: Article
+
+
+def build_articles(df: pd.DataFrame) -> Dict[Hashable, Article]:
+    """
+    DataFrame의 각 행을 Article로 한 번만 변환합니다. 언론사 이름은 하나의 문자열 객체를 공유합니다.
+    :param df: 'source', 'title', 'text' 컬럼을 포함하는 DataFrame
+    :return: {인덱스 값: Article}
+    """
+    source_table = {}  # 언론사 이름 -> 공유 문자열
+    sources = [source_table.setdefault(source, source) for source in df['source'].tolist()]
+    return {
+        idx: Article(idx, source, title, text)
+        for idx, source, title, text in zip(df.index.tolist(), sources, df['title'].tolist(), df['text'].tolist())
+    }
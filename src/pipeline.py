@@ -0,0 +1,390 @@
+import hashlib
+import json
+import shutil
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Callable, Dict, List
+import argparse
+
+import pandas as pd
+
+# 상수 지정
+
+PIPELINE_VERSION = 1
+DONE_FILE = 'done.json'
+EXECUTORS = ['none', 'stylometry', 'local', 'realtime', 'batch']
+
+# 로컬 모델은 한 번만 올리고 변형들이 순서대로 사용 (메모리에 27B 모델 두 개를 올리지 않도록)
+_local_lock = threading.Lock()
+_local_model = {}
+
+
+class Stage:
+    """
+    파이프라인 DAG의 한 단계. 출력 디렉토리는 단계 이름, 파라미터, 선행 단계 키의 해시로 정해집니다.
+    """
+
+    def __init__(self, name: str, func: Callable, deps: List[str] = None, params: dict = None, fingerprint: str = ''):
+        self.name = name
+        self.func = func
+        self.deps = deps or []
+        self.params = params or {}
+        self.fingerprint = fingerprint  # 입력 파일 등 파라미터 밖의 입력 (parse 단계)
+        self.key = None
+
+    def compute_key(self, dep_keys: List[str]) -> str:
+        payload = json.dumps({
+            'version': PIPELINE_VERSION,
+            'stage': self.name,
+            'params': self.params,
+            'deps': dep_keys,
+            'fingerprint': self.fingerprint,
+        }, sort_keys=True, ensure_ascii=False)
+        self.key = hashlib.sha256(payload.encode('utf-8')).hexdigest()[:12]
+        return self.key
+
+    def dir_name(self) -> str:
+        safe_name = self.name.replace('[', '-').replace(']', '')
+        return f'{safe_name}-{self.key}'
+
+
+def dataset_fingerprint(dataset_path: Path) -> str:
+    """
+    원본 JSON 파일들의 이름·크기·수정 시각으로 데이터셋 지문을 계산합니다.
+    :param dataset_path: JSON 파일 디렉토리
+    :return: 지문 문자열
+    """
+    entries = sorted(
+        (p.name, p.stat().st_size, p.stat().st_mtime_ns)
+        for p in dataset_path.iterdir() if p.suffix == '.json'
+    )
+    return hashlib.sha256(json.dumps(entries).encode('utf-8')).hexdigest()
+
+
+def run_dag(stages: Dict[str, Stage], work_dir: Path, max_workers: int = 4, force: List[str] = ()) -> Dict[str, Path]:
+    """
+    단계들을 의존 순서대로 실행합니다. 서로 독립적인 단계(프롬프트 변형별 단계 등)는 병렬로 실행하고,
+    같은 키의 결과가 이미 있으면 건너뜁니다.
+    :param stages: {단계 이름: Stage}
+    :param work_dir: 단계별 출력을 저장할 루트 디렉토리
+    :param max_workers: 동시에 실행할 단계 수 (기본값: 4)
+    :param force: 캐시를 무시하고 다시 실행할 단계 이름 (접두사 매칭, 예: 'execute')
+    :return: {단계 이름: 출력 디렉토리}
+    """
+    # 키 계산 (위상 정렬 순서)
+    order, visiting = [], set()
+
+    def visit(name):
+        if name in order:
+            return
+        if name in visiting:
+            raise ValueError(f'순환 의존성이 있습니다: {name}')
+        visiting.add(name)
+        for dep in stages[name].deps:
+            visit(dep)
+        visiting.discard(name)
+        order.append(name)
+
+    for name in stages:
+        visit(name)
+    forced = set()
+    for name in order:
+        stage = stages[name]
+        if any(name.startswith(prefix) for prefix in force) or any(dep in forced for dep in stage.deps):
+            forced.add(name)
+        stage.compute_key([stages[dep].key for dep in stage.deps])
+
+    outputs = {name: work_dir / stages[name].dir_name() for name in order}
+
+    def execute(name):
+        stage = stages[name]
+        out_dir = outputs[name]
+        if (out_dir / DONE_FILE).exists() and name not in forced:
+            print(f'[{name}] 캐시 사용 ({out_dir.name})')
+            return
+        tmp_dir = out_dir.with_name(out_dir.name + '.tmp')
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        tmp_dir.mkdir(parents=True)
+
+        print(f'[{name}] 실행 중...')
+        start = time.perf_counter()
+        # 단계 함수는 선행 단계의 최종 디렉토리와 자신의 임시 디렉토리를 받음
+        stage.func(tmp_dir, {dep: outputs[dep] for dep in stage.deps}, **stage.params)
+        elapsed = time.perf_counter() - start
+        with open(tmp_dir / DONE_FILE, 'w', encoding='utf-8') as f:
+            json.dump({'stage': name, 'key': stage.key, 'params': stage.params, 'deps': stage.deps,
+                       'seconds': elapsed}, f, ensure_ascii=False, indent=2)
+
+        shutil.rmtree(out_dir, ignore_errors=True)
+        tmp_dir.rename(out_dir)
+        print(f'[{name}] 완료 ({elapsed:.2f}초)')
+
+    done, running = set(), {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while len(done) < len(order):
+            for name in order:
+                if name not in done and name not in running and all(dep in done for dep in stages[name].deps):
+                    running[name] = pool.submit(execute, name)
+            finished, _ = wait(running.values(), return_when=FIRST_COMPLETED)
+            for name in [n for n, fut in running.items() if fut in finished]:
+                running.pop(name).result()  # 단계 실패 시 예외 전파
+                done.add(name)
+
+    return outputs
+
+
+# -------------------------------------------------------------------------
+# 단계 함수: (출력 디렉토리, {선행 단계: 디렉토리}, **파라미터)
+# -------------------------------------------------------------------------
+
+def stage_parse(out_dir: Path, inputs: Dict[str, Path], dataset_path: str):
+    from preprocessing import parse_news
+
+    df = parse_news(Path(dataset_path))
+    df.to_csv(out_dir / 'parsed_news.csv', encoding='utf-8-sig', index_label='id')
+    print(f'[parse] 기사 {len(df)}개')
+
+
+def stage_filter(out_dir: Path, inputs: Dict[str, Path], min_length: int, max_length: int, top_k: int, dedup: bool, dedup_threshold: float):
+    from preprocessing import deduplicate_news, preprocess_news
+
+    df = pd.read_csv(inputs['parse'] / 'parsed_news.csv', encoding='utf-8-sig', index_col='id')
+    if dedup:
+        df = deduplicate_news(df, threshold=dedup_threshold)
+    df = preprocess_news(df.copy(), min_length, max_length, top_k=top_k)
+    df.to_csv(out_dir / 'top_news.csv', encoding='utf-8-sig', index_label='id')
+
+
+def stage_sample(out_dir: Path, inputs: Dict[str, Path], sample_size: int, seed: int, stratify: list, length_buckets: int):
+    from preprocessing import randomize_and_sample_news
+
+    df = pd.read_csv(inputs['filter'] / 'top_news.csv', encoding='utf-8-sig', index_col='id')
+    df = randomize_and_sample_news(df, sample_size=sample_size, seed=seed, stratify=stratify, length_buckets=length_buckets)
+    df.to_csv(out_dir / 'filtered_news.csv', encoding='utf-8-sig', index_label='id')
+
+
+def _read_sample(sample_dir: Path) -> pd.DataFrame:
+    # make_jsonl_for_batch.py와 같은 방식으로 읽음 ('id' 컬럼 + RangeIndex)
+    return pd.read_csv(sample_dir / 'filtered_news.csv', encoding='utf-8')
+
+
+def _read_pairs(pair_dir: Path, df: pd.DataFrame):
+    from pairs import Pair, build_articles
+
+    pairs = pd.read_csv(pair_dir / 'pairs.csv')
+    articles = build_articles(df)
+    same_pairs, diff_pairs = [], []
+    for kind, left, right in pairs.itertuples(index=False):
+        (same_pairs if kind == 'same' else diff_pairs).append(Pair(kind, articles[left], articles[right]))
+    return same_pairs, diff_pairs
+
+
+def stage_pair(out_dir: Path, inputs: Dict[str, Path]):
+    from make_jsonl_for_batch import create_pairs, validate_pairs
+
+    df = _read_sample(inputs['sample'])
+    same_pairs, diff_pairs = create_pairs(df)
+    validate_pairs(same_pairs, diff_pairs, save_path=out_dir)
+    rows = [(pair.kind, pair.left.id, pair.right.id) for pair in same_pairs + diff_pairs]
+    pd.DataFrame(rows, columns=['kind', 'left', 'right']).to_csv(out_dir / 'pairs.csv', index=False)
+
+
+def stage_serialize(out_dir: Path, inputs: Dict[str, Path], variant: str):
+    from make_jsonl_for_batch import create_jsonl, PROMPT_VARIANTS
+
+    df = _read_sample(inputs['sample'])
+    same_pairs, diff_pairs = _read_pairs(inputs['pair'], df)
+    system_instruction, prompt = PROMPT_VARIANTS[variant]
+    create_jsonl(same_pairs, diff_pairs, out_dir, system_instruction=system_instruction, prompt=prompt)
+
+
+def _run_adaptive(out_dir: Path, jsonl_path: Path, predict, concurrency: int, adaptive_width: float,
+                  adaptive_min_samples: int) -> pd.DataFrame:
+    from adaptive import AdaptiveEvaluator, run_adaptive, summarize
+    from batch_index import load_index
+
+    evaluator = AdaptiveEvaluator(target_width=adaptive_width, min_samples=adaptive_min_samples)
+    preds = run_adaptive(jsonl_path, predict, evaluator, concurrency=concurrency)
+    pd.DataFrame(evaluator.history).to_csv(out_dir / 'history.csv', encoding='utf-8-sig', index=False)
+    with open(out_dir / 'adaptive.json', 'w', encoding='utf-8') as f:
+        json.dump(summarize(evaluator, len(load_index(jsonl_path))), f, ensure_ascii=False, indent=2)
+    return preds
+
+
+def stage_execute(out_dir: Path, inputs: Dict[str, Path], executor: str, variant: str,
+                  adaptive_width: float = 0.0, adaptive_min_samples: int = 100):
+    from batch_index import load_index, gold_label_of
+
+    serialize_dir = inputs[f'serialize[{variant}]']
+    jsonl_path = serialize_dir / 'batch.jsonl'
+    index = load_index(jsonl_path)
+
+    if executor == 'stylometry':
+        from stylometry import score_pairs
+
+        df = _read_sample(inputs['sample'])
+        same_pairs, diff_pairs = _read_pairs(inputs['pair'], df)
+        scores = score_pairs(df, same_pairs, diff_pairs)
+        preds = pd.DataFrame({
+            'custom_id': index.custom_ids,
+            'gold_label': scores['gold_label'],
+            'pred_label': scores['pred_label'],
+            'is_error': False,
+        })
+
+    elif executor == 'local' and adaptive_width > 0:
+        from adaptive import local_predictor
+        from run_local import load_model
+
+        with _local_lock:
+            if 'llm' not in _local_model:
+                _local_model['llm'], _local_model['kwargs'] = load_model()
+            preds = _run_adaptive(out_dir, jsonl_path, local_predictor(_local_model['llm']), 1,
+                                  adaptive_width, adaptive_min_samples)
+
+    elif executor == 'realtime':
+        from adaptive import realtime_predictor
+        from call_batch_api import get_client
+
+        # adaptive_width가 0이면 수렴하지 않으므로 모든 요청을 실행
+        preds = _run_adaptive(out_dir, jsonl_path, realtime_predictor(get_client()), 8,
+                              adaptive_width, adaptive_min_samples)
+
+    elif executor == 'local':
+        from run_local import load_model, process_jsonl_file, save_results
+        from metrics import MetricsSink
+
+        with _local_lock:
+            if 'llm' not in _local_model:
+                _local_model['llm'], _local_model['kwargs'] = load_model()
+            metrics_sink = MetricsSink(out_dir / 'metrics.jsonl')
+            results = process_jsonl_file(jsonl_path, out_dir / 'intermediate_results.jsonl',
+                                         _local_model['llm'], _local_model['kwargs'], metrics_sink)
+            metrics_sink.close()
+        save_results(results, out_dir / 'output.jsonl')
+
+        rows = []
+        for result in results:
+            custom_id = result.get('custom_id', '')
+            label = result.get('verdict', '')
+            rows.append((custom_id, gold_label_of(custom_id), label, label == ''))
+        preds = pd.DataFrame(rows, columns=['custom_id', 'gold_label', 'pred_label', 'is_error'])
+
+    elif executor == 'batch':
+        import call_batch_api
+
+        batch_id = call_batch_api.create_batch_job(jsonl_path)
+        df = call_batch_api.monitor_batch_job(batch_id, out_dir / 'batch_output.jsonl', out_dir / 'batch_output.csv')
+        # 잘못된 batch id, 실패·취소된 작업은 None -> 예외로 중단해 단계가 완료로 캐시되지 않게 함
+        if df is None:
+            raise RuntimeError(f'배치 작업이 완료되지 않았습니다 (batch id: {batch_id})')
+        preds = df[['custom_id', 'gold_label', 'pred_label', 'is_error']]
+
+    else:
+        raise ValueError(f'알 수 없는 실행기입니다: {executor}')
+
+    preds.to_csv(out_dir / 'predictions.csv', encoding='utf-8-sig', index=False)
+
+
+def stage_evaluate(out_dir: Path, inputs: Dict[str, Path], variant: str):
+    from sklearn.metrics import accuracy_score, f1_score, matthews_corrcoef, precision_score, recall_score
+
+    preds = pd.read_csv(inputs[f'execute[{variant}]'] / 'predictions.csv', encoding='utf-8-sig', keep_default_na=False)
+    valid = preds[~preds['is_error'].astype(bool)]
+    y_true = valid['gold_label'] == 'same'
+    y_pred = valid['pred_label'] == 'same'
+    metrics = {
+        'variant': variant,
+        'total': int(len(preds)),
+        'errors': int(len(preds) - len(valid)),
+        'accuracy': float(accuracy_score(y_true, y_pred)) if len(valid) else float('nan'),
+        'precision': float(precision_score(y_true, y_pred, zero_division=0)),
+        'recall': float(recall_score(y_true, y_pred, zero_division=0)),
+        'f1': float(f1_score(y_true, y_pred, zero_division=0)),
+        'mcc': float(matthews_corrcoef(y_true, y_pred)) if len(valid) else float('nan'),
+    }
+    with open(out_dir / 'metrics.json', 'w', encoding='utf-8') as f:
+        json.dump(metrics, f, ensure_ascii=False, indent=2)
+
+
+def build_stages(args) -> Dict[str, Stage]:
+    """
+    CLI 인자로 parse → filter → sample → pair → serialize → execute → evaluate DAG를 구성합니다.
+    serialize 이후 단계는 프롬프트 변형마다 별도의 가지로 만들어집니다.
+    """
+    dataset_path = Path(args.dataset_path).resolve()
+    stages = {
+        'parse': Stage('parse', stage_parse, params={'dataset_path': str(dataset_path)},
+                       fingerprint=dataset_fingerprint(dataset_path)),
+        'filter': Stage('filter', stage_filter, deps=['parse'], params={
+            'min_length': args.min_length, 'max_length': args.max_length, 'top_k': args.top_k,
+            'dedup': not args.no_dedup, 'dedup_threshold': args.dedup_threshold,
+        }),
+        'sample': Stage('sample', stage_sample, deps=['filter'], params={
+            'sample_size': args.sample_size, 'seed': args.seed,
+            'stratify': args.stratify, 'length_buckets': args.length_buckets,
+        }),
+        'pair': Stage('pair', stage_pair, deps=['sample']),
+    }
+    for variant in args.variants:
+        stages[f'serialize[{variant}]'] = Stage(f'serialize[{variant}]', stage_serialize,
+                                                deps=['sample', 'pair'], params={'variant': variant})
+        if args.executor == 'none':
+            continue
+        execute_params = {'executor': args.executor, 'variant': variant}
+        if args.adaptive_width > 0:
+            execute_params.update(adaptive_width=args.adaptive_width, adaptive_min_samples=args.adaptive_min_samples)
+        stages[f'execute[{variant}]'] = Stage(f'execute[{variant}]', stage_execute,
+                                              deps=['sample', 'pair', f'serialize[{variant}]'],
+                                              params=execute_params)
+        stages[f'evaluate[{variant}]'] = Stage(f'evaluate[{variant}]', stage_evaluate,
+                                               deps=[f'execute[{variant}]'], params={'variant': variant})
+    return stages
+
+
+if __name__ == '__main__':
+    from make_jsonl_for_batch import PROMPT_VARIANTS, DEFAULT_PROMPT_VARIANT, NEWS_NUMBER_PER_SOURCE
+    from preprocessing import STRATA
+
+    # 인자 파싱
+    parser = argparse.ArgumentParser(description='Run the whole authorship pipeline as a cached DAG.')
+    parser.add_argument('--dataset-path', type=str, default="../dataset", help='Path to the dataset directory containing JSON files.')
+    parser.add_argument('--work-dir', type=str, default="../dataset/pipeline", help='Path to store stage outputs.')
+    parser.add_argument('--min-length', type=int, default=501, help='최소 기사 길이')
+    parser.add_argument('--max-length', type=int, default=1000, help='최대 기사 길이')
+    parser.add_argument('--no-dedup', action='store_true', help='중복 기사 제거 단계를 건너뜀')
+    parser.add_argument('--dedup-threshold', type=float, default=0.8, help='유사 중복으로 판단할 자카드 유사도')
+    parser.add_argument('--top-k', type=int, default=10, help='남길 언론사 수 (기사 수 상위)')
+    parser.add_argument('--sample-size', type=int, default=NEWS_NUMBER_PER_SOURCE, help='언론사별 샘플링 기사 수')
+    parser.add_argument('--stratify', nargs='*', default=[], choices=STRATA, help='층화 샘플링 기준')
+    parser.add_argument('--length-buckets', type=int, default=4, help='length_bucket 층화 시 길이 구간 수')
+    parser.add_argument('--seed', type=int, default=42, help='무작위 시드 값')
+    parser.add_argument('--variants', nargs='+', default=[DEFAULT_PROMPT_VARIANT], choices=list(PROMPT_VARIANTS), help='실행할 프롬프트 변형들 (병렬 실행)')
+    parser.add_argument('--executor', type=str, default='none', choices=EXECUTORS, help='요청 실행기')
+    parser.add_argument('--adaptive-width', type=float, default=0.0, help='local/realtime 실행기에서 신뢰구간 폭이 이 값 이하가 되면 조기 종료 (0: 전체 실행)')
+    parser.add_argument('--adaptive-min-samples', type=int, default=100, help='조기 종료 전 최소 결과 수')
+    parser.add_argument('--workers', type=int, default=4, help='동시에 실행할 단계 수')
+    parser.add_argument('--force', nargs='*', default=[], help='캐시를 무시하고 다시 실행할 단계 (예: execute)')
+    args = parser.parse_args()
+    # create_pairs는 언론사당 2 * 언론사 수 이상의 기사가 있어야 균형 잡힌 다른 언론사 페어를 만들 수 있음
+    if args.top_k < 2:
+        parser.error(f'--top-k는 2 이상이어야 합니다 (입력: {args.top_k})')
+    if args.sample_size < 2 * args.top_k:
+        parser.error(f'--sample-size는 2 * --top-k({2 * args.top_k}) 이상이어야 합니다 (입력: {args.sample_size})')
+
+    work_dir = Path(args.work_dir)
+    work_dir.mkdir(parents=True, exist_ok=True)
+
+    stages = build_stages(args)
+    outputs = run_dag(stages, work_dir, max_workers=args.workers, force=args.force)
+
+    print('-'*50)
+    for variant in args.variants:
+        print(f"{variant}: {outputs[f'serialize[{variant}]'] / 'batch.jsonl'}")
+        evaluate_dir = outputs.get(f'evaluate[{variant}]')
+        if evaluate_dir:
+            with open(evaluate_dir / 'metrics.json', 'r', encoding='utf-8') as f:
+                metrics = json.load(f)
+            print(f"  accuracy {metrics['accuracy']:.4f} | MCC {metrics['mcc']:.4f} | F1 {metrics['f1']:.4f} | errors {metrics['errors']}/{metrics['total']}")
@@ -1,8 +1,15 @@
+import numpy as np
 import pandas as pd
 from pathlib import Path
 import argparse
 import json
 
+# shingle 다항식 해시의 밑 (FNV prime)
+SHINGLE_BASE = 0x01000193
+
+# 층화 샘플링에 사용할 수 있는 컬럼
+STRATA = ['length_bucket', 'topic']
+
 
 def parse_news(dataset_path: Path) -> pd.DataFrame:
     """
@@ -14,7 +21,8 @@ def parse_news(dataset_path: Path) -> pd.DataFrame:
     dic = {
         'source':[],
         'title':[],
-        'text':[]
+        'text':[],
+        'topic':[]
     }
 
     except_count = 0
@@ -35,6 +43,9 @@ def parse_news(dataset_path: Path) -> pd.DataFrame:
                         print(paragraph)
                         print()
                     dic['text'].append(paragraph[0].get('context',''))
+                    # 주제 분류 (doc_class가 있는 경우, 층화 샘플링용)
+                    doc_class = instance.get('doc_class')
+                    dic['topic'].append(doc_class.get('class') if isinstance(doc_class, dict) else doc_class)
             except:
                 except_count +=1
 
@@ -42,50 +53,227 @@ def parse_news(dataset_path: Path) -> pd.DataFrame:
     return df
 
 
-def preprocess_news(df: pd.DataFrame, min_length: int = 501, max_length: int = 1000) -> pd.DataFrame:
+def _shingle_hashes(text: str, ngram: int) -> np.ndarray:
+    """
+    공백을 제거한 텍스트의 문자 n-gram을 32비트 다항식 해시로 변환합니다. (중복 제거됨)
+    :param text: 기사 본문
+    :param ngram: n-gram 길이
+    :return: shingle 해시 배열 (uint64)
+    """
+    codes = np.frombuffer(''.join(text.split()).encode('utf-32-le'), dtype=np.uint32)
+    if len(codes) < ngram:
+        codes = np.concatenate([codes, np.zeros(ngram - len(codes), dtype=np.uint32)])
+
+    n = len(codes) - ngram + 1
+    hashes = np.zeros(n, dtype=np.uint32)
+    for j in range(ngram):
+        hashes = hashes * np.uint32(SHINGLE_BASE) + codes[j:j + n]  # uint32 overflow = mod 2^32
+    return np.unique(hashes).astype(np.uint64)
+
+
+def minhash_signatures(texts: list, num_perm: int = 128, ngram: int = 5, seed: int = 42) -> np.ndarray:
+    """
+    각 텍스트의 문자 n-gram 집합에 대한 MinHash 시그니처를 계산합니다.
+    :param texts: 기사 본문 리스트
+    :param num_perm: 해시 함수 개수 (기본값: 128)
+    :param ngram: 문자 n-gram 길이 (기본값: 5)
+    :param seed: 해시 계수 생성 시드 (기본값: 42)
+    :return: (len(texts), num_perm) 크기의 uint32 시그니처 행렬
+    """
+    rng = np.random.default_rng(seed)
+    # multiply-add-shift 해시: (a*x + b) mod 2^64 의 상위 32비트 (a는 홀수)
+    a = rng.integers(0, np.iinfo(np.uint64).max, size=(num_perm, 1), dtype=np.uint64, endpoint=True) | np.uint64(1)
+    b = rng.integers(0, np.iinfo(np.uint64).max, size=(num_perm, 1), dtype=np.uint64, endpoint=True)
+
+    signatures = np.empty((len(texts), num_perm), dtype=np.uint32)
+    for i, text in enumerate(texts):
+        shingles = _shingle_hashes(text, ngram)
+        permuted = (a * shingles + b) >> np.uint64(32)  # uint64 overflow = mod 2^64
+        signatures[i] = permuted.min(axis=1)
+    return signatures
+
+
+def near_duplicate_groups(signatures: np.ndarray, threshold: float = 0.8, bands: int = 16) -> np.ndarray:
+    """
+    MinHash 시그니처에 LSH 밴딩을 적용하여 유사 중복 기사 그룹을 찾습니다.
+    같은 버킷에 들어간 후보만 추정 자카드 유사도로 검증하므로 전체 쌍 비교(O(N^2))를 하지 않습니다.
+    :param signatures: minhash_signatures의 결과
+    :param threshold: 유사 중복으로 판단할 추정 자카드 유사도 (기본값: 0.8)
+    :param bands: LSH 밴드 수, num_perm의 약수여야 함 (기본값: 16)
+    :return: 각 행이 속한 그룹의 대표 행 번호 (그룹 내 가장 앞선 행)
+    """
+    n, num_perm = signatures.shape
+    if num_perm % bands != 0:
+        raise ValueError(f"num_perm({num_perm})은 bands({bands})로 나누어 떨어져야 합니다.")
+    rows = num_perm // bands
+
+    parent = np.arange(n)
+
+    def find(x):
+        root = x
+        while parent[root] != root:
+            root = parent[root]
+        while parent[x] != root:  # 경로 압축
+            parent[x], x = root, parent[x]
+        return root
+
+    for band in range(bands):
+        band_sig = np.ascontiguousarray(signatures[:, band * rows:(band + 1) * rows])
+        keys = band_sig.view(np.dtype((np.void, band_sig.dtype.itemsize * rows))).ravel()
+        _, bucket, counts = np.unique(keys, return_inverse=True, return_counts=True)
+
+        candidates = np.flatnonzero(counts[bucket] > 1)
+        if len(candidates) == 0:
+            continue
+        # 버킷별 첫 번째 행을 기준으로 나머지 행과 비교
+        order = candidates[np.argsort(bucket[candidates], kind='stable')]
+        first_of_bucket = {}
+        for row in order:
+            key = bucket[row]
+            head = first_of_bucket.setdefault(key, row)
+            if head == row:
+                continue
+            similarity = np.mean(signatures[head] == signatures[row])
+            if similarity >= threshold:
+                root_head, root_row = find(head), find(row)
+                if root_head != root_row:
+                    parent[max(root_head, root_row)] = min(root_head, root_row)
+
+    return np.array([find(i) for i in range(n)])
+
+
+def deduplicate_news(df: pd.DataFrame, threshold: float = 0.8, num_perm: int = 128, bands: int = 16, ngram: int = 5, seed: int = 42) -> pd.DataFrame:
     """
-    뉴스 기사 데이터를 전처리하여 길이에 따라 필터링하고, 상위 10개 언론사의 기사만 추출하여 저장합니다.
+    완전히 동일한 기사(공백 무시)와 MinHash/LSH로 찾은 유사 중복 기사(통신사 전재 기사 등)를 제거합니다.
+    중복 그룹마다 가장 앞선 기사 하나만 남깁니다.
+    :param df: 입력 데이터프레임 (columns: ['source', 'title', 'text'])
+    :param threshold: 유사 중복으로 판단할 추정 자카드 유사도 (기본값: 0.8)
+    :param num_perm: MinHash 해시 함수 개수 (기본값: 128)
+    :param bands: LSH 밴드 수 (기본값: 16)
+    :param ngram: 문자 n-gram 길이 (기본값: 5)
+    :param seed: 해시 계수 생성 시드 (기본값: 42)
+    :return: 중복이 제거된 데이터프레임 (기존 인덱스 유지)
+    """
+
+    # 완전 중복 제거 (공백 차이 무시)
+    normalized = df['text'].str.replace(r'\s+', '', regex=True)
+    exact_dup = normalized.duplicated(keep='first')
+    df_exact = df[~exact_dup]
+
+    # 유사 중복 제거
+    signatures = minhash_signatures(df_exact['text'].tolist(), num_perm=num_perm, ngram=ngram, seed=seed)
+    groups = near_duplicate_groups(signatures, threshold=threshold, bands=bands)
+    keep = groups == np.arange(len(groups))
+    df_dedup = df_exact[keep]
+
+    print(f'완전 중복 기사 {int(exact_dup.sum())}개, 유사 중복 기사 {int((~keep).sum())}개 제거')
+    print(f'중복 제거 후 기사 수: {len(df_dedup)}개')
+    print('-'*50)
+
+    return df_dedup
+
+
+def preprocess_news(df: pd.DataFrame, min_length: int = 501, max_length: int = 1000, top_k: int = 10) -> pd.DataFrame:
+    """
+    뉴스 기사 데이터를 전처리하여 길이에 따라 필터링하고, 기사 수 상위 top_k개 언론사의 기사만 추출하여 저장합니다.
     :param df: 입력 데이터프레임 (columns: ['id', 'title', 'text', 'source'])
     :param min_length: 최소 기사 길이 (기본값: 501)
     :param max_length: 최대 기사 길이 (기본값: 1000)
+    :param top_k: 남길 언론사 수 (기본값: 10)
     :return: 필터링된 뉴스 기사 데이터프레임
     """
 
     # 길이대로 자르기 (500자 초과 1000자 이하)
-    df['length'] = df['text'].apply(len)
-    df_filtered = df[(min_length <= df['length']) & (df['length'] <= max_length)]
+    df['length'] = df['text'].str.len()
+    df_filtered = df[df['length'].between(min_length, max_length)]
 
-    # 기사 수 상위 10개의 언론사만 추출
-    top10 = df_filtered.groupby('source').count().sort_values(by='text', ascending=False).iloc[:10]
-    print('상위 10개 언론사')
-    for _, (i,c) in enumerate(zip(top10.index,top10['title']), start=1):
+    # 기사 수 상위 top_k개의 언론사만 추출
+    top_sources = df_filtered['source'].value_counts().iloc[:top_k]
+    print(f'상위 {top_k}개 언론사')
+    for _, (i,c) in enumerate(top_sources.items(), start=1):
         print(f'{_}. {i} ({c}개)')
     print('-'*50)
 
-    df_top10_filtered = df_filtered[df_filtered['source'].isin(top10.index)]
-    df_top10_filtered = df_top10_filtered.reset_index(drop=True) # 인덱스 0부터 재지정
+    df_top_filtered = df_filtered[df_filtered['source'].isin(top_sources.index)]
+    df_top_filtered = df_top_filtered.reset_index(drop=True) # 인덱스 0부터 재지정
+
+    return df_top_filtered
+
 
-    return df_top10_filtered
+def add_length_bucket(df: pd.DataFrame, buckets: int = 4) -> pd.DataFrame:
+    """
+    기사 길이의 분위수로 'length_bucket' 컬럼을 추가합니다. (0 = 가장 짧은 구간)
+    :param df: 'length' 또는 'text' 컬럼을 포함하는 데이터프레임
+    :param buckets: 구간 수 (기본값: 4)
+    :return: 컬럼이 추가된 데이터프레임
+    """
+    lengths = df['length'] if 'length' in df.columns else df['text'].str.len()
+    df = df.assign(length_bucket=pd.qcut(lengths, q=buckets, labels=False, duplicates='drop'))
+    return df
 
 
-def randomize_and_sample_news(df: pd.DataFrame, sample_size: int = 100, seed: int = 42) -> pd.DataFrame:
+def _stratum_quotas(df: pd.DataFrame, keys: list, sample_size: int) -> pd.Series:
+    """
+    언론사별 sample_size를 층(stratum)의 크기에 비례하도록 최대 잉여 방식으로 배분합니다.
+    :return: (source, *strata) 인덱스의 층별 샘플 수
+    """
+    sizes = df.groupby(keys, observed=True).size()
+    totals = sizes.groupby(level='source').transform('sum')
+    exact = sizes * sample_size / totals
+    quotas = np.floor(exact).astype(int)
+
+    # 언론사별로 남은 개수를 잉여가 큰 층부터 1개씩 배분
+    deficit = sample_size - quotas.groupby(level='source').transform('sum')
+    remainder_rank = (exact - quotas).groupby(level='source').rank(method='first', ascending=False)
+    quotas += (remainder_rank <= deficit).astype(int)
+    return quotas
+
+
+def randomize_and_sample_news(df: pd.DataFrame, sample_size: int = 100, seed: int = 42,
+                              stratify: list = None, length_buckets: int = 4) -> pd.DataFrame:
     """
     뉴스 기사 데이터를 무작위로 섞고, 지정된 크기만큼 샘플링합니다.
+    stratify를 지정하면 언론사마다 길이 구간·주제 분포를 유지하도록 층화 샘플링합니다.
     :param df: 입력 데이터프레임
     :param sample_size: 신문사별로 샘플링할 기사 수 (기본값: 100)
     :param seed: 무작위 시드 값 (기본값: 42)
+    :param stratify: 층화 기준 컬럼 리스트 (STRATA 중에서 선택, 기본값: None)
+    :param length_buckets: 'length_bucket' 층화 시 길이 구간 수 (기본값: 4)
     :return: 무작위로 섞인 샘플링된 데이터프레임
     """
 
-    concat_list = []
-    for source, member_df in df.groupby('source'):
-        sampled_member = member_df.sample(n=sample_size, random_state=seed)
-        concat_list.append(sampled_member)
+    if not stratify:
+        df_sampled = df.groupby('source').sample(n=sample_size, random_state=seed).reset_index(drop=True)
+    else:
+        unknown = set(stratify) - set(STRATA)
+        if unknown:
+            raise ValueError(f'지원하지 않는 층화 기준입니다: {sorted(unknown)} (가능: {STRATA})')
+        if 'length_bucket' in stratify:
+            df = add_length_bucket(df, length_buckets)
+        if 'topic' in stratify:
+            df = df.assign(topic=df['topic'].fillna('') if 'topic' in df.columns else '')
+
+        source_sizes = df['source'].value_counts()
+        if (source_sizes < sample_size).any():
+            raise ValueError(f'기사 수가 {sample_size}개 미만인 언론사가 있습니다: {source_sizes[source_sizes < sample_size].to_dict()}')
 
-    df_sampled = pd.concat(concat_list, axis=0).reset_index(drop=True)
+        keys = ['source'] + list(stratify)
+        quotas = _stratum_quotas(df, keys, sample_size)
+
+        # 층 안에서 무작위 순위를 매겨 배분된 개수만큼 선택
+        rng = np.random.default_rng(seed)
+        df = df.assign(_order=rng.random(len(df)))
+        rank = df.groupby(keys, observed=True)['_order'].rank(method='first')
+        quota = pd.MultiIndex.from_frame(df[keys]).map(quotas).to_numpy()
+        df_sampled = (df[rank.to_numpy() <= quota]
+                      .sort_values(['source', '_order'])
+                      .drop(columns='_order')
+                      .reset_index(drop=True))
 
     # 통계
     print(f'총 {len(df_sampled)}개의 기사가 샘플링되었습니다.')
+    if stratify:
+        print(df_sampled.groupby(stratify, observed=True).size().rename('count').to_string())
     print('샘플링된 데이터프레임의 상위 5개 행:')
     print(df_sampled.head())
 
@@ -98,6 +286,12 @@ if __name__ == '__main__':
     parser.add_argument('--min-length', type=int, default=501, help='최소 기사 길이')
     parser.add_argument('--max-length', type=int, default=1000, help='최대 기사 길이')
     parser.add_argument('--dataset-path', type=str, default="../dataset", help='Path to the dataset directory containing JSON files.')
+    parser.add_argument('--no-dedup', action='store_true', help='중복 기사 제거 단계를 건너뜀')
+    parser.add_argument('--dedup-threshold', type=float, default=0.8, help='유사 중복으로 판단할 자카드 유사도')
+    parser.add_argument('--top-k', type=int, default=10, help='남길 언론사 수 (기사 수 상위)')
+    parser.add_argument('--sample-size', type=int, default=100, help='언론사별 샘플링 기사 수')
+    parser.add_argument('--stratify', nargs='*', default=[], choices=STRATA, help='층화 샘플링 기준')
+    parser.add_argument('--length-buckets', type=int, default=4, help='length_bucket 층화 시 길이 구간 수')
 
     args = parser.parse_args()
 
@@ -120,8 +314,12 @@ if __name__ == '__main__':
 
     sampled_file = output_dir / 'filtered_news.csv'
 
-    filtered_df = preprocess_news(df, args.min_length, args.max_length)
-    sampled_df = randomize_and_sample_news(filtered_df, sample_size=100, seed=42)
+    if not args.no_dedup:
+        df = deduplicate_news(df, threshold=args.dedup_threshold)
+
+    filtered_df = preprocess_news(df, args.min_length, args.max_length, top_k=args.top_k)
+    sampled_df = randomize_and_sample_news(filtered_df, sample_size=args.sample_size, seed=42,
+                                           stratify=args.stratify, length_buckets=args.length_buckets)
 
     sampled_df.to_csv(sampled_file, encoding='utf-8-sig', index_label='id')
     print(f'필터링된 뉴스 기사가 {sampled_file}에 저장되었습니다.')
\ No newline at end of file
@@ -1,31 +1,38 @@
 import json
-from typing import Tuple, Dict, Any
+from typing import TYPE_CHECKING, Tuple, Dict, Any
 
-from huggingface_hub import hf_hub_download
-from llama_cpp import Llama
 import argparse
 import pathlib
 from rich.console import Console
 from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, TaskProgressColumn, TimeRemainingColumn
 from rich.panel import Panel
-from rich.syntax import Syntax
-from rich.text import Text
+
+from batch_index import load_index
+from metrics import MetricsSink, timed_chat_completion, format_summary
+from verdict import answer_label, parse_output
+
+# llama_cpp and huggingface_hub are imported in load_model so --help and helper imports stay fast
+if TYPE_CHECKING:
+    from llama_cpp import Llama
 
 console = Console()
 
 
-def load_model() -> Tuple[Llama, Dict[str, Any]]:
+def load_model(model_name: str = "unsloth/gemma-3-27b-it-GGUF", model_file: str = "gemma-3-27b-it-Q4_K_M.gguf",
+               n_threads: int = 32, n_gpu_layers: int = 999) -> Tuple["Llama", Dict[str, Any]]:
+    from huggingface_hub import hf_hub_download
+    from llama_cpp import Llama
+
     # Your existing model setup
-    model_name = "unsloth/gemma-3-27b-it-GGUF"
-    model_file = "gemma-3-27b-it-Q4_K_M.gguf"
     model_path = hf_hub_download(model_name, filename=model_file)
 
     llm = Llama(
         model_path=model_path,
         n_ctx=2048,
-        n_threads=32,
-        n_gpu_layers=999,
+        n_threads=n_threads,
+        n_gpu_layers=n_gpu_layers,
         seed=42,
+        use_mmap=True,
     )
 
     generation_kwargs = {
@@ -40,13 +47,8 @@ def load_model() -> Tuple[Llama, Dict[str, Any]]:
 
 
 def count_lines(file_path: pathlib.Path) -> int:
-    """Count non-empty lines in the JSONL file."""
-    count = 0
-    with open(file_path, 'r', encoding='utf-8') as f:
-        for line in f:
-            if line.strip():
-                count += 1
-    return count
+    """Count non-empty lines in the JSONL file using its offset index."""
+    return len(load_index(file_path))
 
 
 def display_input_output(custom_id: str, messages: list, generated_text: str, line_num: int, total_lines: int):
@@ -85,9 +87,64 @@ def display_input_output(custom_id: str, messages: list, generated_text: str, li
     ))
 
 
-def process_jsonl_file(file_path: pathlib.Path, intermediate_path: pathlib.Path, llm: Llama, generation_kwargs: Dict[str, Any]) -> list:
+def run_entry(llm: "Llama", entry: Dict[str, Any], line_num: int) -> Dict[str, Any]:
+    """Run one batch request entry through the model and build its result record."""
+    custom_id = entry.get("custom_id", f"line_{line_num}")
+
+    # Extract messages and parameters from the original format
+    messages = entry["body"]["messages"]
+    body = entry["body"]
+
+    # Extract parameters from the original request
+    temperature = body.get("temperature", 0.1)
+    max_tokens = body.get("max_tokens", 2000)
+    response_format = body.get("response_format")
+
+    # Prepare chat completion parameters
+    chat_params = {
+        "messages": messages,
+        "max_tokens": max_tokens,
+        "temperature": temperature,
+        "top_k": 1,
+        "stop": ["</s>"]
+    }
+
+    # Add response format if specified
+    if response_format and response_format.get("type") == "json_object":
+        chat_params["response_format"] = response_format
+
+    # Use chat completion directly with the messages (streamed for timing)
+    response, timing = timed_chat_completion(llm, chat_params)
+    timing["custom_id"] = custom_id
+    timing["prompt_chars"] = sum(len(msg.get("content", "")) for msg in messages)
+
+    generated_text = response["choices"][0]["message"]["content"].strip()
+
+    # Parse (or, for malformed output, scan) the model text once for both fields
+    answer, analysis = parse_output(generated_text)
+    if answer is None and not analysis:
+        parsed_response = {"raw_text": generated_text, "parse_error": True}
+    else:
+        parsed_response = {"분석": analysis, "답변": answer}
+
+    return {
+        "custom_id": custom_id,
+        "request": messages,
+        "response": parsed_response,
+        "raw_output": generated_text,
+        "verdict": answer_label(answer),
+        "finish_reason": response["choices"][0].get("finish_reason"),
+        "usage": response.get("usage", {}),
+        "timing": timing
+    }
+
+
+def process_jsonl_file(file_path: pathlib.Path, intermediate_path: pathlib.Path, llm: "Llama", generation_kwargs: Dict[str, Any],
+                       metrics_sink: MetricsSink = None) -> list:
     """Process a JSONL file with Korean news analysis tasks using chat completion."""
     results = []
+    if metrics_sink is None:
+        metrics_sink = MetricsSink(None)
 
     # Count total lines for progress bar
     total_lines = count_lines(file_path)
@@ -127,75 +184,26 @@ def process_jsonl_file(file_path: pathlib.Path, intermediate_path: pathlib.Path,
 
                 try:
                     entry = json.loads(line)
-                    custom_id = entry.get("custom_id", f"line_{line_num}")
-
-                    # Extract messages and parameters from the original format
-                    messages = entry["body"]["messages"]
-                    body = entry["body"]
-
-                    # Extract parameters from the original request
-                    temperature = body.get("temperature", 0.1)
-                    max_tokens = body.get("max_tokens", 2000)
-                    response_format = body.get("response_format")
-
-                    # Prepare chat completion parameters
-                    chat_params = {
-                        "messages": messages,
-                        "max_tokens": max_tokens,
-                        "temperature": temperature,
-                        "top_k": 1,
-                        "stop": ["</s>"]
-                    }
-
-                    # Add response format if specified
-                    if response_format and response_format.get("type") == "json_object":
-                        chat_params["response_format"] = response_format
-
-                    # Use chat completion directly with the messages
-                    response = llm.create_chat_completion(**chat_params)
-
-                    generated_text = response["choices"][0]["message"]["content"].strip()
+                    result = run_entry(llm, entry, line_num)
+                    custom_id = result["custom_id"]
+                    metrics_sink.write(result["timing"])
 
                     # Display input and output
-                    display_input_output(custom_id, messages, generated_text, line_num, total_lines)
-
-                    # Try to parse as JSON if response_format was json_object
-                    if response_format and response_format.get("type") == "json_object":
-                        try:
-                            parsed_response = json.loads(generated_text)
-                        except json.JSONDecodeError:
-                            # If not valid JSON, wrap in a structure
-                            parsed_response = {"raw_text": generated_text, "parse_error": True}
-                    else:
-                        # For non-JSON responses, just store the text
-                        parsed_response = {"content": generated_text}
-
-                    result = {
-                        "custom_id": custom_id,
-                        "request": messages,
-                        "response": parsed_response,
-                        "raw_output": generated_text,
-                        "finish_reason": response["choices"][0].get("finish_reason"),
-                        "usage": response.get("usage", {})
-                    }
+                    display_input_output(custom_id, result["request"], result["raw_output"], line_num, total_lines)
 
                     results.append(result)
 
                     count["total"] += 1
                     count["success"] += 1
+                    # "verdict" is parsed once from the raw output; '' means no usable answer
+                    verdict = result["verdict"]
                     if "same" in custom_id:
-                        if parsed_response and (
-                            type(parsed_response["답변"]) == str and parsed_response["답변"].strip().lower() == "true" or
-                            type(parsed_response["답변"]) == bool and parsed_response["답변"] is True
-                        ):
+                        if verdict == "same":
                             count["pred_same"]["true_same"] += 1
                         else:
                             count["pred_same"]["false_same"] += 1
                     elif "diff" in custom_id:
-                        if parsed_response and (
-                            type(parsed_response["답변"]) == str and parsed_response["답변"].strip().lower() == "false" or
-                            type(parsed_response["답변"]) == bool and parsed_response["답변"] is False
-                        ):
+                        if verdict == "diff":
                             count["pred_diff"]["true_diff"] += 1
                         else:
                             count["pred_diff"]["false_diff"] += 1
@@ -251,17 +259,20 @@ def save_results(results, output_file):
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Process a JSONL file with Korean news analysis tasks.")
     parser.add_argument("--input-file", type=str, help="Path to the input JSONL file",
-                        default="./dataset/batch/batch.jsonl")
+                        default="../dataset/batch/batch.jsonl")
     parser.add_argument("--intermediate-file", type=str, help="Path to save intermediate results",
-                        default="./dataset/batch/intermediate_results.jsonl")
+                        default="../dataset/batch/intermediate_results.jsonl")
     parser.add_argument("--output-file", type=str, help="Path to save the output JSONL file",
-                        default="./dataset/batch/output.jsonl")
+                        default="../dataset/batch/output.jsonl")
+    parser.add_argument("--metrics-file", type=str, help="Path to save per-request latency/token metrics (.jsonl or .prom)",
+                        default="../dataset/batch/metrics.jsonl")
 
     args = parser.parse_args()
 
     input_file = pathlib.Path(args.input_file).resolve()
     intermediate_file = pathlib.Path(args.intermediate_file).resolve()
     output_file = pathlib.Path(args.output_file).resolve()
+    metrics_file = pathlib.Path(args.metrics_file).resolve()
 
     # Ensure intermediate file is empty or does not exist
     if intermediate_file.exists():
@@ -271,7 +282,8 @@ if __name__ == "__main__":
     console.print(Panel(
         f"[bold blue]JSONL Processor Starting[/bold blue]\n"
         f"Input: {input_file}\n"
-        f"Output: {output_file}",
+        f"Output: {output_file}\n"
+        f"Metrics: {metrics_file}",
         title="Configuration",
         border_style="green"
     ))
@@ -281,7 +293,9 @@ if __name__ == "__main__":
     console.print("[green]✅ Model loaded successfully![/green]")
 
     console.print("\n[bold yellow]Starting JSONL processing...[/bold yellow]")
-    results = process_jsonl_file(input_file, intermediate_file, model, res_generation_kwargs)
+    metrics_sink = MetricsSink(metrics_file)
+    results = process_jsonl_file(input_file, intermediate_file, model, res_generation_kwargs, metrics_sink)
+    metrics_summary = metrics_sink.close()
 
     # Final summary
     successful = sum(1 for r in results if "error" not in r)
@@ -297,5 +311,11 @@ if __name__ == "__main__":
         border_style="green"
     ))
 
+    console.print(Panel(
+        format_summary(metrics_summary),
+        title="Latency / Tokens",
+        border_style="cyan"
+    ))
+
     save_results(results, output_file)
     console.print(f"[bold green]🎉 All done! Results saved to {output_file}[/bold green]")
\ No newline at end of file
@@ -0,0 +1,271 @@
+from typing import TYPE_CHECKING, Tuple
+
+import numpy as np
+import pandas as pd
+from pathlib import Path
+import argparse
+import time
+
+from batch_index import load_index
+from make_jsonl_for_batch import create_pairs
+
+# sklearn/scipy는 import에만 1초 이상 걸리므로 사용하는 함수 안에서 import
+if TYPE_CHECKING:
+    from scipy import sparse
+
+# 상수 지정
+
+# 제목에서 찾는 형식적 특징 (TEST_PROMPT_V2의 '형식적 특징' 항목)
+TITLE_PATTERNS = {
+    'title_head_bracket': r'^\s*\[[^\]]+\]',  # [포토], [단독] 등 말머리
+    'title_bracket': r'\[[^\]]+\]',
+    'title_angle_bracket': r'<[^>]+>|〈[^〉]+〉',
+    'title_quote': r'["“”\'‘’]',
+    'title_ellipsis': r'…|\.\.\.',
+}
+
+# 본문에서 찾는 형식적·문체적 특징
+TEXT_PATTERNS = {
+    # 기자명·이메일·출처 표기
+    'email': r'[\w.+-]+@[\w-]+(?:\.[\w-]+)+',
+    'reporter': r'[가-힣]{2,4}\s?기자',
+    'reporter_head': r'^\s*[\(\[]?[가-힣]{2,4}\s?기자\s?[=\]\)]',
+    'dateline': r'^\s*\([^)]{1,15}=[^)]{1,15}\)',  # (서울=연합뉴스)
+    'copyright': r'ⓒ|©|무단\s?전재|재배포\s?금지',
+    'photo_caption': r'사진\s?=|\[사진\]|<사진>|\(사진\)|제공\s?=',
+    # 숫자·날짜 표기
+    'num_korean_unit': r'\d+\s?[천만억조]\s?[명원개건곳채톤]',
+    'num_plain_unit': r'\d{4,}\s?[명원개건곳채톤]',
+    'num_comma': r'\d{1,3}(?:,\d{3})+',
+    'date_hanja': r'\d+日',
+    'date_il': r'\d+일',
+    'percent_sign': r'\d\s?%',
+    'percent_word': r'\d\s?퍼센트|\d\s?프로',
+    # 인용 동사
+    'quote_said': r'말했다',
+    'quote_revealed': r'밝혔다',
+    'quote_conveyed': r'전했다',
+    'quote_emphasized': r'강조했다',
+    'quote_explained': r'설명했다',
+    # 부사·접속사
+    'adv_teukhi': r'특히',
+    'adv_ttohan': r'또한',
+    'adv_hanpyeon': r'한편',
+    'adv_ileul': r'이에\s?따라|이와\s?관련',
+    # 문장부호
+    'curly_double_quote': r'[“”]',
+    'straight_double_quote': r'"',
+    'curly_single_quote': r'[‘’]',
+    'middle_dot': r'·',
+    'ellipsis': r'…',
+    'hanja': r'[一-鿿]',
+    'latin_word': r'[A-Za-z]{2,}',
+}
+
+STYLE_FEATURE_NAMES = (
+    list(TITLE_PATTERNS)
+    + [f'{name}_count' for name in TEXT_PATTERNS]
+    + [f'{name}_rate' for name in TEXT_PATTERNS]
+    + ['text_length', 'sentence_count', 'mean_sentence_length', 'paragraph_count']
+)
+
+SENTENCE_END_PATTERN = r'[.!?](?:\s|$)|다\.'
+
+
+def extract_style_features(df: pd.DataFrame) -> np.ndarray:
+    """
+    기사별 편집 스타일 특징을 정규식으로 추출합니다. 모든 패턴이 pandas 문자열 연산으로 한 번에 계산됩니다.
+    :param df: DataFrame, 'title', 'text' 컬럼을 포함해야 합니다.
+    :return: (기사 수, len(STYLE_FEATURE_NAMES)) 크기의 float32 특징 행렬
+    """
+    titles = df['title'].fillna('').astype(str)
+    texts = df['text'].fillna('').astype(str)
+    lengths = texts.str.len().clip(lower=1).to_numpy(dtype=np.float32)
+
+    columns = []
+    for pattern in TITLE_PATTERNS.values():
+        columns.append(titles.str.count(pattern).to_numpy(dtype=np.float32))
+
+    counts = [texts.str.count(pattern).to_numpy(dtype=np.float32) for pattern in TEXT_PATTERNS.values()]
+    columns.extend(np.log1p(count) for count in counts)
+    columns.extend(count / lengths * 1000 for count in counts)  # 1000자당 빈도
+
+    sentence_count = texts.str.count(SENTENCE_END_PATTERN).to_numpy(dtype=np.float32).clip(min=1)
+    columns.append(np.log1p(lengths))
+    columns.append(np.log1p(sentence_count))
+    columns.append(lengths / sentence_count)
+    columns.append(texts.str.count(r'\n+').to_numpy(dtype=np.float32))
+
+    return np.column_stack(columns).astype(np.float32)
+
+
+def fit_char_tfidf(df: pd.DataFrame, max_features: int = 200_000) -> 'sparse.csr_matrix':
+    """
+    제목과 본문의 문자 n-gram TF-IDF 행렬을 계산합니다. (행마다 L2 정규화)
+    :param df: DataFrame, 'title', 'text' 컬럼을 포함해야 합니다.
+    :param max_features: 최대 n-gram 개수 (기본값: 200,000)
+    :return: (기사 수, n-gram 수) 크기의 희소 행렬
+    """
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    documents = '[' + df['title'].fillna('').astype(str) + '] ' + df['text'].fillna('').astype(str)
+    vectorizer = TfidfVectorizer(
+        analyzer='char_wb',
+        ngram_range=(2, 4),
+        min_df=2,
+        sublinear_tf=True,
+        max_features=max_features,
+        dtype=np.float32,
+    )
+    return vectorizer.fit_transform(documents).tocsr()
+
+
+def pair_indices(same_pairs: list, diff_pairs: list) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    페어 리스트를 기사 행 번호 배열과 정답 배열로 변환합니다.
+    :param same_pairs: 같은 언론사끼리의 페어 리스트
+    :param diff_pairs: 다른 언론사끼리의 페어 리스트
+    :return: (왼쪽 기사 행 번호, 오른쪽 기사 행 번호, 정답(same=1, diff=0)) - create_jsonl의 요청 순서와 동일
+    """
+    pairs = same_pairs + diff_pairs
+    idx1 = np.fromiter((pair.left.id for pair in pairs), dtype=np.int64, count=len(pairs))
+    idx2 = np.fromiter((pair.right.id for pair in pairs), dtype=np.int64, count=len(pairs))
+    labels = np.concatenate([np.ones(len(same_pairs), dtype=np.int8), np.zeros(len(diff_pairs), dtype=np.int8)])
+    return idx1, idx2, labels
+
+
+def pair_features(style: np.ndarray, embedding, idx1: np.ndarray, idx2: np.ndarray) -> np.ndarray:
+    """
+    기사별 특징을 페어 특징으로 변환합니다. 순서에 무관하도록 차이의 절댓값과 곱을 사용합니다.
+    :param style: extract_style_features의 결과
+    :param embedding: L2 정규화된 기사 벡터 (fit_char_tfidf의 희소 행렬 또는 ArticleCache의 밀집 임베딩)
+    :param idx1: 왼쪽 기사 행 번호
+    :param idx2: 오른쪽 기사 행 번호
+    :return: (페어 수, 특징 수) 크기의 특징 행렬
+    """
+    left, right = style[idx1], style[idx2]
+    if isinstance(embedding, np.ndarray):  # 메모리 맵 포함
+        cosine = np.einsum('ij,ij->i', embedding[idx1], embedding[idx2]).astype(np.float32)[:, None]
+    else:
+        cosine = np.asarray(embedding[idx1].multiply(embedding[idx2]).sum(axis=1), dtype=np.float32)
+    return np.hstack([np.abs(left - right), left * right, cosine])
+
+
+def score_pairs(df: pd.DataFrame, same_pairs: list, diff_pairs: list, cache=None, folds: int = 5, seed: int = 42) -> pd.DataFrame:
+    """
+    스타일 특징 기반 분류기로 모든 페어의 '같은 언론사' 확률을 교차 검증 방식으로 계산합니다.
+    :param df: 페어를 만든 DataFrame
+    :param same_pairs: 같은 언론사끼리의 페어 리스트
+    :param diff_pairs: 다른 언론사끼리의 페어 리스트
+    :param cache: 기사별 특징·임베딩 캐시 (article_cache.ArticleCache), 없으면 매번 계산
+    :param folds: 교차 검증 fold 수 (기본값: 5)
+    :param seed: 무작위 시드 값 (기본값: 42)
+    :return: 페어별 점수 DataFrame (create_jsonl의 요청 순서와 동일)
+    """
+    from sklearn.ensemble import HistGradientBoostingClassifier
+    from sklearn.model_selection import StratifiedKFold, cross_val_predict
+
+    idx1, idx2, labels = pair_indices(same_pairs, diff_pairs)
+    if cache is None:
+        features = pair_features(extract_style_features(df), fit_char_tfidf(df), idx1, idx2)
+    else:
+        ids = np.asarray(df['id'] if 'id' in df.columns else df.index, dtype=np.int64)
+        rows1 = cache.rows(ids[df.index.get_indexer(idx1)])
+        rows2 = cache.rows(ids[df.index.get_indexer(idx2)])
+        features = pair_features(cache.style, cache.embedding, rows1, rows2)
+
+    classifier = HistGradientBoostingClassifier(max_iter=200, learning_rate=0.1, random_state=seed)
+    cv = StratifiedKFold(n_splits=folds, shuffle=True, random_state=seed)
+    prob_same = cross_val_predict(classifier, features, labels, cv=cv, method='predict_proba')[:, 1]
+
+    sources = df['source'].to_numpy()
+    return pd.DataFrame({
+        'id1': idx1,
+        'id2': idx2,
+        'source1': sources[idx1],
+        'source2': sources[idx2],
+        'gold_label': np.where(labels == 1, 'same', 'diff'),
+        'prob_same': prob_same,
+        'pred_label': np.where(prob_same >= 0.5, 'same', 'diff'),
+        'confidence': np.maximum(prob_same, 1 - prob_same),
+    })
+
+
+def show_statistics(scores: pd.DataFrame, labels=['same', 'diff']):
+    """
+    점수 DataFrame의 정확도, MCC, 혼동 행렬을 출력합니다.
+    :param scores: score_pairs의 결과
+    :param labels: 라벨 순서
+    """
+    from sklearn.metrics import accuracy_score, confusion_matrix, matthews_corrcoef
+
+    print('[Confusion Matrix]')
+    cm = pd.DataFrame(
+        confusion_matrix(scores['gold_label'], scores['pred_label'], labels=labels),
+        index=['true_' + label for label in labels],
+        columns=['pred_' + label for label in labels],
+    )
+    print(cm)
+    print('-'*50)
+    print(f"Accuracy: {accuracy_score(scores['gold_label'], scores['pred_label']):.4f}")
+    print(f"MCC:      {matthews_corrcoef(scores['gold_label'], scores['pred_label']):.4f}")
+
+
+def route_low_confidence(scores: pd.DataFrame, jsonl_path: Path, save_path: Path, threshold: float = 0.8) -> int:
+    """
+    분류기 신뢰도가 낮은 페어의 요청만 batch.jsonl에서 골라 새 파일로 저장합니다. (LLM 호출 대상)
+    :param scores: score_pairs의 결과 (batch.jsonl과 같은 페어 순서)
+    :param jsonl_path: create_jsonl로 만든 batch.jsonl 경로
+    :param save_path: 저장할 jsonl 파일 경로
+    :param threshold: 이 값 미만의 신뢰도를 가진 페어를 LLM으로 보냄 (기본값: 0.8)
+    :return: 저장된 요청 수
+    """
+    index = load_index(jsonl_path)
+    if len(index) != len(scores) or list(index.gold_labels) != scores['gold_label'].tolist():
+        raise ValueError(f'{jsonl_path}의 요청 순서가 페어 순서와 일치하지 않습니다. 같은 CSV로 다시 생성해주세요.')
+
+    routed = np.flatnonzero(scores['confidence'].to_numpy() < threshold)
+    index.write_subset(routed, save_path)
+    return len(routed)
+
+
+if __name__ == '__main__':
+    # 인자 파싱
+    parser = argparse.ArgumentParser(description='Score news pairs with a stylometric baseline classifier.')
+    parser.add_argument('--csv-path', type=str, default="../dataset/preprocessed/filtered_news.csv", help='Path to the CSV file containing news data.')
+    parser.add_argument('--save-path', type=str, default="../dataset/stylometry", help='Path to save the pair scores.')
+    parser.add_argument('--folds', type=int, default=5, help='교차 검증 fold 수')
+    parser.add_argument('--cache-dir', type=str, default=None, help='지정하면 기사별 특징·임베딩 캐시를 사용 (article_cache.py)')
+    parser.add_argument('--batch-jsonl', type=str, default=None, help='지정하면 신뢰도가 낮은 페어의 요청만 골라 LLM용 jsonl로 저장')
+    parser.add_argument('--route-threshold', type=float, default=0.8, help='이 값 미만의 신뢰도를 가진 페어를 LLM으로 보냄')
+    args = parser.parse_args()
+
+    csv_path = Path(args.csv_path)
+    save_path = Path(args.save_path)
+    save_path.mkdir(parents=True, exist_ok=True)
+
+    df = pd.read_csv(csv_path, encoding='utf-8')
+
+    # 페어 생성
+    same_pairs, diff_pairs = create_pairs(df)
+
+    # 점수 계산
+    start = time.perf_counter()
+    cache = None
+    if args.cache_dir:
+        from article_cache import build_article_cache  # article_cache가 이 모듈을 import하므로 지연 import
+        cache = build_article_cache(df, Path(args.cache_dir))
+    scores = score_pairs(df, same_pairs, diff_pairs, cache=cache, folds=args.folds)
+    print(f'\n{len(scores)}개 페어 점수 계산 완료 ({time.perf_counter() - start:.2f}초)\n')
+    show_statistics(scores)
+
+    scores_file = save_path / 'pair_scores.csv'
+    scores.to_csv(scores_file, encoding='utf-8-sig', index_label='pair_idx')
+    print(f'페어 점수가 {scores_file}에 저장되었습니다.')
+
+    # 신뢰도가 낮은 페어만 LLM으로
+    if args.batch_jsonl:
+        jsonl_path = Path(args.batch_jsonl)
+        routed_file = jsonl_path.parent / 'routed_batch.jsonl'
+        routed_num = route_low_confidence(scores, jsonl_path, routed_file, threshold=args.route_threshold)
+        print(f'신뢰도 {args.route_threshold} 미만 페어 {routed_num}/{len(scores)}개 ({routed_num / len(scores):.1%})를 {routed_file}에 저장했습니다.')
@@ -0,0 +1,313 @@
+import json
+import re
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+import argparse
+
+# 상수 지정
+
+VERDICT_KEY = '답변'
+ANALYSIS_KEY = '분석'
+
+# 답변 값으로 나오는 단어 -> 같은 언론사 여부 (소문자로 비교)
+# 'y', 'n', '0', '1'처럼 잘린 값(예: null -> n)과 구분되지 않는 한 글자 값은 넣지 않음
+VERDICT_WORDS = {
+    'true': True, 'yes': True, 'same': True,
+    '예': True, '네': True, '참': True, '맞음': True, '맞다': True, '동일': True, '동일함': True, '같음': True, '같다': True,
+    'false': False, 'no': False, 'diff': False, 'different': False,
+    '아니오': False, '아니요': False, '아니': False, '아님': False, '거짓': False, '다름': False, '다르다': False,
+}
+# max_tokens에서 잘린 값 (예: '"답변": fal')은 출력 끝에 있을 때만 접두사로 판단
+TRUNCATED_WORDS = {
+    word[:i]: value
+    for word, value in [('true', True), ('false', False)]
+    for i in range(2, len(word))
+}
+
+# key 바로 뒤: 콜론, 여는 따옴표/공백 다음의 첫 단어
+_VALUE_PATTERN = re.compile(r'\s*[:：=]\s*["\']?\s*([A-Za-z가-힣]+)')
+_STRING_PATTERN = re.compile(r'\s*[:：=]\s*"((?:[^"\\]|\\.)*)("?)', re.S)
+_BARE_STRIP = '`"\'.!。 \t\r\n'
+# 이 문자 뒤(또는 텍스트 맨 앞)에 오는 따옴표만 문자열의 시작으로 봄 (문자열 안의 따옴표 오인 방지)
+_TOKEN_BEFORE = '{[,:'
+
+
+def _strip_fence(text: str) -> str:
+    # ```json ... ``` 코드 블록이면 안쪽만 남김
+    text = text.strip()
+    if text.startswith('```'):
+        text = text[text.find('\n') + 1:] if '\n' in text else text[3:]
+        if text.rstrip().endswith('```'):
+            text = text.rstrip()[:-3]
+    return text
+
+
+def _load_object(text: str) -> Optional[dict]:
+    # 정상 JSON이면 dict, 아니면 None
+    try:
+        obj = json.loads(_strip_fence(text))
+    except json.JSONDecodeError:
+        return None
+    return obj if isinstance(obj, dict) else None
+
+
+def _answer_value(value) -> Optional[bool]:
+    # JSON으로 파싱된 '답변' 값 -> 같은 언론사 여부
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        return VERDICT_WORDS.get(value.strip().strip('"\'').lower())
+    return None
+
+
+def _string_end(text: str, start: int, quote: str) -> int:
+    # start부터 이스케이프되지 않은 닫는 따옴표의 위치, 없으면(잘린 출력) len(text)
+    i = start
+    while True:
+        i = text.find(quote, i)
+        if i == -1:
+            return len(text)
+        backslashes = 0
+        while i - 1 - backslashes >= start and text[i - 1 - backslashes] == '\\':
+            backslashes += 1
+        if backslashes % 2 == 0:
+            return i
+        i += 1
+
+
+def _find_keys(text: str, keys: Tuple[str, ...]) -> Dict[str, int]:
+    """
+    한 번의 스캔으로 문자열 값 바깥에서 key 자리에 있는 각 key의 첫 위치(key 끝)를 찾습니다. (찾지 못한 key는 제외)
+    '"답변"' / "'답변'" 처럼 key 전체가 따옴표로 감싸진 경우와, 줄 맨 앞·'{'·',' 뒤의 따옴표 없는 key를 인정합니다.
+    '"분석": "결론 답변: 예"'처럼 문자열 값 안의 key 모양 문구는 건너뜁니다.
+    """
+    found = {}
+    n = len(text)
+    i = 0
+    prev = ''  # 문자열 바깥의 마지막 공백 아닌 문자
+    while i < n and len(found) < len(keys):
+        c = text[i]
+        if c in '"\'' and (not prev or prev in _TOKEN_BEFORE):
+            end = _string_end(text, i + 1, c)
+            for key in keys:
+                if key not in found and end - i - 1 == len(key) and text.startswith(key, i + 1):
+                    found[key] = end + 1
+            i = end + 1
+            prev = c
+            continue
+        for key in keys:
+            if key not in found and c == key[0] and text.startswith(key, i):
+                line_start = text.rfind('\n', 0, i) + 1
+                if not prev or prev in '{,' or not text[line_start:i].strip():
+                    found[key] = i + len(key)
+        if not c.isspace():
+            prev = c
+        i += 1
+    return found
+
+
+def _scan_verdict(text: str, pos: Optional[int]) -> Optional[bool]:
+    # 스캔으로 찾은 '답변' key 위치에서 값을 읽음, key가 없으면 답만 있는 출력인지 확인
+    if pos is not None:
+        match = _VALUE_PATTERN.match(text, pos)
+        if not match:
+            return None
+        word = match.group(1).lower()
+        if word in VERDICT_WORDS:
+            return VERDICT_WORDS[word]
+        # 값이 출력 끝에서 잘린 경우만 접두사로 판단 (예: 'fal' -> false)
+        if match.end() >= len(text.rstrip(_BARE_STRIP + '}')):
+            return TRUNCATED_WORDS.get(word)
+        return None
+
+    # key 없이 답만 있는 출력 (예: "True", "```\n예\n```")
+    word = _strip_fence(text).strip(_BARE_STRIP)
+    return VERDICT_WORDS.get(word.lower()) if len(word) <= 10 else None
+
+
+def _scan_analysis(text: str, pos: Optional[int]) -> str:
+    # 스캔으로 찾은 '분석' key 위치에서 문자열 값을 읽음, 닫는 따옴표가 없으면(잘린 출력) 끝까지 사용
+    match = _STRING_PATTERN.match(text, pos) if pos is not None else None
+    if not match:
+        return ''
+    value = match.group(1)
+    try:
+        return json.loads(f'"{value}"')
+    except json.JSONDecodeError:
+        return value
+
+
+def parse_output(text: Optional[str]) -> Tuple[Optional[bool], str]:
+    """
+    모델 출력을 한 번만 파싱(또는 스캔)하여 '답변'과 '분석'을 함께 꺼냅니다.
+    먼저 JSON으로 파싱(코드 블록 허용)하여 구조상의 key를 사용하고, 파싱에 실패한 출력(닫는 괄호 없음, 잘림, 평문)만
+    한 번의 스캔으로 문자열 값 바깥의 첫 key들을 찾아 값을 읽습니다. 따옴표로 감싼 불리언("True"), 한국어 답(예/아니오)을 처리하며,
+    값이 null이거나 알 수 없는 단어이면 추측하지 않고 None을 반환합니다.
+    :param text: 모델 출력 문자열
+    :return: (답변: True(same), False(diff), 판단 불가 시 None, 분석 문자열 (없으면 ''))
+    """
+    if not text:
+        return None, ''
+
+    obj = _load_object(text)
+    if obj is not None:
+        analysis = obj.get(ANALYSIS_KEY, '')
+        return _answer_value(obj.get(VERDICT_KEY)), analysis if isinstance(analysis, str) else ''
+
+    found = _find_keys(text, (VERDICT_KEY, ANALYSIS_KEY))
+    return _scan_verdict(text, found.get(VERDICT_KEY)), _scan_analysis(text, found.get(ANALYSIS_KEY))
+
+
+def parse_verdict(text: Optional[str]) -> Optional[bool]:
+    """
+    모델 출력에서 '답변' 값만 찾아 같은 언론사 여부로 변환합니다. (parse_output과 같은 규칙)
+    :param text: 모델 출력 문자열
+    :return: True(same), False(diff), 판단 불가 시 None
+    """
+    if not text:
+        return None
+    obj = _load_object(text)
+    if obj is not None:
+        return _answer_value(obj.get(VERDICT_KEY))
+    return _scan_verdict(text, _find_keys(text, (VERDICT_KEY,)).get(VERDICT_KEY))
+
+
+def verdict_label(text: Optional[str]) -> str:
+    """
+    모델 출력을 예측 라벨로 변환합니다.
+    :param text: 모델 출력 문자열
+    :return: 'same', 'diff' 또는 판단 불가 시 ''
+    """
+    return answer_label(parse_verdict(text))
+
+
+def answer_label(answer: Optional[bool]) -> str:
+    """
+    parse_output/parse_verdict의 답변을 예측 라벨로 변환합니다.
+    :param answer: True, False 또는 None
+    :return: 'same', 'diff' 또는 판단 불가 시 ''
+    """
+    if answer is None:
+        return ''
+    return 'same' if answer else 'diff'
+
+
+def extract_analysis(text: Optional[str]) -> str:
+    """
+    모델 출력에서 '분석' 문자열 값만 꺼냅니다. (parse_output과 같은 규칙)
+    :param text: 모델 출력 문자열
+    :return: 분석 문자열, 없으면 ''
+    """
+    return parse_output(text)[1]
+
+
+# 벤치마크용 대표 비정상 출력 (코퍼스 파일이 없을 때 사용), (출력, 기대 라벨)
+MALFORMED_SAMPLES = [
+    ('{"분석": "두 기사 모두 기자 이메일이 끝에 있습니다.", "답변": true}', 'same'),
+    ('{"분석": "형식이 다릅니다.", "답변": false}', 'diff'),
+    ('```json\n{\n  "분석": "제목 말머리 형식이 같습니다.",\n  "답변": true\n}\n```', 'same'),
+    ('{"분석": "인용 동사가 다릅니다.", "답변": "False"}', 'diff'),
+    ('{"분석": "숫자 표기가 같습니다.", "답변": "True"}', 'same'),
+    ('{"분석": "같은 편집 스타일입니다.", "답변": True}', 'same'),
+    ('{"분석": "날짜 표기 방식이 다릅니다.", "답변": "아니오"}', 'diff'),
+    ('{"분석": "문장 리듬이 유사합니다.", "답변": "예"}', 'same'),
+    ('{"분석": "바이라인 위치가 같습니다.", "답변": true', 'same'),
+    ('{"분석": "캡션 형식이 다릅니다.", "답변": fal', 'diff'),
+    ("{'분석': '두 기사의 형식이 같습니다.', '답변': True}", 'same'),
+    ('분석: 기자 표기가 다릅니다.\n답변: False', 'diff'),
+    ('{"분석": "말머리 사용이 다르고 "특히" 부사 빈도도 다릅니다.", "답변": false}', 'diff'),
+    ('{"분석": "판단하기 어렵습니다.", "답변": null}', ''),
+    ('{"분석": "기사 1은 [단독] 말머리를 쓰고, 기사 2는', ''),
+    ('{"답변": false, "분석": "결론 답변: 예"}', 'diff'),
+    ('{"분석": "결론 답변: 예", "답변": false', 'diff'),
+    ('{"분석": "형식이 같습니다.", "답변": n', ''),
+    ('{"분석": "형식이 같습니다.", "답변": 1}', ''),
+    ('True', 'same'),
+    ('', ''),
+]
+
+
+def _legacy_label(text: str) -> str:
+    # 기존 call_batch_api 방식: json.loads 후 answer == True / False
+    try:
+        answer = json.loads(text).get(VERDICT_KEY, '')
+    except (json.JSONDecodeError, AttributeError):
+        return ''
+    if answer == True:
+        return 'same'
+    if answer == False:
+        return 'diff'
+    return ''
+
+
+def iter_corpus_outputs(path: Path) -> Iterator[str]:
+    """
+    결과 파일에서 모델 출력 문자열을 읽습니다.
+    run_local 결과(raw_output), Batch API 결과(response.body.choices[0].message.content)를 지원합니다.
+    :param path: jsonl 파일 경로
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if 'raw_output' in entry:
+                yield entry['raw_output']
+                continue
+            body = (entry.get('response') or {}).get('body') or {}
+            choices = body.get('choices') or []
+            if choices:
+                yield choices[0].get('message', {}).get('content', '') or ''
+
+
+def benchmark(outputs: List[str], expected: List[str] = None, repeat: int = 5) -> dict:
+    """
+    기존 방식(json.loads + answer == True)과 parse_verdict의 파싱 성공률과 속도를 비교합니다.
+    :param outputs: 모델 출력 문자열 리스트
+    :param expected: 기대 라벨 리스트 (있으면 정확도 계산)
+    :param repeat: 시간 측정 반복 수
+    :return: 비교 결과
+    """
+    result = {'outputs': len(outputs)}
+    labels = {}
+    for name, func in [('legacy', _legacy_label), ('verdict', verdict_label)]:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            labels[name] = [func(text) for text in outputs]
+        elapsed = (time.perf_counter() - start) / repeat
+        result[name] = {
+            'parsed': sum(1 for label in labels[name] if label),
+            'us_per_output': elapsed / max(len(outputs), 1) * 1e6,
+        }
+        if expected is not None:
+            result[name]['correct'] = sum(1 for label, gold in zip(labels[name], expected) if label == gold)
+    result['recovered'] = sum(1 for old, new in zip(labels['legacy'], labels['verdict']) if not old and new)
+    result['changed'] = sum(1 for old, new in zip(labels['legacy'], labels['verdict']) if old and new and old != new)
+    return result
+
+
+if __name__ == '__main__':
+    # 인자 파싱
+    parser = argparse.ArgumentParser(description='Benchmark verdict parsing against the legacy json.loads approach.')
+    parser.add_argument('--corpus', type=str, nargs='*', default=[], help='모델 출력이 담긴 결과 jsonl 파일들 (output.jsonl, batch_output.jsonl)')
+    parser.add_argument('--repeat', type=int, default=5, help='시간 측정 반복 수')
+    args = parser.parse_args()
+
+    if args.corpus:
+        outputs = [text for path in args.corpus for text in iter_corpus_outputs(Path(path))]
+        expected = None
+    else:
+        print('코퍼스를 지정하지 않아 내장 비정상 출력 예시로 측정합니다.')
+        outputs = [text for text, _ in MALFORMED_SAMPLES]
+        expected = [label for _, label in MALFORMED_SAMPLES]
+
+    result = benchmark(outputs, expected, repeat=args.repeat)
+    print(f"출력 {result['outputs']}개")
+    for name in ('legacy', 'verdict'):
+        stats = result[name]
+        line = f"{name:<8} 파싱 {stats['parsed']:>6}개 | {stats['us_per_output']:.2f} us/출력"
+        if 'correct' in stats:
+            line += f" | 정답 {stats['correct']}/{result['outputs']}"
+        print(line)
+    print(f"기존 방식 실패 -> 복구: {result['recovered']}개, 라벨이 바뀐 출력: {result['changed']}개")
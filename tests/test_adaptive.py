@@ -0,0 +1,64 @@
+import json
+import random
+
+from adaptive import AdaptiveEvaluator, run_adaptive, summarize
+
+
+def write_batch(path, n):
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(n):
+            label = "same" if i % 2 == 0 else "diff"
+            f.write(json.dumps({"custom_id": f"{label}_source_pair_{i:04d}", "body": {}}) + "\n")
+
+
+def noisy_predictor(accuracy, seed):
+    rng = random.Random(seed)
+
+    def predict(entry):
+        gold = entry["custom_id"].split("_")[0]
+        if rng.random() < accuracy:
+            return gold
+        return "diff" if gold == "same" else "same"
+
+    return predict
+
+
+def test_bootstrap_interval_is_deterministic():
+    evaluator = AdaptiveEvaluator(min_samples=1)
+    for gold, pred in [("same", "same"), ("diff", "diff"), ("same", "diff"), ("diff", "diff")] * 20:
+        evaluator.add(gold, pred)
+    first = evaluator.history[-1]
+    # An error adds no counts, so the interval must not be redrawn
+    again = evaluator.add("same", "", is_error=True)
+    assert (again["mcc_low"], again["mcc_high"]) == (first["mcc_low"], first["mcc_high"])
+
+    other = AdaptiveEvaluator(min_samples=1)
+    for gold, pred in [("same", "same"), ("diff", "diff"), ("same", "diff"), ("diff", "diff")] * 20:
+        other.add(gold, pred)
+    assert other.history[-1]["mcc_low"] == first["mcc_low"]
+
+
+def test_summary_reports_stop_decision(tmp_path):
+    jsonl_path = tmp_path / "batch.jsonl"
+    write_batch(jsonl_path, 2000)
+    evaluator = AdaptiveEvaluator(target_width=0.15, min_samples=50)
+    run_adaptive(jsonl_path, noisy_predictor(0.8, seed=0), evaluator, concurrency=8, report_every=10_000)
+
+    summary = summarize(evaluator, 2000)
+    stop = summary["stop"]
+    assert summary["converged"] and stop["reason"] == "converged"
+    # In-flight results finish after the stop, but the stop record keeps the decision-time state
+    assert stop["executed"] <= summary["executed"] < 2000
+    assert stop["accuracy_high"] - stop["accuracy_low"] <= 0.15
+    assert stop["mcc_high"] - stop["mcc_low"] <= 0.15
+
+
+def test_summary_when_every_request_runs(tmp_path):
+    jsonl_path = tmp_path / "batch.jsonl"
+    write_batch(jsonl_path, 40)
+    evaluator = AdaptiveEvaluator(target_width=0.01, min_samples=10)
+    run_adaptive(jsonl_path, noisy_predictor(0.8, seed=0), evaluator, report_every=10_000)
+
+    summary = summarize(evaluator, 40)
+    assert not summary["converged"] and summary["stop"]["reason"] == "exhausted"
+    assert summary["stop"]["executed"] == summary["executed"] == 40
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+
+import article_cache
+from article_cache import RowStore, article_ids, content_hashes
+
+
+def make_df(n):
+    return pd.DataFrame({
+        "id": range(n),
+        "title": [f"제목 {i}" for i in range(n)],
+        "text": [f"본문 {i}. " * (i + 1) for i in range(n)],
+    })
+
+
+def counting(calls):
+    def compute(part):
+        calls.append(len(part))
+        return np.stack([part["id"].to_numpy(dtype=np.float32), part["text"].str.len().to_numpy(dtype=np.float32)], axis=1)
+
+    return compute
+
+
+def fetch(store, df, calls):
+    return store.fetch(df, article_ids(df), content_hashes(df), "style", counting(calls))
+
+
+def test_edit_recomputes_only_changed_rows(tmp_path):
+    store = RowStore(tmp_path / "rows")
+    calls = []
+    df = make_df(6)
+    first = fetch(store, df, calls)
+    assert calls == [6]
+
+    assert np.array_equal(fetch(store, df, calls), first)
+    assert calls == [6]
+
+    edited = df.copy()
+    edited.loc[2, "text"] = "고친 본문"
+    result = fetch(store, edited, calls)
+    assert calls == [6, 1]
+    assert result[2, 1] == len("고친 본문")
+    assert np.array_equal(np.delete(result, 2, axis=0), np.delete(first, 2, axis=0))
+
+
+def test_rows_follow_dataframe_order_and_subsets(tmp_path):
+    store = RowStore(tmp_path / "rows")
+    calls = []
+    df = make_df(5)
+    fetch(store, df, calls)
+
+    shuffled = df.iloc[[4, 0, 3]].reset_index(drop=True)
+    result = fetch(store, shuffled, calls)
+    assert calls == [5]
+    assert result[:, 0].tolist() == [4, 0, 3]
+
+    grown = pd.concat([df, make_df(7).iloc[5:]], ignore_index=True)
+    fetch(store, grown, calls)
+    assert calls == [5, 2]
+
+
+def test_build_article_cache_reuses_style_rows(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(article_cache, "extract_style_features", counting(calls))
+    monkeypatch.setattr(article_cache, "compute_embeddings", lambda part, embedding, dim: np.ones((len(part), 3), dtype=np.float32))
+
+    df = make_df(4)
+    article_cache.build_article_cache(df, tmp_path, embedding="sentence:fake")
+    edited = df.copy()
+    edited.loc[0, "title"] = "새 제목"
+    cache = article_cache.build_article_cache(edited, tmp_path, embedding="sentence:fake")
+
+    assert calls == [4, 1]
+    assert cache.style.shape == (4, 2)
+    assert cache.embedding.shape == (4, 3)
+    assert cache.rows([3, 0]).tolist() == [3, 0]
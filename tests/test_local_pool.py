@@ -0,0 +1,75 @@
+import json
+import textwrap
+
+from local_pool import run_pool
+
+# Stand-ins for llama_cpp / huggingface_hub. Spawned workers inherit sys.path, so they import these.
+FAKE_LLAMA = textwrap.dedent('''
+    import json
+    import os
+    import signal
+
+
+    class Llama:
+        def __init__(self, model_path, **kwargs):
+            self.n_tokens = 0
+
+        def tokenize(self, b, add_bos=False, special=True):
+            return list(range(max(1, len(b) // 4)))
+
+        def create_chat_completion(self, messages, stream=False, **kwargs):
+            # The first worker to see the crash marker deletes it and is SIGKILLed mid-chunk
+            crash_file = os.environ.get("FAKE_LLAMA_CRASH_FILE")
+            if crash_file and "crash" in messages[-1]["content"]:
+                try:
+                    os.remove(crash_file)
+                except FileNotFoundError:
+                    pass
+                else:
+                    os.kill(os.getpid(), signal.SIGKILL)
+            text = json.dumps({"분석": "x", "답변": True}, ensure_ascii=False)
+            self.n_tokens = 50
+            yield {"choices": [{"delta": {"content": text}, "finish_reason": None}]}
+            yield {"choices": [{"delta": {}, "finish_reason": "stop"}]}
+''')
+
+FAKE_HUB = textwrap.dedent('''
+    def hf_hub_download(repo, filename):
+        return filename
+''')
+
+
+def write_batch(path, n, crash_at):
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(n):
+            content = "crash" if i == crash_at else f"기사 {i}"
+            entry = {"custom_id": f"same_source_pair_{i:04d}", "method": "POST", "url": "/v1/chat/completions",
+                     "body": {"messages": [{"role": "user", "content": content}]}}
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+
+def test_worker_killed_mid_chunk(tmp_path, monkeypatch):
+    fake_dir = tmp_path / "fake"
+    fake_dir.mkdir()
+    (fake_dir / "llama_cpp.py").write_text(FAKE_LLAMA, encoding="utf-8")
+    (fake_dir / "huggingface_hub.py").write_text(FAKE_HUB, encoding="utf-8")
+    monkeypatch.syspath_prepend(str(fake_dir))
+
+    crash_file = tmp_path / "crash"
+    crash_file.touch()
+    monkeypatch.setenv("FAKE_LLAMA_CRASH_FILE", str(crash_file))
+
+    jsonl_path = tmp_path / "batch.jsonl"
+    write_batch(jsonl_path, 12, crash_at=5)
+
+    results = run_pool(jsonl_path, ["fake/repo:fake.gguf"], tmp_path / "out", workers_per_model=2, chunk_size=2)["fake"]
+
+    # Every request is reported exactly once and in input order, even past the dead worker's chunk
+    assert [r["custom_id"] for r in results] == [f"same_source_pair_{i:04d}" for i in range(12)]
+    errors = [i for i, r in enumerate(results) if "error" in r]
+    # seq 5 is in chunk [4, 5]; seq 4 may have been returned before the kill
+    assert 5 in errors and set(errors) <= {4, 5}
+    assert all(r["verdict"] == "same" for i, r in enumerate(results) if i not in errors)
+
+    lines = (tmp_path / "out" / "fake" / "intermediate_results.jsonl").read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 12
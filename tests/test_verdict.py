@@ -0,0 +1,54 @@
+import pytest
+
+import verdict
+from verdict import MALFORMED_SAMPLES, extract_analysis, parse_output, parse_verdict, verdict_label
+
+
+@pytest.mark.parametrize("text, expected", MALFORMED_SAMPLES)
+def test_malformed_samples(text, expected):
+    assert verdict_label(text) == expected
+
+
+@pytest.mark.parametrize("text", [
+    '{"답변": false, "분석": "결론 답변: 예"}',
+    '{"분석": "결론 답변: 예", "답변": false',
+    '{"분석": "결론 \\"답변\\": true", "답변": false',
+    '분석: 결론 답변: 예\n답변: 아니오',
+])
+def test_key_inside_string_value_is_ignored(text):
+    assert parse_verdict(text) is False
+
+
+@pytest.mark.parametrize("text", [
+    '{"분석": "x", "답변": n',
+    '{"분석": "x", "답변": nul',
+    '{"분석": "x", "답변": "y"}',
+    '{"분석": "x", "답변": 0}',
+    '{"분석": "x", "답변": 1}',
+    '{"분석": "x"}',
+])
+def test_ambiguous_or_missing_answer_is_none(text):
+    assert parse_verdict(text) is None
+
+
+def test_extract_analysis():
+    assert extract_analysis('{"분석": "형식이 \\"같\\"습니다.", "답변": true}') == '형식이 "같"습니다.'
+    assert extract_analysis('{"분석": "기사 1은 [단독] 말머리를') == '기사 1은 [단독] 말머리를'
+    assert extract_analysis('{"답변": true}') == ''
+
+
+@pytest.mark.parametrize("text, expected", MALFORMED_SAMPLES)
+def test_parse_output_matches_single_field_parsers(text, expected):
+    assert parse_output(text) == (parse_verdict(text), extract_analysis(text))
+
+
+def test_parse_output_loads_json_once(monkeypatch):
+    calls = []
+    loads = verdict.json.loads
+    monkeypatch.setattr(verdict.json, "loads", lambda s, *a, **kw: calls.append(s) or loads(s, *a, **kw))
+    assert parse_output('{"분석": "형식이 같습니다.", "답변": true}') == (True, "형식이 같습니다.")
+    assert len(calls) == 1
+
+
+def test_parse_output_scans_malformed_output():
+    assert parse_output('{"분석": "결론 답변: 예", "답변": fal') == (False, "결론 답변: 예")